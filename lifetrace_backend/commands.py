@@ -304,6 +304,47 @@ def cleanup(
         rprint(f"[red]清理失败: {e}[/red]")
 
 
+@app.command()
+def compact_app_usage(
+    page_size: int = typer.Option(10000, help="每批处理的记录数"),
+    confirm: bool = typer.Option(False, help="跳过确认")
+):
+    """将逐秒写入的应用使用记录压缩为连续使用区间"""
+    
+    if not _check_initialized():
+        return
+    
+    if not confirm:
+        if not typer.confirm("压缩会合并并删除历史应用使用记录（总时长不变），请先停止录制进程。是否继续？"):
+            rprint("操作已取消")
+            return
+    
+    try:
+        rprint("[yellow]正在压缩应用使用记录...[/yellow]")
+        result = db_manager.compact_app_usage_logs(page_size=page_size)
+        if 'error' in result:
+            rprint(f"[red]压缩失败: {result['error']}[/red]")
+            return
+        rprint(f"[green]✓ 压缩完成[/green]: 扫描 {result['rows_scanned']} 行，"
+               f"合并为 {result['runs']} 个区间，删除 {result['rows_deleted']} 行")
+    except Exception as e:
+        rprint(f"[red]压缩失败: {e}[/red]")
+
+
+@app.command()
+def requeue_ocr():
+    """将重试次数用尽而失败的OCR任务重新入队"""
+    
+    if not _check_initialized():
+        return
+    
+    try:
+        count = db_manager.requeue_failed_tasks('ocr')
+        rprint(f"[green]✓ 已重新入队 {count} 个失败的OCR任务[/green]")
+    except Exception as e:
+        rprint(f"[red]重新入队失败: {e}[/red]")
+
+
 @app.command()
 def config_show():
     """显示当前配置"""
@@ -274,6 +274,8 @@ class AdvancedConsistencyChecker(ConsistencyChecker):
         super().__init__(check_interval)
         self.vector_sync_interval = vector_sync_interval
         self.last_vector_sync = None
+        # 复用同一个向量服务，避免每次同步都重新加载嵌入模型
+        self.vector_service = None
         
     def perform_consistency_check(self) -> dict:
         """执行高级一致性检查，包含向量数据库同步"""
@@ -295,37 +297,26 @@ class AdvancedConsistencyChecker(ConsistencyChecker):
         return result
     
     def _sync_vector_database(self) -> dict:
-        """同步向量数据库"""
+        """增量同步向量数据库（只索引新增的OCR结果，必要时按ID集合对齐）"""
         try:
-            from lifetrace_backend.vector_service import create_vector_service
+            if self.vector_service is None:
+                from lifetrace_backend.vector_service import create_vector_service
+                self.vector_service = create_vector_service(config, db_manager)
             
-            vector_service = create_vector_service(config, db_manager)
-            if not vector_service.is_enabled():
+            if not self.vector_service.is_enabled():
                 return {'vector_sync': 'disabled'}
             
-            # 获取统计信息
-            with db_manager.get_session() as session:
-                sqlite_count = session.query(OCRResult).count()
-            
-            vector_stats = vector_service.get_stats()
-            vector_count = vector_stats.get('document_count', 0)
-            
-            # 如果数量不一致，执行智能同步
-            if sqlite_count != vector_count:
-                logger.info(f"向量数据库不一致 (SQLite: {sqlite_count}, Vector: {vector_count})，执行同步")
-                synced_count = vector_service.sync_from_database()
-                return {
-                    'vector_sync': 'completed',
-                    'sqlite_count': sqlite_count,
-                    'vector_count_before': vector_count,
-                    'synced_count': synced_count
-                }
-            else:
-                return {
-                    'vector_sync': 'consistent',
-                    'sqlite_count': sqlite_count,
-                    'vector_count': vector_count
-                }
+            synced_count = self.vector_service.sync_from_database()
+            sync_stats = self.vector_service.last_sync_stats
+            if synced_count or sync_stats.get('deleted_count'):
+                logger.info(f"向量数据库同步完成: {sync_stats}")
+            return {
+                'vector_sync': 'completed',
+                'vector_sync_mode': sync_stats.get('mode'),
+                'synced_count': synced_count,
+                'deleted_count': sync_stats.get('deleted_count', 0),
+                'vector_watermark': sync_stats.get('watermark')
+            }
                 
         except Exception as e:
             logger.error(f"向量数据库同步检查失败: {e}")
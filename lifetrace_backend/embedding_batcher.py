@@ -0,0 +1,175 @@
+"""查询嵌入批处理模块
+
+语义搜索、事件搜索和RAG每次都要编码查询文本：
+- LRUCache 缓存最近的查询向量，重复查询直接返回；
+- EmbeddingBatcher 把几毫秒内并发到达的编码请求合并为一次 encode 调用，
+  调用方拿到 Future，批次完成后各自取回自己的向量。
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """线程安全的定长LRU缓存"""
+
+    def __init__(self, capacity: int = 256):
+        self.capacity = max(0, int(capacity))
+        self._data: 'OrderedDict[str, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {
+            'hits': 0,
+            'misses': 0
+        }
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key not in self._data:
+                self.stats['misses'] += 1
+                return None
+            self._data.move_to_end(key)
+            self.stats['hits'] += 1
+            return self._data[key]
+
+    def put(self, key: str, value: Any):
+        if self.capacity == 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.capacity:
+                self._data.popitem(last=False)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = self.stats.copy()
+            stats['size'] = len(self._data)
+            stats['capacity'] = self.capacity
+            return stats
+
+
+class EmbeddingBatcher:
+    """把并发的文本编码请求合并为批次
+
+    后台线程取到第一个请求后最多再等待 max_wait_ms 毫秒收集后续请求（或凑满 max_batch_size），
+    然后调用一次 encode_fn，把结果分发给各请求的 Future。
+    """
+
+    def __init__(self, encode_fn: Callable[[List[str]], List[List[float]]],
+                 max_batch_size: int = 32, max_wait_ms: float = 5):
+        """
+        Args:
+            encode_fn: 批量编码函数，输入文本列表，返回同序的向量列表
+            max_batch_size: 单批最多合并的请求数
+            max_wait_ms: 收集同一批请求的最长等待时间（毫秒）
+        """
+        self.encode_fn = encode_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000
+        self._queue: 'queue.Queue' = queue.Queue()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.stats = {
+            'requests': 0,
+            'batches': 0,
+            'max_batch': 0
+        }
+
+    def submit(self, text: str) -> Future:
+        """提交一个编码请求，返回结果为向量的 Future"""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop_event.clear()
+                self._thread = threading.Thread(target=self._run, name='embedding-batcher', daemon=True)
+                self._thread.start()
+
+    def _collect_batch(self) -> List[tuple]:
+        """阻塞等待第一个请求，再在等待窗口内收集后续请求"""
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            batch = self._collect_batch()
+            if batch:
+                self._process(batch)
+
+    def _process(self, batch: List[tuple]):
+        # 同一批次中相同的文本只编码一次
+        pending: Dict[str, List[Future]] = {}
+        for text, future in batch:
+            if future.set_running_or_notify_cancel():
+                pending.setdefault(text, []).append(future)
+        if not pending:
+            return
+
+        texts = list(pending)
+        self.stats['requests'] += len(batch)
+        self.stats['batches'] += 1
+        self.stats['max_batch'] = max(self.stats['max_batch'], len(texts))
+        try:
+            embeddings = list(self.encode_fn(texts))
+            if len(embeddings) != len(texts):
+                raise RuntimeError(f"Embedding batch returned {len(embeddings)} vectors for {len(texts)} texts")
+            for text, embedding in zip(texts, embeddings):
+                for future in pending[text]:
+                    future.set_result(embedding)
+        except Exception as e:
+            logger.error(f"Embedding batch of {len(texts)} texts failed: {e}")
+            self._fail_pending(pending, e)
+        finally:
+            # 无论如何都不让调用方永远等待
+            self._fail_pending(pending, RuntimeError("Embedding batch produced no result"))
+
+    @staticmethod
+    def _fail_pending(pending: Dict[str, List[Future]], error: Exception):
+        """以异常结束批次中尚未完成的 Future"""
+        for futures in pending.values():
+            for future in futures:
+                if not future.done():
+                    future.set_exception(error)
+
+    def get_stats(self) -> dict:
+        stats = self.stats.copy()
+        stats['avg_batch'] = round(stats['requests'] / max(stats['batches'], 1), 2)
+        return stats
+
+    def close(self):
+        """停止后台线程（未处理的请求以异常结束）"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+        while True:
+            try:
+                _, future = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if future.set_running_or_notify_cancel():
+                future.set_exception(RuntimeError("Embedding batcher closed"))
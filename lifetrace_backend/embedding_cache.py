@@ -0,0 +1,246 @@
+"""嵌入向量磁盘缓存模块
+
+按 文本MD5 + 模型名称 缓存文本的嵌入向量（float16），相同的OCR文本（静止画面、反复出现的聊天窗口）
+以及重建向量集合时只需查表，不再运行嵌入模型。
+
+每个模型一个缓存文件 <模型名>_<维度>_v2.bin，由定长记录组成：16字节MD5摘要 + dim 个 float16 + CRC32 校验。
+多个进程（OCR进程、Web服务器）可共用同一文件：
+- 写入时持有跨进程文件锁（<缓存文件>.lock，fcntl.flock / msvcrt.locking），先截掉崩溃留下的不完整尾部记录，
+  再用一次 os.write 追加整批记录，不依赖 O_APPEND 的原子性（Windows 上没有这个保证）；
+- 读取时只读取新增的尾部记录来更新索引，CRC 不匹配的记录跳过，不完整的尾部记录等下次刷新再读；
+- 向量通过内存映射读取，只在文件增长时重新映射，并关闭旧的映射。
+同一进程内通过 get_embedding_cache 按文件路径共享一个实例，索引只建立一次。
+"""
+
+import hashlib
+import logging
+import os
+import re
+import threading
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+logger = logging.getLogger(__name__)
+
+_shared_caches: Dict[str, 'EmbeddingCache'] = {}
+_shared_caches_lock = threading.Lock()
+
+
+def cache_file_name(model_name: str, dim: int) -> str:
+    """缓存文件名：<模型名>_<维度>_v2.bin（v2 为带校验的记录格式）"""
+    safe_name = re.sub(r'[^0-9A-Za-z._-]+', '_', model_name)
+    return f"{safe_name}_{int(dim)}_v2.bin"
+
+
+def get_embedding_cache(directory: str, model_name: str, dim: int, max_size_mb: int = 1024) -> 'EmbeddingCache':
+    """获取进程内共享的缓存实例
+
+    同一缓存文件在一个进程中只创建一个 EmbeddingCache，多个 VectorDatabase 实例共用其索引，
+    不必各自重新扫描文件。max_size_mb 以首次创建时的值为准。
+    """
+    key = str((Path(directory) / cache_file_name(model_name, dim)).resolve())
+    with _shared_caches_lock:
+        cache = _shared_caches.get(key)
+        if cache is None:
+            cache = EmbeddingCache(directory, model_name, dim, max_size_mb)
+            _shared_caches[key] = cache
+        return cache
+
+
+@contextmanager
+def _file_lock(lock_path: Path):
+    """跨进程互斥锁（锁住独立的锁文件，不影响其他进程读取缓存文件）"""
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0))
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        elif msvcrt is not None:
+            # LK_LOCK 在锁被占用时每秒重试，10次后抛出 OSError
+            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    finally:
+        os.close(fd)
+
+
+class EmbeddingCache:
+    """基于内存映射文件的嵌入向量缓存"""
+
+    def __init__(self, directory: str, model_name: str, dim: int, max_size_mb: int = 1024):
+        """
+        Args:
+            directory: 缓存目录
+            model_name: 嵌入模型名称（不同模型的向量互不通用）
+            dim: 向量维度
+            max_size_mb: 缓存文件上限，达到后不再写入新记录
+        """
+        self.model_name = model_name
+        self.dim = int(dim)
+        self.max_size = int(max_size_mb) * 1024 * 1024
+        self.dtype = np.dtype([('key', 'S16'), ('vector', '<f2', (self.dim,)), ('crc', '<u4')])
+
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        self.path = Path(directory) / cache_file_name(model_name, self.dim)
+        self.lock_path = self.path.with_name(self.path.name + '.lock')
+
+        self._lock = threading.Lock()
+        self._index: Dict[bytes, int] = {}
+        self._records: Optional[np.memmap] = None
+        self._scanned = 0
+        self._full_logged = False
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'writes': 0,
+            'corrupt': 0
+        }
+        self._refresh()
+
+    def _record_crc(self, record: bytes) -> int:
+        """记录的校验值：MD5摘要和向量字节的 CRC32"""
+        return zlib.crc32(record[:self.dtype.itemsize - 4])
+
+    def _refresh(self):
+        """读取其他进程新追加的完整记录加入索引，文件增长时重新映射"""
+        size = self.path.stat().st_size if self.path.exists() else 0
+        count = size // self.dtype.itemsize
+        if count == self._scanned:
+            return
+        if count < self._scanned:
+            # 缓存文件被删除或截断，重新建立索引
+            self._index.clear()
+            self._scanned = 0
+        self._remap(count)
+        if count == 0:
+            return
+
+        # 只读取新增的尾部记录；不完整的尾部记录（其他进程正在写入）忽略，下次刷新时再读
+        itemsize = self.dtype.itemsize
+        with open(self.path, 'rb') as f:
+            f.seek(self._scanned * itemsize)
+            data = f.read((count - self._scanned) * itemsize)
+        count = self._scanned + len(data) // itemsize
+        view = memoryview(data)
+        for offset in range(0, count - self._scanned):
+            record = view[offset * itemsize:(offset + 1) * itemsize]
+            if self._record_crc(record) != int.from_bytes(record[-4:], 'little'):
+                self.stats['corrupt'] += 1
+                continue
+            self._index.setdefault(bytes(record[:16]), self._scanned + offset)
+        self._scanned = count
+
+    def _remap(self, count: int):
+        """按记录数重新映射缓存文件，并关闭旧的映射"""
+        old_records = self._records
+        self._records = np.memmap(self.path, dtype=self.dtype, mode='r', shape=(count,)) if count else None
+        # 查询结果都是拷贝，旧映射上没有外部引用，可以直接关闭
+        if old_records is not None and getattr(old_records, '_mmap', None) is not None:
+            old_records._mmap.close()
+
+    def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """批量查询，返回与输入顺序一致的向量列表，未命中的位置为 None"""
+        digests = [hashlib.md5(text.encode()).digest() for text in texts]
+        with self._lock:
+            if any(digest not in self._index for digest in digests):
+                self._refresh()
+
+            results = []
+            for digest in digests:
+                row = self._index.get(digest)
+                if row is None:
+                    results.append(None)
+                    self.stats['misses'] += 1
+                else:
+                    results.append(self._records['vector'][row].astype(np.float32).tolist())
+                    self.stats['hits'] += 1
+            return results
+
+    def put_many(self, texts: List[str], embeddings: List[List[float]]) -> int:
+        """批量写入（已存在的文本跳过），返回写入的记录数；写入失败只记录日志"""
+        with self._lock:
+            records = np.zeros(len(texts), dtype=self.dtype)
+            pending = set()
+            count = 0
+            for text, embedding in zip(texts, embeddings):
+                digest = hashlib.md5(text.encode()).digest()
+                if digest in self._index or digest in pending or len(embedding) != self.dim:
+                    continue
+                records[count]['key'] = digest
+                records[count]['vector'] = embedding
+                records[count]['crc'] = self._record_crc(records[count].tobytes())
+                pending.add(digest)
+                count += 1
+            if count == 0:
+                return 0
+
+            try:
+                written = self._append(records[:count].tobytes())
+            except OSError as e:
+                logger.warning(f"Failed to write embedding cache {self.path}: {e}")
+                return 0
+            if not written:
+                return 0
+
+            self._refresh()
+            self.stats['writes'] += count
+            return count
+
+    def _append(self, data: bytes) -> bool:
+        """持有跨进程锁追加整批记录，超过容量上限时不写入"""
+        itemsize = self.dtype.itemsize
+        with _file_lock(self.lock_path):
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0))
+            try:
+                size = os.fstat(fd).st_size
+                aligned = size - size % itemsize
+                if aligned + len(data) > self.max_size:
+                    if not self._full_logged:
+                        logger.warning(f"Embedding cache {self.path} reached {self.max_size // 1024 // 1024}MB, "
+                                       f"new embeddings will not be cached")
+                        self._full_logged = True
+                    return False
+                if aligned != size:
+                    # 持锁时仍存在的不完整记录只能来自崩溃的写入者，截掉后再追加，保持记录对齐
+                    logger.warning(f"Truncating {size - aligned} bytes of partial record from {self.path}")
+                    os.ftruncate(fd, aligned)
+
+                os.lseek(fd, aligned, os.SEEK_SET)
+                try:
+                    view = memoryview(data)
+                    while view:
+                        view = view[os.write(fd, view):]
+                except OSError:
+                    os.ftruncate(fd, aligned)
+                    raise
+                return True
+            finally:
+                os.close(fd)
+
+    def get_stats(self) -> dict:
+        """获取缓存统计"""
+        with self._lock:
+            stats = self.stats.copy()
+            stats['entries'] = len(self._index)
+            stats['size_mb'] = round(len(self._index) * self.dtype.itemsize / 1024 / 1024, 1)
+            stats['path'] = str(self.path)
+            return stats
@@ -0,0 +1,238 @@
+"""截图帧哈希模块
+
+直接基于 mss 截图的 BGRA 内存缓冲区计算感知哈希（pHash），
+并提供按屏幕维护的近期哈希窗口和分块变化检测，用于截图去重。
+"""
+
+import logging
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+# pHash参数：缩放到32x32灰度图，取DCT左上角8x8低频分量
+_PHASH_SIZE = 32
+_PHASH_LOW_FREQ = 8
+# 计算灰度前的降采样目标边长，避免对整张4K截图做浮点运算
+_PRESAMPLE_TARGET = 256
+
+
+def _build_dct_matrix(n: int, k: int) -> np.ndarray:
+    """构建DCT-II变换矩阵的前k行（未归一化，与scipy.fftpack.dct的比例无关）"""
+    rows = np.arange(k).reshape(-1, 1)
+    cols = np.arange(n).reshape(1, -1)
+    return np.cos(np.pi * rows * (2 * cols + 1) / (2 * n)).astype(np.float32)
+
+
+_DCT_MATRIX = _build_dct_matrix(_PHASH_SIZE, _PHASH_LOW_FREQ)
+
+
+def bgra_to_array(bgra, width: int, height: int) -> np.ndarray:
+    """将BGRA字节缓冲区包装为 (height, width, 4) 的uint8数组（不复制）"""
+    return np.frombuffer(bgra, dtype=np.uint8).reshape(height, width, 4)
+
+
+def _box_downscale(gray: np.ndarray, size: int) -> np.ndarray:
+    """按区域平均将灰度图缩放到 size x size"""
+    h, w = gray.shape
+    row_edges = (np.arange(size) * h) // size
+    col_edges = (np.arange(size) * w) // size
+    row_counts = np.diff(np.append(row_edges, h))
+    col_counts = np.diff(np.append(col_edges, w))
+    summed = np.add.reduceat(np.add.reduceat(gray, row_edges, axis=0), col_edges, axis=1)
+    return summed / np.outer(row_counts, col_counts)
+
+
+def compute_phash(bgra, width: int, height: int) -> int:
+    """从BGRA缓冲区计算64位感知哈希
+
+    先按步长降采样，再转灰度、区域平均缩放到32x32，
+    用矩阵乘法计算DCT低频分量并与中位数比较。
+
+    Args:
+        bgra: mss截图的原始BGRA数据（bytes/bytearray/memoryview）
+        width: 图像宽度
+        height: 图像高度
+
+    Returns:
+        64位整数哈希，位顺序与 imagehash 的十六进制表示一致
+    """
+    frame = bgra_to_array(bgra, width, height)
+    step = max(1, min(height, width) // _PRESAMPLE_TARGET)
+    sampled = frame[::step, ::step]
+
+    # 与PIL的 convert("L") 相同的亮度系数（BGRA通道顺序）
+    gray = (sampled[..., 2] * 0.299 + sampled[..., 1] * 0.587 + sampled[..., 0] * 0.114).astype(np.float32)
+    if gray.shape[0] < _PHASH_SIZE or gray.shape[1] < _PHASH_SIZE:
+        gray = np.pad(gray, ((0, max(0, _PHASH_SIZE - gray.shape[0])), (0, max(0, _PHASH_SIZE - gray.shape[1]))), mode='edge')
+    pixels = _box_downscale(gray, _PHASH_SIZE)
+
+    low_freq = _DCT_MATRIX @ pixels @ _DCT_MATRIX.T
+    bits = low_freq > np.median(low_freq)
+    return int.from_bytes(np.packbits(bits.flatten()).tobytes(), 'big')
+
+
+def hash_to_hex(value: int) -> str:
+    """64位哈希转为16位十六进制字符串"""
+    return f"{value:016x}"
+
+
+def hex_to_hash(value: str) -> int:
+    """十六进制字符串转为64位哈希"""
+    return int(value, 16)
+
+
+def popcount64(values: np.ndarray) -> np.ndarray:
+    """逐元素统计uint64数组中1的个数"""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values).astype(np.int64)
+    as_bytes = values.astype(np.uint64).view(np.uint8).reshape(-1, 8)
+    return np.unpackbits(as_bytes, axis=1).sum(axis=1).astype(np.int64)
+
+
+def hamming_distances(window: np.ndarray, value: int) -> np.ndarray:
+    """计算一个哈希与一组哈希之间的汉明距离"""
+    return popcount64(np.bitwise_xor(window, np.uint64(value)))
+
+
+class HashWindowDeduplicator:
+    """按屏幕维护近期哈希窗口的去重器
+
+    每个屏幕保存最近 window_size 张已保存截图的哈希（64位整数），
+    新帧与窗口内任一哈希的汉明距离不超过阈值即视为重复。
+    这样在两个窗口之间来回切换时也不会重复保存相同画面。
+    """
+
+    def __init__(self, window_size: int = 4):
+        self.window_size = max(1, int(window_size))
+        self._windows: Dict[int, deque] = {}
+        self._arrays: Dict[int, np.ndarray] = {}
+        self.logger = logging.getLogger(__name__)
+
+    def nearest_distance(self, screen_id: int, value: int) -> Optional[int]:
+        """返回与该屏幕窗口内哈希的最小汉明距离，窗口为空时返回None"""
+        array = self._arrays.get(screen_id)
+        if array is None or array.size == 0:
+            return None
+        return int(hamming_distances(array, value).min())
+
+    def is_duplicate(self, screen_id: int, value: int, threshold: int) -> Tuple[bool, Optional[int]]:
+        """检查是否与近期截图重复
+
+        Returns:
+            (是否重复, 最小汉明距离)
+        """
+        distance = self.nearest_distance(screen_id, value)
+        if distance is None:
+            return False, None
+        return distance <= threshold, distance
+
+    def discard(self, screen_id: int, value: int):
+        """移除一个哈希（例如对应的帧最终没有保存）"""
+        window = self._windows.get(screen_id)
+        if not window or value not in window:
+            return
+        window.remove(value)
+        self._arrays[screen_id] = np.fromiter(window, dtype=np.uint64, count=len(window))
+
+    def add(self, screen_id: int, value: int):
+        """记录一张已保存截图的哈希"""
+        window = self._windows.get(screen_id)
+        if window is None:
+            window = deque(maxlen=self.window_size)
+            self._windows[screen_id] = window
+        window.append(value)
+        self._arrays[screen_id] = np.fromiter(window, dtype=np.uint64, count=len(window))
+
+    def resize(self, window_size: int):
+        """调整窗口大小，保留每个屏幕最近的哈希"""
+        self.window_size = max(1, int(window_size))
+        for screen_id, window in list(self._windows.items()):
+            self._windows[screen_id] = deque(window, maxlen=self.window_size)
+            self._arrays[screen_id] = np.fromiter(self._windows[screen_id], dtype=np.uint64)
+
+    def reset(self, screen_id: Optional[int] = None):
+        """清空指定屏幕（或全部屏幕）的哈希窗口"""
+        if screen_id is None:
+            self._windows.clear()
+            self._arrays.clear()
+        else:
+            self._windows.pop(screen_id, None)
+            self._arrays.pop(screen_id, None)
+
+
+def compute_tile_signature(bgra, width: int, height: int, tile_size: int = 64, stride: int = 1) -> np.ndarray:
+    """计算截图的分块校验和
+
+    在按步长采样的BGRA视图上，对每个 tile_size x tile_size 的区域求像素和。
+    只做整数加法，比计算感知哈希便宜得多，用于判断画面是否有变化。
+
+    Args:
+        bgra: mss截图的原始BGRA数据
+        width: 图像宽度
+        height: 图像高度
+        tile_size: 分块边长（原图像素）
+        stride: 采样步长（原图像素），默认1即覆盖全部像素；大于1时只采样 1/stride² 的像素，
+            光标、单个字符等细小变化可能落在采样点之间而检测不到
+
+    Returns:
+        形状为 (行块数, 列块数) 的uint32数组
+    """
+    stride = max(1, int(stride))
+    sampled = bgra_to_array(bgra, width, height)[::stride, ::stride, :3]
+    tile = max(1, int(tile_size) // stride)
+    row_edges = np.arange(0, sampled.shape[0], tile)
+    col_edges = np.arange(0, sampled.shape[1], tile)
+    summed = np.add.reduceat(sampled, row_edges, axis=0, dtype=np.uint32)
+    summed = np.add.reduceat(summed, col_edges, axis=1, dtype=np.uint32)
+    return summed.sum(axis=2, dtype=np.uint32)
+
+
+class TileChangeDetector:
+    """基于分块校验和的画面变化检测器
+
+    保存每个屏幕上一帧的分块校验和，新帧与之逐块比较，
+    没有任何分块变化时可以跳过后续的哈希和编码。
+    """
+
+    def __init__(self, tile_size: int = 64, stride: int = 1):
+        self.tile_size = tile_size
+        self.stride = stride
+        self._signatures: Dict[int, np.ndarray] = {}
+        self.stats = {
+            'frames_checked': 0,
+            'frames_skipped': 0
+        }
+
+    def check(self, screen_id: int, bgra, width: int, height: int) -> Tuple[bool, int]:
+        """检查画面相对上一帧是否有变化，并记录当前帧的校验和
+
+        Returns:
+            (是否有变化, 变化的分块数)
+        """
+        signature = compute_tile_signature(bgra, width, height, self.tile_size, self.stride)
+        previous = self._signatures.get(screen_id)
+        self._signatures[screen_id] = signature
+        self.stats['frames_checked'] += 1
+
+        if previous is None or previous.shape != signature.shape:
+            return True, int(signature.size)
+
+        changed_tiles = int(np.count_nonzero(previous != signature))
+        if changed_tiles == 0:
+            self.stats['frames_skipped'] += 1
+            return False, 0
+        return True, changed_tiles
+
+    def reset(self, screen_id: Optional[int] = None):
+        """清空指定屏幕（或全部屏幕）的历史校验和"""
+        if screen_id is None:
+            self._signatures.clear()
+        else:
+            self._signatures.pop(screen_id, None)
+
+    def get_stats(self) -> dict:
+        """获取检测统计"""
+        stats = self.stats.copy()
+        stats['skip_rate'] = stats['frames_skipped'] / max(stats['frames_checked'], 1)
+        return stats
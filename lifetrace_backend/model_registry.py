@@ -0,0 +1,128 @@
+"""模型注册表模块
+
+进程内共享的模型缓存：按 (模型类型, 模型名称) 缓存已加载的嵌入模型、重排序模型和CLIP模型，
+所有 VectorDatabase / MultimodalEmbedding 实例从这里取模型，每个模型在一个进程中最多加载一次。
+同时记录每个模型的加载耗时和内存占用，便于排查启动慢和内存高的问题。
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Tuple
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+ModelKey = Tuple[str, str]
+
+
+def _process_rss_mb() -> float:
+    """当前进程常驻内存（MB），psutil不可用时返回0"""
+    if psutil is None:
+        return 0.0
+    try:
+        return psutil.Process().memory_info().rss / 1024 / 1024
+    except Exception:
+        return 0.0
+
+
+def _parameter_mb(model: Any) -> float:
+    """估算模型参数占用的内存（MB），不是PyTorch模型时返回0"""
+    models = model if isinstance(model, tuple) else (model,)
+    total = 0
+    for item in models:
+        parameters = getattr(item, 'parameters', None)
+        if not callable(parameters):
+            continue
+        try:
+            total += sum(p.numel() * p.element_size() for p in parameters())
+        except Exception:
+            continue
+    return total / 1024 / 1024
+
+
+class ModelRegistry:
+    """线程安全的进程内模型注册表
+
+    每个模型有独立的加载锁：同一模型的并发请求只加载一次，不同模型可以并行加载。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models: Dict[ModelKey, Any] = {}
+        self._load_locks: Dict[ModelKey, threading.Lock] = {}
+        self._stats: Dict[ModelKey, Dict[str, Any]] = {}
+
+    def get_or_load(self, kind: str, name: str, loader: Callable[[], Any]) -> Any:
+        """获取已加载的模型，不存在时调用 loader 加载并缓存
+
+        Args:
+            kind: 模型类型，例如 sentence_transformer / cross_encoder / clip
+            name: 模型名称（同一模型在不同设备上时应包含设备）
+            loader: 加载模型的无参函数，加载失败时抛出的异常会传给调用方，且不缓存
+        """
+        key = (kind, name)
+        with self._lock:
+            if key in self._models:
+                self._stats[key]['hits'] += 1
+                return self._models[key]
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                if key in self._models:
+                    self._stats[key]['hits'] += 1
+                    return self._models[key]
+
+            logger.info(f"Loading {kind} model: {name}")
+            rss_before = _process_rss_mb()
+            start_time = time.time()
+            model = loader()
+            load_seconds = time.time() - start_time
+            rss_delta = _process_rss_mb() - rss_before
+
+            with self._lock:
+                self._models[key] = model
+                self._stats[key] = {
+                    'kind': kind,
+                    'name': name,
+                    'load_seconds': round(load_seconds, 3),
+                    'rss_delta_mb': round(rss_delta, 1),
+                    'parameter_mb': round(_parameter_mb(model), 1),
+                    'loaded_at': datetime.now().isoformat(),
+                    'hits': 0
+                }
+            logger.info(f"Loaded {kind} model {name} in {load_seconds:.2f}s "
+                        f"(RSS +{rss_delta:.0f}MB)")
+            return model
+
+    def is_loaded(self, kind: str, name: str) -> bool:
+        """模型是否已加载"""
+        with self._lock:
+            return (kind, name) in self._models
+
+    def unload(self, kind: str, name: str) -> bool:
+        """从注册表移除模型（仍被其他对象引用时不会立即释放内存）"""
+        with self._lock:
+            self._stats.pop((kind, name), None)
+            return self._models.pop((kind, name), None) is not None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取已加载模型的统计信息"""
+        with self._lock:
+            models = [stats.copy() for stats in self._stats.values()]
+        return {
+            'model_count': len(models),
+            'total_load_seconds': round(sum(m['load_seconds'] for m in models), 3),
+            'total_rss_delta_mb': round(sum(m['rss_delta_mb'] for m in models), 1),
+            'models': models
+        }
+
+
+# 全局模型注册表实例
+model_registry = ModelRegistry()
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, Float, LargeBinary
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, Float, LargeBinary, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import deferred
 from sqlalchemy.sql import func
 import datetime
 
@@ -32,6 +33,7 @@ class Screenshot(Base):
     id = Column(Integer, primary_key=True)
     file_path = Column(String(500), nullable=False, unique=True)
     file_hash = Column(String(64), nullable=False)  # imagehash值
+    phash = Column(String(16))  # 感知哈希（16位十六进制），用于判断画面是否几乎相同
     file_size = Column(Integer, nullable=False)
     width = Column(Integer, nullable=False)
     height = Column(Integer, nullable=False)
@@ -57,6 +59,9 @@ class OCRResult(Base):
     confidence = Column(Float)  # 置信度
     language = Column(String(10))  # 识别语言
     processing_time = Column(Float)  # 处理耗时（秒）
+    reused_from = Column(Integer)  # 画面几乎相同时复用的OCR结果ID（未重新识别）
+    # 全部识别条目（坐标框/文本/置信度）的列式打包数据，格式见 ocr_layout.py；默认不随查询加载
+    layout = deferred(Column(LargeBinary))
     created_at = Column(DateTime, default=get_local_time)
     
     def __repr__(self):
@@ -75,6 +80,17 @@ class SearchIndex(Base):
     def __repr__(self):
         return f"<SearchIndex(id={self.id}, screenshot_id={self.screenshot_id})>"
 
+class SearchPosting(Base):
+    """关键词倒排索引模型（检索词 → 截图）"""
+    __tablename__ = 'search_postings'
+    __table_args__ = {'sqlite_with_rowid': False}
+    
+    term = Column(String(64), primary_key=True)  # 检索词（见 text_tokenizer.extract_terms）
+    screenshot_id = Column(Integer, primary_key=True, index=True)
+    
+    def __repr__(self):
+        return f"<SearchPosting(term={self.term}, screenshot_id={self.screenshot_id})>"
+
 class ProcessingQueue(Base):
     """处理队列模型"""
     __tablename__ = 'processing_queue'
@@ -85,6 +101,9 @@ class ProcessingQueue(Base):
     status = Column(String(20), default='pending')  # pending, processing, completed, failed
     retry_count = Column(Integer, default=0)
     error_message = Column(Text)
+    claimed_by = Column(String(100))  # 认领任务的进程标识（主机名:进程号）
+    lease_until = Column(DateTime)  # 租约到期时间，过期未完成的任务可被其他进程重新认领
+    retry_after = Column(DateTime)  # 失败后最早可再次认领的时间（按重试次数指数退避）
     created_at = Column(DateTime, default=get_local_time)
     updated_at = Column(DateTime, default=get_local_time, onupdate=get_local_time)
     
@@ -124,6 +143,21 @@ class AppUsageLog(Base):
     def __repr__(self):
         return f"<AppUsageLog(id={self.id}, app={self.app_name}, timestamp={self.timestamp})>"
 
+class AppUsageHourly(Base):
+    """应用使用小时汇总模型 - 按应用×小时预聚合，写入应用使用记录时增量维护"""
+    __tablename__ = 'app_usage_hourly'
+    __table_args__ = (UniqueConstraint('app_name', 'hour_start', name='uq_app_usage_hourly_app_hour'),)
+    
+    id = Column(Integer, primary_key=True)
+    app_name = Column(String(200), nullable=False)  # 应用名称
+    hour_start = Column(DateTime, nullable=False)  # 小时起点（分秒为0）
+    total_seconds = Column(Integer, default=0)  # 该小时内的使用时长（秒）
+    session_count = Column(Integer, default=0)  # 该小时内开始的使用记录数
+    last_used = Column(DateTime)  # 该小时内最后一条使用记录的时间
+    
+    def __repr__(self):
+        return f"<AppUsageHourly(app={self.app_name}, hour={self.hour_start}, seconds={self.total_seconds})>"
+
 class DailyStats(Base):
     """每日统计模型"""
     __tablename__ = 'daily_stats'
@@ -27,6 +27,7 @@ except ImportError:
     logging.warning("多模态依赖未安装，请运行: pip install torch transformers clip-by-openai")
 
 from lifetrace_backend.config import config
+from lifetrace_backend.model_registry import model_registry
 
 
 class MultimodalEmbedding:
@@ -64,17 +65,25 @@ class MultimodalEmbedding:
         try:
             self.logger.info(f"正在加载CLIP模型: {self.model_name}")
             
-            # 使用Transformers版本的CLIP
-            self.model = CLIPModel.from_pretrained(self.model_name)
-            self.processor = CLIPProcessor.from_pretrained(self.model_name)
+            # 使用Transformers版本的CLIP（同一进程内的多个实例共享已加载的模型）
+            def load_clip():
+                model = CLIPModel.from_pretrained(self.model_name)
+                processor = CLIPProcessor.from_pretrained(self.model_name)
+                # 移动到设备
+                model.to(self.device)
+                model.eval()
+                return model, processor
             
-            # 移动到设备
-            self.model.to(self.device)
-            self.model.eval()
+            self.model, self.processor = model_registry.get_or_load(
+                'clip', f"{self.model_name}@{self.device}", load_clip
+            )
             
             # 也尝试加载原版CLIP作为备选
             try:
-                self.clip_model, _ = clip.load("ViT-B/32", device=self.device)
+                self.clip_model = model_registry.get_or_load(
+                    'clip_original', f"ViT-B/32@{self.device}",
+                    lambda: clip.load("ViT-B/32", device=self.device)[0]
+                )
                 self.logger.info("原版CLIP模型加载成功")
             except Exception as e:
                 self.logger.warning(f"原版CLIP模型加载失败: {e}")
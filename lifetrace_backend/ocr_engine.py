@@ -0,0 +1,218 @@
+"""OCR引擎工厂模块
+
+统一创建RapidOCR引擎：解析外部模型路径、按配置设置ONNX Runtime线程数，
+加载后用一张小图预热（首次推理时ONNX Runtime才分配内存和选择算子实现），并记录耗时。
+Web服务器和OCR进程通过 get_ocr_engine() 获取进程内共享的单例，
+服务器启动时可在后台线程预热，避免第一次OCR请求承担模型加载时间。
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+try:
+    from rapidocr_onnxruntime import RapidOCR
+    RAPIDOCR_AVAILABLE = True
+except ImportError:
+    RapidOCR = None
+    RAPIDOCR_AVAILABLE = False
+
+from lifetrace_backend.config import config
+
+logger = logging.getLogger(__name__)
+
+_engine = None
+_engine_lock = threading.Lock()
+_engine_stats = {
+    'loaded': False,
+    'load_seconds': None,
+    'warmup_seconds': None,
+    'loaded_at': None,
+    'intra_op_num_threads': None,
+    'inter_op_num_threads': None,
+    'error': None
+}
+
+
+def _get_application_path() -> str:
+    """获取应用程序路径，兼容PyInstaller打包（simple_ocr 也从这里导入）"""
+    if getattr(sys, 'frozen', False):
+        # 如果是PyInstaller打包的应用，使用可执行文件所在目录
+        return os.path.dirname(sys.executable)
+    else:
+        # 开发环境，使用项目根目录
+        return str(Path(__file__).parent.parent)
+
+
+def _session_kwargs(intra_op_num_threads: Optional[int], inter_op_num_threads: Optional[int]) -> dict:
+    """ONNX Runtime线程数参数（0或未设置时使用运行时默认值）
+
+    RapidOCR按前缀把参数分发到检测/分类/识别三个推理会话，因此每个会话都单独设置一份。
+    """
+    kwargs = {}
+    for name, value in (('intra_op_num_threads', intra_op_num_threads),
+                        ('inter_op_num_threads', inter_op_num_threads)):
+        if value and value > 0:
+            kwargs[name] = int(value)
+            for prefix in ('det', 'cls', 'rec'):
+                kwargs[f'{prefix}_{name}'] = int(value)
+    return kwargs
+
+
+def _resolve_model_paths() -> Optional[dict]:
+    """读取 config/rapidocr_config.yaml 中的外部模型路径，文件都存在时返回路径参数"""
+    # 获取exe同目录下的config文件路径
+    app_path = _get_application_path()
+    config_path = os.path.join(app_path, 'config', 'rapidocr_config.yaml')
+
+    # 检查配置文件是否存在
+    if not os.path.exists(config_path):
+        logger.info(f"配置文件不存在: {config_path}，使用默认配置")
+        return None
+
+    logger.info(f"使用RapidOCR配置文件: {config_path}")
+
+    # 读取配置文件以获取外部模型路径
+    import yaml
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config_data = yaml.safe_load(f)
+    except Exception as e:
+        logger.warning(f"读取配置文件失败: {e}，使用默认配置")
+        return None
+
+    # 检查是否有外部模型路径配置
+    if 'Models' not in config_data:
+        return None
+
+    models_config = config_data['Models']
+    det_model_path = os.path.join(app_path, models_config.get('det_model_path', ''))
+    rec_model_path = os.path.join(app_path, models_config.get('rec_model_path', ''))
+    cls_model_path = os.path.join(app_path, models_config.get('cls_model_path', ''))
+
+    # 验证外部模型文件是否存在
+    if not (os.path.exists(det_model_path) and
+            os.path.exists(rec_model_path) and
+            os.path.exists(cls_model_path)):
+        logger.warning("外部模型文件不存在，使用默认配置")
+        return None
+
+    logger.info(f"使用外部模型文件: 检测模型 {det_model_path}, "
+                f"识别模型 {rec_model_path}, 分类模型 {cls_model_path}")
+    return {
+        'det_model_path': det_model_path,
+        'rec_model_path': rec_model_path,
+        'cls_model_path': cls_model_path
+    }
+
+
+def create_ocr_engine(intra_op_num_threads: Optional[int] = None,
+                      inter_op_num_threads: Optional[int] = None):
+    """创建一个新的RapidOCR引擎
+
+    优先使用 config/rapidocr_config.yaml 中配置的外部模型文件，
+    模型文件不存在或配置读取失败时使用默认模型。
+
+    Args:
+        intra_op_num_threads: 单个算子内的线程数，未指定时读取 ocr.engine.intra_op_num_threads
+        inter_op_num_threads: 算子间的线程数，未指定时读取 ocr.engine.inter_op_num_threads
+    """
+    if not RAPIDOCR_AVAILABLE:
+        raise RuntimeError("RapidOCR未安装，请运行: pip install rapidocr-onnxruntime")
+
+    if intra_op_num_threads is None:
+        intra_op_num_threads = config.get('ocr.engine.intra_op_num_threads', 0)
+    if inter_op_num_threads is None:
+        inter_op_num_threads = config.get('ocr.engine.inter_op_num_threads', 0)
+
+    kwargs = dict(
+        det_use_cuda=False,
+        cls_use_cuda=False,
+        rec_use_cuda=False,
+        print_verbose=False
+    )
+    kwargs.update(_session_kwargs(intra_op_num_threads, inter_op_num_threads))
+
+    model_paths = _resolve_model_paths()
+    if model_paths:
+        # 使用外部模型路径初始化RapidOCR
+        kwargs.update(model_paths)
+    else:
+        # 使用config_path=None来避免配置文件路径问题
+        kwargs['config_path'] = None
+
+    _engine_stats['intra_op_num_threads'] = intra_op_num_threads or None
+    _engine_stats['inter_op_num_threads'] = inter_op_num_threads or None
+    return RapidOCR(**kwargs)
+
+
+def warm_up_engine(engine) -> float:
+    """用一张带文字的小图跑一次完整的检测和识别，返回耗时（秒）"""
+    from PIL import Image, ImageDraw
+
+    image = Image.new('RGB', (320, 64), 'white')
+    ImageDraw.Draw(image).text((10, 20), 'LifeTrace 123', fill='black')
+    start_time = time.time()
+    engine(np.array(image))
+    return time.time() - start_time
+
+
+def get_ocr_engine(intra_op_num_threads: Optional[int] = None):
+    """获取进程内共享的OCR引擎，首次调用时加载并预热
+
+    Args:
+        intra_op_num_threads: 仅在首次创建时生效，用于多进程OCR按进程数分配线程
+    """
+    global _engine
+    if _engine is not None:
+        return _engine
+
+    with _engine_lock:
+        if _engine is not None:
+            return _engine
+
+        start_time = time.time()
+        try:
+            engine = create_ocr_engine(intra_op_num_threads=intra_op_num_threads)
+            _engine_stats['load_seconds'] = round(time.time() - start_time, 3)
+            if config.get('ocr.engine.warm_up', True):
+                _engine_stats['warmup_seconds'] = round(warm_up_engine(engine), 3)
+        except Exception as e:
+            _engine_stats['error'] = str(e)
+            raise
+
+        _engine = engine
+        _engine_stats['loaded'] = True
+        _engine_stats['loaded_at'] = datetime.now().isoformat()
+        _engine_stats['error'] = None
+        logger.info(f"OCR引擎已加载: 加载 {_engine_stats['load_seconds']}秒, "
+                    f"预热 {_engine_stats['warmup_seconds']}秒")
+        return _engine
+
+
+def warm_up_in_background() -> Optional[threading.Thread]:
+    """在后台线程加载并预热OCR引擎（例如Web服务器启动时）"""
+    if not RAPIDOCR_AVAILABLE or _engine is not None:
+        return None
+
+    def _load():
+        try:
+            get_ocr_engine()
+        except Exception as e:
+            logger.error(f"后台加载OCR引擎失败: {e}")
+
+    thread = threading.Thread(target=_load, name='ocr-engine-warmup', daemon=True)
+    thread.start()
+    return thread
+
+
+def get_engine_stats() -> dict:
+    """获取OCR引擎加载统计"""
+    return _engine_stats.copy()
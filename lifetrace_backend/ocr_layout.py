@@ -0,0 +1,101 @@
+"""OCR文本框列式存储模块
+
+把一张截图的全部识别条目（四点坐标框、文本、置信度）打包为紧凑的二进制数据，
+保存在 ocr_results.layout 中，供搜索结果高亮、按置信度过滤、脏区域识别等功能使用，
+无需重新运行OCR。
+
+数据格式（小端序）：
+    头部: 魔数 b'LTOL'、版本号(uint8)、图像宽高(uint16 x 2)、条目数(uint32)
+    主体(zlib压缩): 坐标框 uint16[n*8] | 置信度 float16[n] | 文本字节长度 uint32[n] | UTF-8文本
+坐标为识别时（缩放后）图像上的像素坐标，换算到原图时按 原图宽高 / 头部宽高 缩放。
+"""
+
+import struct
+import zlib
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from lifetrace_backend.ocr_regions import OCRItem
+
+_MAGIC = b'LTOL'
+_VERSION = 1
+_HEADER = struct.Struct('<4sBHHI')
+
+
+def pack_ocr_items(items: List[OCRItem], width: int, height: int) -> bytes:
+    """把识别条目打包为二进制数据
+
+    Args:
+        items: 识别条目列表 (四点坐标框, 文本, 置信度)
+        width: 识别时的图像宽度
+        height: 识别时的图像高度
+    """
+    count = len(items)
+    boxes = np.zeros((count, 8), dtype=np.uint16)
+    scores = np.zeros(count, dtype=np.float16)
+    texts = []
+    for i, (box, text, score) in enumerate(items):
+        points = np.asarray(box, dtype=np.float64).reshape(-1)[:8]
+        boxes[i, :len(points)] = np.clip(np.rint(points), 0, 65535)
+        scores[i] = score
+        texts.append((text or '').encode('utf-8'))
+    lengths = np.array([len(text) for text in texts], dtype=np.uint32)
+
+    body = b''.join([
+        boxes.astype('<u2').tobytes(),
+        scores.astype('<f2').tobytes(),
+        lengths.astype('<u4').tobytes(),
+        b''.join(texts)
+    ])
+    header = _HEADER.pack(_MAGIC, _VERSION, min(int(width), 65535), min(int(height), 65535), count)
+    return header + zlib.compress(body, 6)
+
+
+def unpack_ocr_items(data: Optional[bytes]) -> Tuple[List[OCRItem], int, int]:
+    """解包二进制数据
+
+    Returns:
+        (识别条目列表, 识别时图像宽度, 识别时图像高度)，数据为空时返回 ([], 0, 0)
+
+    Raises:
+        ValueError: 数据格式不支持或已损坏（截断、解压失败等）
+    """
+    if not data:
+        return [], 0, 0
+    try:
+        magic, version, width, height, count = _HEADER.unpack_from(data)
+    except struct.error as e:
+        raise ValueError(f"OCR文本框数据头部不完整: {e}") from e
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError(f"不支持的OCR文本框数据格式: {magic!r} v{version}")
+
+    try:
+        body = zlib.decompress(data[_HEADER.size:])
+    except zlib.error as e:
+        raise ValueError(f"OCR文本框数据解压失败: {e}") from e
+    offset = 0
+    boxes = np.frombuffer(body, dtype='<u2', count=count * 8, offset=offset).reshape(count, 8)
+    offset += count * 16
+    scores = np.frombuffer(body, dtype='<f2', count=count, offset=offset)
+    offset += count * 2
+    lengths = np.frombuffer(body, dtype='<u4', count=count, offset=offset)
+    offset += count * 4
+
+    if offset + int(lengths.sum()) > len(body):
+        raise ValueError("OCR文本框数据长度与条目数不符")
+
+    items = []
+    for i in range(count):
+        end = offset + int(lengths[i])
+        text = body[offset:end].decode('utf-8')
+        offset = end
+        box = boxes[i].astype(float).reshape(4, 2).tolist()
+        items.append((box, text, float(scores[i])))
+    return items, width, height
+
+
+def mean_confidence(items: List[OCRItem]) -> float:
+    """计算非空文本条目的平均置信度，没有条目时返回0"""
+    scores = [score for _, text, score in items if text and text.strip()]
+    return float(sum(scores) / len(scores)) if scores else 0.0
@@ -0,0 +1,212 @@
+"""OCR脏区域识别模块
+
+同一屏幕相邻两帧之间往往只有一小块区域变化（编辑器输入、聊天消息）。
+这里按分块比较当前帧与该屏幕上一次识别的帧，只对变化区域运行RapidOCR，
+未变化区域沿用上一帧的文本框，再合并为整帧的识别结果。
+"""
+
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 识别结果条目：(四点坐标框 [[x, y], ...], 文本, 置信度)
+OCRItem = Tuple[List[List[float]], str, float]
+# 矩形区域：(x0, y0, x1, y1)，右下角不包含
+Region = Tuple[int, int, int, int]
+
+
+def normalize_ocr_items(result) -> List[OCRItem]:
+    """把RapidOCR的识别结果转为统一的条目列表"""
+    items = []
+    if not result:
+        return items
+    for item in result:
+        if len(item) < 3:
+            continue
+        box = [[float(point[0]), float(point[1])] for point in item[0]]
+        items.append((box, item[1], float(item[2])))
+    return items
+
+
+def box_bounds(box: List[List[float]]) -> Region:
+    """四点坐标框的外接矩形"""
+    xs = [point[0] for point in box]
+    ys = [point[1] for point in box]
+    return int(min(xs)), int(min(ys)), int(np.ceil(max(xs))), int(np.ceil(max(ys)))
+
+
+def _intersects(a: Region, b: Region) -> bool:
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def _union(a: Region, b: Region) -> Region:
+    return min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])
+
+
+def merge_regions(regions: List[Region]) -> List[Region]:
+    """合并相交的矩形区域，直到两两不相交"""
+    merged = list(regions)
+    changed = True
+    while changed:
+        changed = False
+        result: List[Region] = []
+        for region in merged:
+            for i, existing in enumerate(result):
+                if _intersects(region, existing):
+                    result[i] = _union(region, existing)
+                    changed = True
+                    break
+            else:
+                result.append(region)
+        merged = result
+    return merged
+
+
+def changed_tile_mask(previous: np.ndarray, current: np.ndarray, tile_size: int = 32,
+                      pixel_threshold: int = 16) -> np.ndarray:
+    """比较两帧，返回每个分块是否变化的布尔矩阵
+
+    分块内任一像素在任一通道上的差值超过 pixel_threshold 即视为变化。
+    """
+    diff = np.abs(previous.astype(np.int16) - current.astype(np.int16))
+    if diff.ndim == 3:
+        diff = diff.max(axis=2)
+    changed = diff > pixel_threshold
+    height, width = changed.shape
+    row_edges = np.arange(0, height, tile_size)
+    col_edges = np.arange(0, width, tile_size)
+    tiles = np.add.reduceat(np.add.reduceat(changed.astype(np.int32), row_edges, axis=0), col_edges, axis=1)
+    return tiles > 0
+
+
+def mask_to_regions(mask: np.ndarray, tile_size: int, width: int, height: int,
+                    padding_tiles: int = 1) -> List[Region]:
+    """把变化分块按连通区域转换为像素矩形（向外扩展 padding_tiles 个分块）"""
+    rows, cols = mask.shape
+    visited = np.zeros_like(mask, dtype=bool)
+    regions: List[Region] = []
+    for row, col in zip(*np.nonzero(mask)):
+        if visited[row, col]:
+            continue
+        # 广度优先遍历八连通的变化分块
+        stack = [(row, col)]
+        visited[row, col] = True
+        min_r, min_c, max_r, max_c = row, col, row, col
+        while stack:
+            r, c = stack.pop()
+            min_r, min_c, max_r, max_c = min(min_r, r), min(min_c, c), max(max_r, r), max(max_c, c)
+            for dr in (-1, 0, 1):
+                for dc in (-1, 0, 1):
+                    nr, nc = r + dr, c + dc
+                    if 0 <= nr < rows and 0 <= nc < cols and mask[nr, nc] and not visited[nr, nc]:
+                        visited[nr, nc] = True
+                        stack.append((nr, nc))
+        regions.append((
+            int(max(0, (min_c - padding_tiles) * tile_size)),
+            int(max(0, (min_r - padding_tiles) * tile_size)),
+            int(min(width, (max_c + 1 + padding_tiles) * tile_size)),
+            int(min(height, (max_r + 1 + padding_tiles) * tile_size))
+        ))
+    return merge_regions(regions)
+
+
+def sort_items(items: List[OCRItem]) -> List[OCRItem]:
+    """按阅读顺序（从上到下、从左到右）排列识别结果"""
+    return sorted(items, key=lambda item: (round(box_bounds(item[0])[1] / 10), box_bounds(item[0])[0]))
+
+
+class DirtyRegionOCR:
+    """按屏幕缓存上一帧及其识别结果，只识别变化区域
+
+    帧尺寸变化、没有缓存或变化面积超过 max_changed_ratio 时对整帧识别。
+    """
+
+    def __init__(self, tile_size: int = 32, pixel_threshold: int = 16, max_changed_ratio: float = 0.5):
+        self.tile_size = max(8, int(tile_size))
+        self.pixel_threshold = pixel_threshold
+        self.max_changed_ratio = max_changed_ratio
+        self._frames: Dict[int, Tuple[np.ndarray, List[OCRItem]]] = {}
+        self.stats = {
+            'full_frames': 0,
+            'partial_frames': 0,
+            'unchanged_frames': 0,
+            'regions_recognized': 0,
+            'pixels_total': 0,
+            'pixels_recognized': 0
+        }
+
+    def recognize(self, ocr_engine, image: np.ndarray, screen_id: Optional[int] = None) -> List[OCRItem]:
+        """识别一帧图像（RGB数组），返回整帧的识别结果"""
+        height, width = image.shape[:2]
+        self.stats['pixels_total'] += width * height
+        cached = self._frames.get(screen_id) if screen_id is not None else None
+
+        if cached is None or cached[0].shape != image.shape:
+            return self._recognize_full(ocr_engine, image, screen_id)
+
+        previous, previous_items = cached
+        mask = changed_tile_mask(previous, image, self.tile_size, self.pixel_threshold)
+        if not mask.any():
+            self.stats['unchanged_frames'] += 1
+            self._frames[screen_id] = (image, previous_items)
+            return list(previous_items)
+
+        regions = mask_to_regions(mask, self.tile_size, width, height)
+        regions = self._expand_to_boxes(regions, previous_items, width, height)
+        changed_area = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in regions)
+        if changed_area > self.max_changed_ratio * width * height:
+            return self._recognize_full(ocr_engine, image, screen_id)
+
+        # 保留不与任何变化区域相交的旧文本框，变化区域重新识别
+        items = [item for item in previous_items
+                 if not any(_intersects(box_bounds(item[0]), region) for region in regions)]
+        for x0, y0, x1, y1 in regions:
+            crop = np.ascontiguousarray(image[y0:y1, x0:x1])
+            result, _ = ocr_engine(crop)
+            for box, text, score in normalize_ocr_items(result):
+                items.append(([[x + x0, y + y0] for x, y in box], text, score))
+
+        items = sort_items(items)
+        self.stats['partial_frames'] += 1
+        self.stats['regions_recognized'] += len(regions)
+        self.stats['pixels_recognized'] += changed_area
+        self._frames[screen_id] = (image, items)
+        return items
+
+    def _recognize_full(self, ocr_engine, image: np.ndarray, screen_id: Optional[int]) -> List[OCRItem]:
+        result, _ = ocr_engine(image)
+        items = normalize_ocr_items(result)
+        self.stats['full_frames'] += 1
+        self.stats['pixels_recognized'] += image.shape[0] * image.shape[1]
+        if screen_id is not None:
+            self._frames[screen_id] = (image, items)
+        return items
+
+    @staticmethod
+    def _expand_to_boxes(regions: List[Region], items: List[OCRItem], width: int, height: int) -> List[Region]:
+        """把变化区域扩展到完整包含与之相交的旧文本框，避免一行文字被裁成两半"""
+        expanded = []
+        for region in regions:
+            for box, _, _ in items:
+                bounds = box_bounds(box)
+                if _intersects(bounds, region):
+                    region = _union(region, bounds)
+            x0, y0, x1, y1 = region
+            expanded.append((max(0, x0), max(0, y0), min(width, x1), min(height, y1)))
+        return merge_regions(expanded)
+
+    def reset(self, screen_id: Optional[int] = None):
+        """清空指定屏幕（或全部屏幕）的缓存"""
+        if screen_id is None:
+            self._frames.clear()
+        else:
+            self._frames.pop(screen_id, None)
+
+    def get_stats(self) -> dict:
+        """获取识别统计"""
+        stats = self.stats.copy()
+        stats['recognized_pixel_ratio'] = stats['pixels_recognized'] / max(stats['pixels_total'], 1)
+        return stats
@@ -1,9 +1,14 @@
 import os
 import sys
 import time
+import hashlib
 import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Callable, Union
 from pathlib import Path
 import signal
 from functools import wraps
@@ -15,14 +20,21 @@ if __name__ == '__main__':
 
 import mss
 from PIL import Image
-import imagehash
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
 
 from lifetrace_backend.config import config
 from lifetrace_backend.utils import ensure_dir, get_active_window_info, get_screenshot_filename
 from lifetrace_backend.storage import db_manager
 from lifetrace_backend.logging_config import setup_logging
 from lifetrace_backend.simple_heartbeat import SimpleHeartbeatSender
+from lifetrace_backend.screenshot_notify import ScreenshotNotifier
+from lifetrace_backend.write_behind import PendingScreenshot
 from lifetrace_backend.app_mapping import expand_blacklist_apps
+from lifetrace_backend.frame_hash import compute_phash, hash_to_hex, HashWindowDeduplicator, TileChangeDetector
 
 # 设置日志系统
 logger_manager = setup_logging(config)
@@ -39,40 +51,270 @@ def timeout_handler(signum, frame):
     raise TimeoutError("操作超时")
 
 
+def _process_read_bytes() -> Optional[int]:
+    """当前进程累计从磁盘读取的字节数，psutil不可用或平台不支持时返回None"""
+    if psutil is None:
+        return None
+    try:
+        return psutil.Process().io_counters().read_bytes
+    except Exception:
+        return None
+
+
+# 超时执行器：所有带超时的操作共享一个有界线程池，避免每次调用都创建新线程
+_timeout_executor: Optional[ThreadPoolExecutor] = None
+_timeout_executor_lock = threading.Lock()
+# 当前线程池中超时后仍在执行（卡住）的操作，全部工作线程都卡住时替换线程池
+_stuck_futures = set()
+_timeout_executor_replacements = 0
+_timeout_stats_lock = threading.Lock()
+_timeout_stats = {}  # operation_name -> {'calls', 'timeouts', 'cancelled', 'errors'}
+
+
+def _get_timeout_executor() -> ThreadPoolExecutor:
+    """获取共享的超时执行器（延迟创建）"""
+    global _timeout_executor
+    with _timeout_executor_lock:
+        if _timeout_executor is None:
+            max_workers = max(1, int(config.get('record.timeout_workers', 4)))
+            _timeout_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='recorder-timeout')
+        return _timeout_executor
+
+
+def shutdown_timeout_executor():
+    """关闭共享的超时执行器（不等待仍在后台执行的超时操作）"""
+    global _timeout_executor
+    with _timeout_executor_lock:
+        if _timeout_executor is not None:
+            _timeout_executor.shutdown(wait=False)
+            _timeout_executor = None
+            _stuck_futures.clear()
+
+
+def _track_stuck_future(future, operation_name: str):
+    """记录超时后仍在执行的操作；当前线程池的工作线程全部卡住时换用新的线程池
+
+    卡住的线程无法强制终止，只能放弃：旧线程池不再接收新任务，其线程在操作结束后退出。
+    这样一个挂起的系统API不会让之后的所有调用都排队超时。
+    """
+    global _timeout_executor, _timeout_executor_replacements
+    with _timeout_executor_lock:
+        if future.done() or _timeout_executor is None:
+            return
+        _stuck_futures.add(future)
+        future.add_done_callback(_stuck_futures.discard)
+        max_workers = _timeout_executor._max_workers
+        if len(_stuck_futures) < max_workers:
+            logger.warning(f"{operation_name}超时后仍在执行，"
+                           f"超时线程池已有 {len(_stuck_futures)}/{max_workers} 个线程卡住")
+            return
+        
+        _timeout_executor.shutdown(wait=False)
+        _timeout_executor = None
+        _stuck_futures.clear()
+        _timeout_executor_replacements += 1
+        logger.error(f"超时线程池的 {max_workers} 个线程全部卡住，已换用新的线程池"
+                     f"（累计替换 {_timeout_executor_replacements} 次，卡住的线程在操作结束后退出）")
+
+
+def _record_timeout_stat(operation_name: str, key: str):
+    """累计超时操作统计"""
+    with _timeout_stats_lock:
+        stats = _timeout_stats.setdefault(operation_name, {'calls': 0, 'timeouts': 0, 'cancelled': 0, 'errors': 0})
+        stats[key] += 1
+
+
+def get_timeout_stats() -> dict:
+    """获取各操作的调用/超时/取消/异常次数，以及卡住的线程数和线程池替换次数"""
+    with _timeout_stats_lock:
+        stats = {name: stats.copy() for name, stats in _timeout_stats.items()}
+    with _timeout_executor_lock:
+        stats['_executor'] = {
+            'stuck_workers': len(_stuck_futures),
+            'replacements': _timeout_executor_replacements
+        }
+    return stats
+
+
 def with_timeout(timeout_seconds=5, operation_name="操作"):
-    """超时装饰器"""
+    """超时装饰器
+    
+    操作在共享的有界线程池中执行，调用方最多等待 timeout_seconds 秒。
+    超时后返回None：仍在排队的操作被取消，不会在调用方放弃后才执行；
+    已开始的操作无法被强制终止，记为卡住的线程，全部线程卡住时替换线程池。
+    """
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
-            # 在Windows上，signal.alarm不可用，使用threading.Timer作为替代
-            import threading
-            result = [None]
-            exception = [None]
-            
-            def target():
-                try:
-                    result[0] = func(*args, **kwargs)
-                except Exception as e:
-                    exception[0] = e
-            
-            thread = threading.Thread(target=target)
-            thread.daemon = True
-            thread.start()
-            thread.join(timeout_seconds)
-            
-            if thread.is_alive():
-                logger.warning(f"{operation_name}超时 ({timeout_seconds}秒)，操作可能仍在后台执行")
-                # 注意：无法强制终止线程，只能记录超时
+            _record_timeout_stat(operation_name, 'calls')
+            future = _get_timeout_executor().submit(func, *args, **kwargs)
+            try:
+                return future.result(timeout=timeout_seconds)
+            except FutureTimeoutError:
+                _record_timeout_stat(operation_name, 'timeouts')
+                if future.cancel():
+                    _record_timeout_stat(operation_name, 'cancelled')
+                    logger.warning(f"{operation_name}超时 ({timeout_seconds}秒)，操作仍在排队，已取消")
+                else:
+                    logger.warning(f"{operation_name}超时 ({timeout_seconds}秒)，操作可能仍在后台执行")
+                    _track_stuck_future(future, operation_name)
                 return None
-            
-            if exception[0]:
-                raise exception[0]
-            
-            return result[0]
+            except Exception:
+                _record_timeout_stat(operation_name, 'errors')
+                raise
         return wrapper
     return decorator
 
 
+@dataclass
+class CaptureFrame:
+    """采集线程交给后台流水线的一帧截图"""
+    seq: int
+    screen_id: int
+    screenshot: object  # mss 截图对象（已在内存中）
+    file_path: str
+    timestamp: datetime
+    app_name: Optional[str]
+    window_title: Optional[str]
+    image_hash: Optional[int] = None
+
+
+class CapturePipeline:
+    """截图后台处理流水线（生产者/消费者）
+    
+    采集线程只负责截图和计算哈希，编码、写盘和数据库记录由固定数量的
+    工作线程完成。队列有界，满时丢弃最旧的帧，保证采集节奏不被拖慢。
+    数据库写入按提交顺序串行执行，避免事件切分因乱序而出错。
+    """
+    
+    def __init__(self, handler: Callable[[CaptureFrame], None], workers: int = 2, queue_size: int = 8):
+        self.handler = handler
+        self.workers = max(1, int(workers))
+        self.queue_size = max(1, int(queue_size))
+        
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._running = False
+        
+        # 顺序提交控制：按seq依次进入数据库阶段
+        self._next_seq = 0
+        self._next_commit_seq = 0
+        self._finished_seqs = set()
+        self._commit_cond = threading.Condition()
+        
+        self.stats = {
+            'submitted': 0,
+            'processed': 0,
+            'dropped': 0,
+            'failed': 0,
+            'max_queue_depth': 0
+        }
+    
+    def start(self):
+        """启动工作线程"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"capture-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"截图处理流水线已启动，工作线程: {self.workers}，队列容量: {self.queue_size}")
+    
+    def stop(self, timeout: float = 10.0):
+        """停止流水线，等待队列中已有的帧处理完成"""
+        with self._cond:
+            if not self._running:
+                return
+            self._running = False
+            self._cond.notify_all()
+        
+        deadline = time.time() + timeout
+        for thread in self._threads:
+            thread.join(max(0, deadline - time.time()))
+        self._threads = []
+        
+        remaining = len(self._queue)
+        if remaining:
+            logger.warning(f"截图处理流水线停止时仍有 {remaining} 帧未处理")
+        logger.info(f"截图处理流水线已停止，统计: {self.get_stats()}")
+    
+    def next_seq(self) -> int:
+        """分配帧序号（仅在采集线程中调用）"""
+        seq = self._next_seq
+        self._next_seq += 1
+        return seq
+    
+    def submit(self, frame: CaptureFrame) -> Optional[CaptureFrame]:
+        """提交一帧，队列已满时丢弃最旧的帧
+        
+        Returns:
+            被丢弃的帧，没有丢帧时返回None
+        """
+        dropped_frame = None
+        with self._cond:
+            if len(self._queue) >= self.queue_size:
+                dropped_frame = self._queue.popleft()
+                self.stats['dropped'] += 1
+            self._queue.append(frame)
+            self.stats['submitted'] += 1
+            self.stats['max_queue_depth'] = max(self.stats['max_queue_depth'], len(self._queue))
+            self._cond.notify()
+        
+        if dropped_frame is not None:
+            # 被丢弃的帧不会再提交，放行后续帧
+            self._mark_finished(dropped_frame.seq)
+            logger.warning(f"截图处理积压，丢弃最旧的帧: {os.path.basename(dropped_frame.file_path)}")
+        return dropped_frame
+    
+    def wait_for_turn(self, seq: int):
+        """等待轮到该帧进入顺序提交阶段"""
+        with self._commit_cond:
+            while seq != self._next_commit_seq:
+                self._commit_cond.wait(timeout=1.0)
+    
+    def _mark_finished(self, seq: int):
+        """标记帧处理结束并推进提交序号"""
+        with self._commit_cond:
+            self._finished_seqs.add(seq)
+            while self._next_commit_seq in self._finished_seqs:
+                self._finished_seqs.discard(self._next_commit_seq)
+                self._next_commit_seq += 1
+            self._commit_cond.notify_all()
+    
+    def _worker_loop(self):
+        """工作线程循环"""
+        while True:
+            with self._cond:
+                while self._running and not self._queue:
+                    self._cond.wait(timeout=1.0)
+                if not self._queue:
+                    # 已停止且队列为空
+                    return
+                frame = self._queue.popleft()
+            
+            try:
+                self.handler(frame)
+                with self._cond:
+                    self.stats['processed'] += 1
+            except Exception as e:
+                with self._cond:
+                    self.stats['failed'] += 1
+                logger.error(f"后台处理截图失败 (屏幕 {frame.screen_id}): {e}")
+            finally:
+                self._mark_finished(frame.seq)
+    
+    def get_stats(self) -> dict:
+        """获取流水线统计信息"""
+        with self._cond:
+            stats = self.stats.copy()
+            stats['queue_depth'] = len(self._queue)
+        return stats
+
+
 class ScreenRecorder:
     """屏幕录制器"""
     
@@ -92,12 +334,53 @@ class ScreenRecorder:
         # 初始化截图目录
         ensure_dir(self.screenshots_dir)
         
-        # 上一张截图的哈希值（用于去重）
-        self.last_hashes = {}
+        # 每个屏幕最近保存截图的哈希窗口（用于去重）
+        self.dedup_window = self.config.get('storage.dedup_window', 4)
+        self.deduplicator = HashWindowDeduplicator(self.dedup_window)
+        
+        # 分块变化检测：画面没有任何分块变化时跳过哈希和编码
+        self.change_detection = self.config.get('record.change_detection.enabled', True)
+        self.change_detector = TileChangeDetector(
+            tile_size=self.config.get('record.change_detection.tile_size', 64),
+            stride=self.config.get('record.change_detection.stride', 1)
+        )
+        
+        # 持久化的mss截图句柄（只在创建它的采集线程中使用）
+        self._sct = None
+        self._sct_thread_id = None
+        
+        # 截图保存的磁盘I/O统计（流水线下由多个线程更新）
+        self._io_lock = threading.Lock()
+        self.io_stats = {
+            'frames_saved': 0,
+            'bytes_written': 0
+        }
+        # 读取量由操作系统按进程统计（保存截图不回读文件，这里用来验证这一点）
+        self._read_bytes_baseline = _process_read_bytes()
+        
+        # 后台处理流水线配置（采集线程只截图和计算哈希，编码/写盘/入库在后台完成）
+        self.pipeline_enabled = self.config.get('record.pipeline.enabled', True)
+        self.pipeline = None
+        if self.pipeline_enabled:
+            self.pipeline = CapturePipeline(
+                handler=self._process_frame,
+                workers=self.config.get('record.pipeline.workers', 2),
+                queue_size=self.config.get('record.pipeline.queue_size', 8)
+            )
+        # 后台线程保存完成的截图路径，由采集线程在 capture_all_screens 中取走
+        self._saved_paths = deque(maxlen=1000)
         
         # 初始化UDP心跳发送器
         self.heartbeat_sender = SimpleHeartbeatSender('recorder')
         
+        # 新截图入库后通知OCR进程立即处理
+        self.notifier = None
+        if self.config.get('ocr.notify.enabled', True):
+            self.notifier = ScreenshotNotifier(
+                host=self.config.get('ocr.notify.host', '127.0.0.1'),
+                port=self.config.get('ocr.notify.port', 9998)
+            )
+        
         logger.info(f"超时配置 - 文件I/O: {self.file_io_timeout}s, 数据库: {self.db_timeout}s, 窗口信息: {self.window_info_timeout}s")
         
         logger.info(f"屏幕录制器初始化完成，监控屏幕: {self.screens}")
@@ -121,6 +404,8 @@ class ScreenRecorder:
             if old_screens_config != new_screens_config:
                 old_screens = self.screens
                 self.screens = self._get_screen_list()
+                # 显示器信息在mss句柄中有缓存，让采集线程下次截图时重新创建句柄
+                self._sct_thread_id = None
                 logger.info(f"监控屏幕已更新: {old_screens} -> {self.screens}")
             
             # 更新去重配置
@@ -136,6 +421,24 @@ class ScreenRecorder:
                 self.hash_threshold = new_threshold
                 logger.info(f"去重阈值已更新: {old_threshold} -> {new_threshold}")
             
+            # 更新去重哈希窗口大小
+            new_window = new_config.get('storage', {}).get('dedup_window', 4)
+            if new_window != self.dedup_window:
+                old_window = self.dedup_window
+                self.dedup_window = new_window
+                self.deduplicator.resize(new_window)
+                logger.info(f"去重哈希窗口已更新: {old_window} -> {new_window}")
+            
+            # 更新分块变化检测配置
+            old_detection = old_config.get('record', {}).get('change_detection', {})
+            new_detection = new_config.get('record', {}).get('change_detection', {})
+            if old_detection != new_detection:
+                self.change_detection = new_detection.get('enabled', True)
+                self.change_detector.tile_size = new_detection.get('tile_size', 64)
+                self.change_detector.stride = new_detection.get('stride', 1)
+                self.change_detector.reset()
+                logger.info(f"分块变化检测配置已更新: {new_detection}")
+            
             # 更新黑名单配置
             old_blacklist = old_config.get('record', {}).get('blacklist', {})
             new_blacklist = new_config.get('record', {}).get('blacklist', {})
@@ -154,51 +457,56 @@ class ScreenRecorder:
         except Exception as e:
             logger.error(f"处理配置变更失败: {e}")
     
-    def _save_screenshot(self, screenshot, file_path: str) -> bool:
-        """保存截图到文件"""
+    def _encode_screenshot(self, screenshot) -> bytes:
+        """在内存中将截图编码为PNG"""
+        return mss.tools.to_png(screenshot.rgb, screenshot.size)
+    
+    def _save_screenshot(self, png_bytes: bytes, file_path: str) -> bool:
+        """将已编码的PNG写入文件（只写一次，不回读）"""
         @with_timeout(timeout_seconds=self.file_io_timeout, operation_name="保存截图文件")
         def _do_save():
-            mss.tools.to_png(screenshot.rgb, screenshot.size, output=file_path)
+            with open(file_path, 'wb') as f:
+                f.write(png_bytes)
             return True
         
         try:
             result = _do_save()
+            if result:
+                self._record_io(bytes_written=len(png_bytes))
             return result if result is not None else False
         except Exception as e:
             logger.error(f"保存截图失败 {file_path}: {e}")
             return False
     
-    def _get_image_size(self, file_path: str) -> tuple:
-        """获取图像尺寸"""
-        @with_timeout(timeout_seconds=self.file_io_timeout, operation_name="读取图像尺寸")
-        def _do_get_size():
-            with Image.open(file_path) as img:
-                return img.size
-        
-        try:
-            result = _do_get_size()
-            return result if result is not None else (0, 0)
-        except Exception as e:
-            logger.error(f"读取图像尺寸失败 {file_path}: {e}")
-            return (0, 0)
+    def _record_io(self, bytes_written: int = 0, frames_saved: int = 0):
+        """累计截图保存过程中的磁盘写入量"""
+        with self._io_lock:
+            self.io_stats['bytes_written'] += bytes_written
+            self.io_stats['frames_saved'] += frames_saved
     
-    def _calculate_file_hash(self, file_path: str) -> str:
-        """计算文件MD5哈希"""
-        @with_timeout(timeout_seconds=self.file_io_timeout, operation_name="计算文件哈希")
-        def _do_calculate_hash():
-            import hashlib
-            with open(file_path, 'rb') as f:
-                return hashlib.md5(f.read()).hexdigest()
+    def get_io_stats(self) -> dict:
+        """获取截图保存的磁盘I/O统计
         
-        try:
-            result = _do_calculate_hash()
-            return result if result is not None else ""
-        except Exception as e:
-            logger.error(f"计算文件哈希失败 {file_path}: {e}")
-            return ""
+        截图元数据在内存中计算，保存过程不回读文件。bytes_read 是录制器启动以来本进程实际的磁盘读取量
+        （操作系统统计，包含数据库等其他读取），bytes_read_per_capture 是它对每张已保存截图的平均值，
+        是保存过程回读量的上限；psutil不可用或平台不支持时为None。
+        """
+        with self._io_lock:
+            stats = self.io_stats.copy()
+        frames = max(stats['frames_saved'], 1)
+        stats['bytes_written_per_capture'] = stats['bytes_written'] / frames
+        read_bytes = _process_read_bytes()
+        if read_bytes is None or self._read_bytes_baseline is None:
+            stats['bytes_read'] = None
+            stats['bytes_read_per_capture'] = None
+        else:
+            stats['bytes_read'] = read_bytes - self._read_bytes_baseline
+            stats['bytes_read_per_capture'] = stats['bytes_read'] / frames
+        return stats
     
     def _save_to_database(self, file_path: str, file_hash: str, width: int, height: int, 
-                         screen_id: int, app_name: str, window_title: str, timestamp) -> Optional[int]:
+                         screen_id: int, app_name: str, window_title: str, timestamp,
+                         file_size: Optional[int] = None, phash: Optional[str] = None) -> Optional[int]:
         """保存截图信息到数据库"""
         @with_timeout(timeout_seconds=self.db_timeout, operation_name="数据库操作")
         def _do_save_to_db():
@@ -213,7 +521,9 @@ class ScreenRecorder:
                 screen_id=screen_id,
                 app_name=app_name or "未知应用",
                 window_title=window_title or "未知窗口",
-                event_id=event_id
+                event_id=event_id,
+                file_size=file_size,
+                phash=phash
             )
             return screenshot_id
         
@@ -336,7 +646,7 @@ class ScreenRecorder:
     def _get_screen_list(self) -> List[int]:
         """获取要截图的屏幕列表"""
         screens_config = self.config.get('record.screens', 'all')
-        print(screens_config)
+        logger.debug(f"截图屏幕配置: {screens_config}")
         with mss.mss() as sct:
             monitor_count = len(sct.monitors) - 1  # 减1因为第0个是所有屏幕的组合
             
@@ -347,134 +657,231 @@ class ScreenRecorder:
             else:
                 return [1] if monitor_count > 0 else []
     
-    def _calculate_image_hash(self, image_path: str) -> str:
-        """计算图像感知哈希值"""
-        @with_timeout(timeout_seconds=self.file_io_timeout, operation_name="计算图像哈希")
-        def _do_calculate_hash():
-            with Image.open(image_path) as img:
-                return str(imagehash.phash(img))
+    def _calculate_image_hash_from_memory(self, screenshot) -> Optional[int]:
+        """直接从内存中的截图BGRA缓冲区计算64位感知哈希值
         
+        纯内存计算（降采样后的numpy运算），不经过PIL，也不需要超时保护。
+        """
         try:
-            result = _do_calculate_hash()
-            return result if result is not None else ""
-        except Exception as e:
-            logging.error(f"计算图像哈希失败 {image_path}: {e}")
-            return ""
-    
-    def _calculate_image_hash_from_memory(self, screenshot) -> str:
-        """直接从内存中的截图计算图像感知哈希值"""
-        @with_timeout(timeout_seconds=self.file_io_timeout, operation_name="从内存计算图像哈希")
-        def _do_calculate_hash():
-            # 将mss截图转换为PIL Image对象
-            img = Image.frombytes('RGB', screenshot.size, screenshot.rgb)
-            return str(imagehash.phash(img))
-        
-        try:
-            result = _do_calculate_hash()
-            return result if result is not None else ""
+            return compute_phash(screenshot.raw, screenshot.width, screenshot.height)
         except Exception as e:
             logger.error(f"从内存计算图像哈希失败: {e}")
-            return ""
+            return None
     
-    def _is_duplicate(self, screen_id: int, image_hash: str) -> bool:
-        """检查是否为重复图像"""
+    def _is_duplicate(self, screen_id: int, image_hash: int) -> bool:
+        """检查是否与该屏幕近期保存的截图重复"""
         if not self.deduplicate:
             return False
-            
-        if screen_id not in self.last_hashes:
-            return False
-            
-        last_hash = self.last_hashes[screen_id]
+        
         try:
-            # 计算汉明距离
-            current = imagehash.hex_to_hash(image_hash)
-            previous = imagehash.hex_to_hash(last_hash)
-            distance = current - previous
-            
-            is_duplicate = distance <= self.hash_threshold
+            is_duplicate, distance = self.deduplicator.is_duplicate(screen_id, image_hash, self.hash_threshold)
             
             # 简单的去重通知
             if is_duplicate:
-                logger.info(f"屏幕 {screen_id}: 跳过重复截图")
-                print(f"[去重] 屏幕 {screen_id}: 跳过重复截图")
+                logger.info(f"[去重] 屏幕 {screen_id}: 跳过重复截图 (汉明距离 {distance})")
             
             return is_duplicate
         except Exception as e:
             logger.error(f"比较图像哈希失败: {e}")
             return False
     
-    def _capture_screen(self, screen_id: int, app_name: str = None, window_title: str = None) -> Optional[str]:
-        """截取指定屏幕"""
+    def _capture_screen(self, screen_id: int, app_name: str = None,
+                        window_title: str = None) -> Optional[Union[str, int]]:
+        """截取指定屏幕
+        
+        启用流水线时只在当前线程完成截图、哈希和去重，其余步骤交给后台线程；
+        否则在当前线程同步完成全部处理。
+        
+        Returns:
+            同步处理时为已保存的截图路径；启用流水线时为已提交帧的序号（文件此时尚未写入，
+            也可能因积压被丢弃，保存完成后才由 capture_all_screens 报告路径）；跳过或失败时为None
+        """
         try:
-            with mss.mss() as sct:
-                if screen_id >= len(sct.monitors):
-                    logger.warning(f"屏幕ID {screen_id} 不存在")
-                    return None
-                
-                monitor = sct.monitors[screen_id]
+            sct = self._get_sct()
+            if screen_id >= len(sct.monitors):
+                logger.warning(f"屏幕ID {screen_id} 不存在")
+                return None
+            
+            monitor = sct.monitors[screen_id]
+            try:
                 screenshot = sct.grab(monitor)
-                
-                # 生成文件名
-                timestamp = datetime.now()
-                filename = get_screenshot_filename(screen_id, timestamp)
-                file_path = os.path.join(self.screenshots_dir, filename)
-                
-                # 优化：先从内存计算图像哈希，避免不必要的磁盘I/O
-                image_hash = self._calculate_image_hash_from_memory(screenshot)
-                if not image_hash:
-                    logger.error(f"计算图像哈希失败，跳过: {filename}")
-                    return None
-                
-                # 检查是否重复
-                if self._is_duplicate(screen_id, image_hash):
-                    # 重复图像直接返回，不保存到磁盘
-                    logger.debug(f"检测到重复截图，跳过保存: {filename}")
-                    return None
-                
-                # 更新哈希记录
-                self.last_hashes[screen_id] = image_hash
-                
-                # 只有非重复图像才保存到磁盘
-                if not self._save_screenshot(screenshot, file_path):
-                    logger.error(f"保存截图失败: {filename}")
+            except Exception:
+                # 截图句柄可能已失效（如显示器变化），下次重新创建
+                self._close_sct()
+                raise
+            
+            # 生成文件名
+            timestamp = datetime.now()
+            filename = get_screenshot_filename(screen_id, timestamp)
+            file_path = os.path.join(self.screenshots_dir, filename)
+            
+            # 预过滤：与上一帧的分块校验和完全一致时跳过哈希和编码
+            # 只在启用去重时生效，否则每一帧都应保存
+            if self.deduplicate and self.change_detection:
+                changed, _ = self.change_detector.check(screen_id, screenshot.raw, screenshot.width, screenshot.height)
+                if not changed:
+                    logger.debug(f"屏幕 {screen_id}: 画面无变化，跳过: {filename}")
                     return None
-                
-                # 使用传入的窗口信息，如果没有则重新获取
-                if app_name is None or window_title is None:
-                    app_name, window_title = self._get_window_info()
-                
-                # 获取图像尺寸（带超时）
-                width, height = self._get_image_size(file_path)
-                
-                # 计算文件哈希（带超时）
-                file_hash = self._calculate_file_hash(file_path)
-                if not file_hash:
-                    logger.warning(f"计算文件哈希失败，使用空值: {filename}")
-                    file_hash = ""
-                
-                # 保存截图信息到数据库（带超时）
-                screenshot_id = self._save_to_database(
-                    file_path, file_hash, width, height, 
-                    screen_id, app_name, window_title, timestamp
+            
+            # 优化：先从内存计算图像哈希，避免不必要的磁盘I/O
+            image_hash = self._calculate_image_hash_from_memory(screenshot)
+            if image_hash is None:
+                logger.error(f"计算图像哈希失败，跳过: {filename}")
+                return None
+            
+            # 检查是否重复
+            if self._is_duplicate(screen_id, image_hash):
+                # 重复图像直接返回，不保存到磁盘
+                logger.debug(f"检测到重复截图，跳过保存: {filename}")
+                return None
+            
+            # 更新哈希窗口
+            self.deduplicator.add(screen_id, image_hash)
+            
+            # 使用传入的窗口信息，如果没有则重新获取
+            if app_name is None or window_title is None:
+                app_name, window_title = self._get_window_info()
+            
+            if self.pipeline is not None:
+                frame = CaptureFrame(
+                    seq=self.pipeline.next_seq(),
+                    screen_id=screen_id,
+                    screenshot=screenshot,
+                    file_path=file_path,
+                    timestamp=timestamp,
+                    app_name=app_name,
+                    window_title=window_title,
+                    image_hash=image_hash
                 )
-                
-                if screenshot_id:
-                    logger.debug(f"截图记录已保存到数据库: {screenshot_id}")
-                else:
-                    logger.warning(f"数据库保存失败，但文件已保存: {filename}")
-                
-                file_size = os.path.getsize(file_path)
-                
-                logger.info(f"截图保存: {filename} ({file_size} bytes) - {app_name}")
-                
-                return file_path
+                dropped_frame = self.pipeline.submit(frame)
+                if dropped_frame is not None:
+                    self._forget_frame(dropped_frame)
+                return frame.seq
+            
+            return self._persist_frame(screen_id, screenshot, file_path, timestamp, app_name, window_title,
+                                       image_hash=image_hash)
                 
         except Exception as e:
             logger.error(f"截图失败 (屏幕 {screen_id}): {e}")
             return None
     
+    def _forget_frame(self, frame: CaptureFrame):
+        """撤销未保存帧对去重状态的影响，避免相同画面此后一直被跳过"""
+        if frame.image_hash is not None:
+            self.deduplicator.discard(frame.screen_id, frame.image_hash)
+        self.change_detector.reset(frame.screen_id)
+    
+    def _get_sct(self):
+        """获取当前采集线程的mss句柄，不存在时创建
+        
+        mss句柄与创建它的线程绑定（Windows下使用线程相关的DC），
+        因此采集线程变化时重新创建。
+        """
+        thread_id = threading.get_ident()
+        if self._sct is None or self._sct_thread_id != thread_id:
+            self._close_sct()
+            self._sct = mss.mss()
+            self._sct_thread_id = thread_id
+        return self._sct
+    
+    def _close_sct(self):
+        """关闭mss句柄"""
+        if self._sct is not None:
+            try:
+                self._sct.close()
+            except Exception as e:
+                logger.debug(f"关闭mss句柄失败: {e}")
+            self._sct = None
+            self._sct_thread_id = None
+    
+    def _process_frame(self, frame: CaptureFrame):
+        """流水线工作线程处理单帧，保存完成后才记录截图路径"""
+        file_path = self._persist_frame(
+            frame.screen_id, frame.screenshot, frame.file_path, frame.timestamp,
+            frame.app_name, frame.window_title, seq=frame.seq, image_hash=frame.image_hash
+        )
+        if file_path:
+            self._saved_paths.append(file_path)
+    
+    def _drain_saved_paths(self) -> List[str]:
+        """取走后台线程已保存完成的截图路径"""
+        saved = []
+        while self._saved_paths:
+            saved.append(self._saved_paths.popleft())
+        return saved
+    
+    def _persist_frame(self, screen_id: int, screenshot, file_path: str, timestamp,
+                       app_name: str, window_title: str, seq: Optional[int] = None,
+                       image_hash: Optional[int] = None) -> Optional[str]:
+        """编码并保存截图文件，然后写入数据库
+        
+        Args:
+            seq: 流水线帧序号，非空时数据库写入按序号顺序执行
+            image_hash: 感知哈希，随截图记录保存（OCR据此复用几乎相同画面的识别结果）
+        """
+        filename = os.path.basename(file_path)
+        phash = hash_to_hex(image_hash) if image_hash is not None else None
+        
+        # 在内存中编码并计算文件哈希，尺寸直接取自截图对象，避免写盘后回读
+        try:
+            png_bytes = self._encode_screenshot(screenshot)
+        except Exception as e:
+            logger.error(f"编码截图失败 {filename}: {e}")
+            return None
+        width, height = screenshot.size
+        file_hash = hashlib.md5(png_bytes).hexdigest()
+        file_size = len(png_bytes)
+        
+        # 只有非重复图像才保存到磁盘
+        if not self._save_screenshot(png_bytes, file_path):
+            logger.error(f"保存截图失败: {filename}")
+            return None
+        self._record_io(frames_saved=1)
+        
+        # 保存截图信息到数据库（带超时），流水线模式下按帧顺序提交
+        if seq is not None:
+            self.pipeline.wait_for_turn(seq)
+        
+        if db_manager.write_behind is not None:
+            # 批量写入：只加入内存队列，由后台线程按批提交（事件也在提交时解析）
+            db_manager.enqueue_screenshot(
+                file_path=file_path,
+                file_hash=file_hash,
+                width=width,
+                height=height,
+                screen_id=screen_id,
+                app_name=app_name or "未知应用",
+                window_title=window_title or "未知窗口",
+                timestamp=timestamp,
+                file_size=file_size,
+                phash=phash
+            )
+            logger.info(f"截图保存: {filename} ({file_size} bytes) - {app_name}")
+            return file_path
+        
+        screenshot_id = self._save_to_database(
+            file_path, file_hash, width, height, 
+            screen_id, app_name, window_title, timestamp, file_size=file_size, phash=phash
+        )
+        
+        if screenshot_id:
+            logger.debug(f"截图记录已保存到数据库: {screenshot_id}")
+            if self.notifier is not None:
+                self.notifier.notify()
+        else:
+            logger.warning(f"数据库保存失败，但文件已保存: {filename}")
+        
+        logger.info(f"截图保存: {filename} ({file_size} bytes) - {app_name}")
+        
+        return file_path
+    
     def capture_all_screens(self) -> List[str]:
-        """截取所有屏幕"""
+        """截取所有屏幕
+        
+        Returns:
+            已保存到磁盘的截图路径。启用流水线时本次提交的帧还在后台处理，
+            返回的是自上次调用以来后台线程保存完成的截图
+        """
         captured_files = []
         
         # 获取当前活动窗口信息，用于黑名单检查
@@ -493,16 +900,22 @@ class ScreenRecorder:
             except Exception as e:
                 logger.error(f"关闭活跃事件失败: {e}")
             
-            return captured_files
+            return self._drain_saved_paths()
         
         # 记录应用使用信息到新表（在截图前记录，避免跳过和去重的影响）
         self._log_app_usage(app_name, window_title)
         
+        submitted = 0
         for screen_id in self.screens:
-            file_path = self._capture_screen(screen_id, app_name, window_title)
-            if file_path:
-                captured_files.append(file_path)
+            result = self._capture_screen(screen_id, app_name, window_title)
+            if isinstance(result, str):
+                captured_files.append(result)
+            elif result is not None:
+                submitted += 1
+        if submitted:
+            logger.debug(f"本次提交 {submitted} 帧到后台处理")
 
+        captured_files.extend(self._drain_saved_paths())
         return captured_files
     
     def _log_app_usage(self, app_name: str, window_title: str = None):
@@ -511,6 +924,19 @@ class ScreenRecorder:
             # 计算持续时间（使用截图间隔作为估算）
             duration_seconds = self.interval
             
+            # 合并模式：应用和窗口不变时只延长当前记录的时长，切换时才插入新行
+            coalesce = self.config.get('storage.app_usage.coalesce', True)
+            if coalesce or db_manager.write_behind is not None:
+                db_manager.enqueue_app_usage_log(
+                    app_name=app_name,
+                    window_title=window_title,
+                    duration_seconds=duration_seconds,
+                    screen_id=0,
+                    timestamp=datetime.now(),
+                    coalesce=coalesce
+                )
+                return
+            
             # 记录到数据库
             log_id = db_manager.add_app_usage_log(
                 app_name=app_name,
@@ -539,22 +965,43 @@ class ScreenRecorder:
         # 启动UDP心跳发送
         self.heartbeat_sender.start(interval=1.0)
         
+        # 启动批量写入（截图、事件和应用使用记录按批提交）
+        if self.config.get('storage.write_behind.enabled', True):
+            db_manager.start_write_behind(
+                batch_size=self.config.get('storage.write_behind.batch_size', 50),
+                flush_interval_ms=self.config.get('storage.write_behind.flush_interval_ms', 1000),
+                on_flush=self._notify_written_batch
+            )
+        
+        # 启动后台处理流水线
+        if self.pipeline is not None:
+            self.pipeline.start()
+        
         try:
             while True:
                 start_time = time.time()
                 
                 # 发送心跳（包含额外数据）
-                self.heartbeat_sender.send_heartbeat({
+                heartbeat_data = {
                     'status': 'running',
                     'screens': len(self.screens),
                     'interval': self.interval
-                })
+                }
+                heartbeat_data['io'] = self.get_io_stats()
+                heartbeat_data['timeouts'] = get_timeout_stats()
+                if self.pipeline is not None:
+                    heartbeat_data['pipeline'] = self.pipeline.get_stats()
+                if db_manager.write_behind is not None:
+                    heartbeat_data['write_behind'] = db_manager.write_behind.get_stats()
+                if self.change_detection:
+                    heartbeat_data['change_detection'] = self.change_detector.get_stats()
+                self.heartbeat_sender.send_heartbeat(heartbeat_data)
                 
                 # 截图
                 captured_files = self.capture_all_screens()
                 
                 if captured_files:
-                    logger.debug(f"本次截取了 {len(captured_files)} 张截图")
+                    logger.debug(f"已保存 {len(captured_files)} 张截图")
                 
                 # 计算下次截图时间
                 elapsed = time.time() - start_time
@@ -575,14 +1022,34 @@ class ScreenRecorder:
             self._print_final_stats()
             raise
         finally:
+            # 停止后台处理流水线，处理完已提交的帧
+            if self.pipeline is not None:
+                self.pipeline.stop()
+            # 流水线排空后写完剩余记录
+            db_manager.stop_write_behind()
+            self._close_sct()
+            if self.notifier is not None:
+                self.notifier.close()
+            shutdown_timeout_executor()
             # 停止配置文件监听
             self.config.stop_watching()
             logger.info("已停止配置文件监听")
             # 停止心跳发送
             self.heartbeat_sender.stop()
     
+    def _notify_written_batch(self, batch: list):
+        """批量写入提交后，若本批包含截图则通知OCR进程"""
+        if self.notifier is None:
+            return
+        count = sum(1 for record in batch if isinstance(record, PendingScreenshot))
+        if count:
+            self.notifier.notify(count)
+    
     def _print_final_stats(self):
         """输出最终统计信息"""
+        logger.info(f"截图保存I/O统计: {self.get_io_stats()}")
+        logger.info(f"超时操作统计: {get_timeout_stats()}")
+        logger.info(f"分块变化检测统计: {self.change_detector.get_stats()}")
         logger.info("录制会话结束")
         print("录制结束")
 
@@ -60,8 +60,18 @@ class RetrievalService:
                     app_filters = [Screenshot.app_name.ilike(f"%{app}%") for app in conditions.app_names]
                     query = query.filter(or_(*app_filters))
                 
-                # 添加关键词过滤
-                if conditions.keywords:
+                # 关键词倒排索引：先用倒排列表求交集得到候选截图，下面的子串匹配只作用于候选集
+                posting_ids = self.db_manager.keyword_posting_query(conditions.keywords) if conditions.keywords else None
+                if posting_ids is not None:
+                    query = query.filter(Screenshot.id.in_(posting_ids))
+                
+                # 添加关键词过滤：优先使用全文索引（按bm25相关性排序），否则退回到子串匹配
+                fts_match = self.db_manager.build_fts_match(conditions.keywords) if conditions.keywords else None
+                if fts_match:
+                    fts = self.db_manager.fts_ranked_ocr_ids(fts_match)
+                    query = query.join(fts, fts.c.ocr_id == OCRResult.id)
+                    query = query.order_by(fts.c.fts_rank.asc())
+                elif conditions.keywords:
                     keyword_filters = []
                     for keyword in conditions.keywords:
                         keyword_filters.append(OCRResult.text_content.ilike(f"%{keyword}%"))
@@ -72,7 +82,7 @@ class RetrievalService:
                     else:
                         query = query.filter(keyword_filters[0])
                 
-                # 按时间倒序排列
+                # 按时间倒序排列（有全文检索时作为相关性之后的次序）
                 query = query.order_by(Screenshot.created_at.desc())
                 
                 # 限制结果数量 - 优先使用QueryConditions中的limit
@@ -0,0 +1,131 @@
+"""
+新截图通知机制
+录制进程每提交一批截图就向本机UDP端口发送一个通知，
+OCR进程阻塞等待通知，有新截图时立即处理，空闲时不再轮询数据库。
+通知只用于唤醒，丢失也不影响正确性：OCR进程等待超时后仍会检查一次数据库。
+"""
+import json
+import logging
+import os
+import select
+import socket
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ScreenshotNotifier:
+    """新截图通知发送器 - 在录制进程中使用"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 9998):
+        self.host = host
+        self.port = port
+        self.sent = 0
+        try:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock.setblocking(False)
+        except OSError as e:
+            logger.warning(f"新截图通知发送器创建失败: {e}")
+            self.sock = None
+
+    def notify(self, count: int = 1) -> bool:
+        """发送一次新截图通知（不等待接收方，接收方未启动时直接丢弃）"""
+        if self.sock is None:
+            return False
+        try:
+            message = json.dumps({'pid': os.getpid(), 'count': count, 'timestamp': time.time()}).encode('utf-8')
+            self.sock.sendto(message, (self.host, self.port))
+            self.sent += 1
+            return True
+        except OSError as e:
+            logger.debug(f"发送新截图通知失败: {e}")
+            return False
+
+    def close(self):
+        """关闭通知套接字"""
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+class ScreenshotNotificationListener:
+    """新截图通知接收器 - 在OCR进程中使用
+
+    同一端口只能由一个OCR进程监听，其余进程启动失败后回退为按间隔轮询。
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 9998):
+        self.host = host
+        self.port = port
+        self.sock = None
+        self.stats = {
+            'notifications': 0,
+            'wakeups': 0,
+            'timeouts': 0
+        }
+
+    @property
+    def active(self) -> bool:
+        """通知通道是否可用"""
+        return self.sock is not None
+
+    def start(self) -> bool:
+        """绑定通知端口，失败时返回False（调用方回退为轮询）"""
+        if self.sock is not None:
+            return True
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.bind((self.host, self.port))
+            sock.setblocking(False)
+            self.sock = sock
+            logger.info(f"新截图通知监听已启动: {self.host}:{self.port}")
+            return True
+        except OSError as e:
+            logger.warning(f"新截图通知监听启动失败，回退为轮询: {e}")
+            return False
+
+    def wait(self, timeout: float) -> bool:
+        """等待新截图通知
+
+        收到通知时立即返回True，并清空已到达的全部通知（一次唤醒处理一批截图）；
+        超时或通道不可用时返回False（通道不可用时相当于sleep）。
+        """
+        if self.sock is None:
+            time.sleep(timeout)
+            return False
+
+        try:
+            readable, _, _ = select.select([self.sock], [], [], timeout)
+        except (OSError, ValueError) as e:
+            logger.warning(f"等待新截图通知失败，回退为轮询: {e}")
+            self.close()
+            return False
+
+        if not readable:
+            self.stats['timeouts'] += 1
+            return False
+
+        # 清空缓冲区中的全部通知
+        while True:
+            try:
+                self.sock.recvfrom(1024)
+                self.stats['notifications'] += 1
+            except BlockingIOError:
+                break
+            except OSError:
+                break
+        self.stats['wakeups'] += 1
+        return True
+
+    def get_stats(self) -> dict:
+        """获取通知统计"""
+        stats = self.stats.copy()
+        stats['active'] = self.active
+        return stats
+
+    def close(self):
+        """关闭监听"""
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
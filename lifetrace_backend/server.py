@@ -23,6 +23,7 @@ from pydantic import BaseModel
 from lifetrace_backend.config import config
 from lifetrace_backend.storage import db_manager
 from lifetrace_backend.simple_ocr import SimpleOCRProcessor
+from lifetrace_backend.ocr_engine import warm_up_in_background
 from lifetrace_backend.vector_service import create_vector_service
 from lifetrace_backend.multimodal_vector_service import create_multimodal_vector_service
 from lifetrace_backend.logging_config import setup_logging
@@ -473,6 +474,13 @@ async def startup_event():
     heartbeat_thread = threading.Thread(target=heartbeat_task_func, daemon=True)
     heartbeat_thread.start()
     
+    # Web服务器的查询走只读连接，不与录制/OCR进程争抢写锁
+    db_manager.enable_read_only_engine()
+    
+    # 在后台加载并预热OCR引擎，手动OCR请求不再承担模型加载时间
+    if config.get('ocr.engine.warm_up_on_start', True) and ocr_processor.is_available():
+        warm_up_in_background()
+    
     # 启动配置文件监听
     config.register_callback(on_config_change)
     config.start_watching()
@@ -1562,6 +1570,24 @@ async def get_screenshot(screenshot_id: int):
     return result
 
 
+@app.get("/api/screenshots/{screenshot_id}/ocr_lines")
+async def get_screenshot_ocr_lines(
+    screenshot_id: int,
+    min_confidence: float = Query(0.0, ge=0.0, le=1.0, description="最低置信度")
+):
+    """获取截图的逐行OCR结果（文本、置信度和坐标框），用于高亮搜索命中"""
+    screenshot = db_manager.get_screenshot_by_id(screenshot_id)
+    if not screenshot:
+        raise HTTPException(status_code=404, detail="截图不存在")
+    
+    return {
+        "screenshot_id": screenshot_id,
+        "width": screenshot["width"],
+        "height": screenshot["height"],
+        "lines": db_manager.get_ocr_lines(screenshot_id, min_confidence=min_confidence)
+    }
+
+
 @app.get("/api/screenshots/{screenshot_id}/image")
 async def get_screenshot_image(screenshot_id: int, request: Request):
     """获取截图图片文件"""
@@ -1720,15 +1746,7 @@ async def process_ocr(screenshot_id: int):
         ocr_result = ocr_processor.process_image(screenshot['file_path'])
         
         if ocr_result['success']:
-            # 保存OCR结果
-            db_manager.add_ocr_result(
-                screenshot_id=screenshot['id'],
-                text_content=ocr_result['text_content'],
-                confidence=ocr_result['confidence'],
-                language=ocr_result.get('language', 'ch'),
-                processing_time=ocr_result['processing_time']
-            )
-            
+            # process_image 已保存OCR结果
             return {
                 "success": True,
                 "text_content": ocr_result['text_content'],
@@ -2435,7 +2453,11 @@ async def app_usage_page(request: Request):
 async def get_app_usage_stats(
     days: int = Query(7, description="统计天数", ge=1, le=365)
 ):
-    """获取应用使用统计数据"""
+    """获取应用使用统计数据
+    
+    session_count 为应用使用记录数：开启 storage.app_usage.coalesce（默认）时每条记录是一段连续使用，
+    avg_session_time 即平均连续使用时长；关闭时与以前一样每次采样一条记录。
+    """
     try:
         # 使用新的AppUsageLog表获取统计数据
         stats_data = db_manager.get_app_usage_stats(days=days)
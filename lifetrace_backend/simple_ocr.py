@@ -9,15 +9,15 @@ import sys
 import time
 import logging
 from pathlib import Path
+from typing import Optional
 
-def _get_application_path() -> str:
-    """获取应用程序路径，兼容PyInstaller打包"""
-    if getattr(sys, 'frozen', False):
-        # 如果是PyInstaller打包的应用，使用可执行文件所在目录
-        return os.path.dirname(sys.executable)
-    else:
-        # 开发环境，使用项目根目录
-        return str(Path(__file__).parent.parent)
+# 添加项目根目录到Python路径，以便直接运行此文件
+if __name__ == '__main__':
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from lifetrace_backend.ocr_engine import (
+    RAPIDOCR_AVAILABLE, _get_application_path, get_ocr_engine, get_engine_stats
+)
 
 def _setup_rapidocr_config():
     """设置RapidOCR配置文件路径"""
@@ -31,21 +31,13 @@ def _setup_rapidocr_config():
     else:
         print(f"配置文件不存在: {config_path}")
 
-# 添加项目根目录到Python路径，以便直接运行此文件
-if __name__ == '__main__':
-    project_root = _get_application_path()
-    sys.path.insert(0, project_root)
-
 # 设置RapidOCR配置
 _setup_rapidocr_config()
 
-try:
-    from rapidocr_onnxruntime import RapidOCR
-    from PIL import Image
-    import numpy as np
-    RAPIDOCR_AVAILABLE = True
-except ImportError:
-    RAPIDOCR_AVAILABLE = False
+from PIL import Image
+import numpy as np
+
+if not RAPIDOCR_AVAILABLE:
     print("错误: RapidOCR未安装，请运行: pip install rapidocr-onnxruntime")
     exit(1)
 
@@ -53,6 +45,109 @@ from lifetrace_backend.config import config
 from lifetrace_backend.storage import db_manager
 from lifetrace_backend.vector_service import create_vector_service
 from lifetrace_backend.simple_heartbeat import SimpleHeartbeatSender
+from lifetrace_backend.screenshot_notify import ScreenshotNotificationListener
+from lifetrace_backend.ocr_regions import DirtyRegionOCR, normalize_ocr_items
+from lifetrace_backend.ocr_layout import pack_ocr_items, mean_confidence
+
+
+# 脏区域识别器（按屏幕缓存上一帧，首次使用时按配置创建）
+_dirty_region_ocr = None
+
+
+def get_dirty_region_ocr() -> Optional[DirtyRegionOCR]:
+    """获取本进程的脏区域识别器，未启用时返回None"""
+    global _dirty_region_ocr
+    if not config.get('ocr.dirty_region.enabled', True):
+        return None
+    if _dirty_region_ocr is None:
+        _dirty_region_ocr = DirtyRegionOCR(
+            tile_size=config.get('ocr.dirty_region.tile_size', 32),
+            pixel_threshold=config.get('ocr.dirty_region.pixel_threshold', 16),
+            max_changed_ratio=config.get('ocr.dirty_region.max_changed_ratio', 0.5)
+        )
+    return _dirty_region_ocr
+
+
+def recognize_image(ocr_engine, image_path: str, screen_id: Optional[int] = None) -> dict:
+    """对图像执行OCR
+
+    Args:
+        screen_id: 截图所在屏幕，传入时只识别与该屏幕上一帧相比变化的区域
+
+    Returns:
+        OCR结果字典：text_content 为置信度高于阈值的文本行，confidence 为这些行的平均置信度，
+        layout 为全部识别条目（坐标框/文本/置信度）的打包数据
+    """
+    # 记录开始时间
+    start_time = time.time()
+    
+    # 图像预处理：缩放图像以提高处理速度
+    with Image.open(image_path) as img:
+        img = img.convert("RGB")
+        img.thumbnail((1920, 1080), Image.Resampling.LANCZOS)
+        img_array = np.array(img)
+    
+    # 使用RapidOCR进行识别
+    dirty_region_ocr = get_dirty_region_ocr() if screen_id is not None else None
+    if dirty_region_ocr is not None:
+        items = dirty_region_ocr.recognize(ocr_engine, img_array, screen_id)
+    else:
+        result, _ = ocr_engine(img_array)
+        items = normalize_ocr_items(result)
+    
+    # 计算推理时间
+    elapsed_time = time.time() - start_time
+    
+    # 提取RapidOCR识别结果，过滤低置信度的文本行
+    threshold = config.get('ocr.confidence_threshold', 0.5)
+    kept = [item for item in items if item[1] and item[1].strip() and item[2] > threshold]
+    ocr_text = "".join(text.strip() + "\n" for _, text, _ in kept)
+    
+    return {
+        'text_content': ocr_text,
+        'confidence': mean_confidence(kept),
+        'language': 'ch',
+        'processing_time': elapsed_time,
+        'layout': pack_ocr_items(items, img_array.shape[1], img_array.shape[0])
+    }
+
+
+# 本进程的OCR调用统计：recognized 为实际运行RapidOCR的次数，reused 为复用已有结果省去的次数
+ocr_call_stats = {'recognized': 0, 'reused': 0}
+
+
+def recognize_screenshot(ocr_engine, screenshot_id: int, file_path: str,
+                         screen_id: Optional[int] = None) -> dict:
+    """识别一张截图
+
+    启用 ocr.reuse 时，若画面与同一事件、同一屏幕中已识别的截图几乎相同（感知哈希距离在阈值内），
+    直接复用该截图的识别结果，不再运行RapidOCR。
+    复用阈值不超过去重阈值 storage.hash_threshold：去重判定为不同的画面上有新的文字，
+    整段复用会让新文字从搜索和向量库中丢失，这类画面交给脏区域识别只识别变化区域。
+
+    Returns:
+        OCR结果字典（text_content/confidence/language/processing_time/layout/reused_from）
+    """
+    if config.get('ocr.reuse.enabled', True):
+        start_time = time.time()
+        max_distance = min(config.get('ocr.reuse.hash_threshold', 5),
+                           config.get('storage.hash_threshold', 5))
+        reusable = db_manager.find_reusable_ocr_result(screenshot_id, max_distance=max_distance)
+        if reusable:
+            ocr_call_stats['reused'] += 1
+            return {
+                'text_content': reusable['text_content'] or "",
+                'confidence': reusable['confidence'],
+                'language': reusable['language'] or 'ch',
+                'processing_time': time.time() - start_time,
+                'layout': reusable['layout'],
+                'reused_from': reusable['ocr_result_id']
+            }
+    
+    ocr_result = recognize_image(ocr_engine, file_path, screen_id)
+    ocr_call_stats['recognized'] += 1
+    ocr_result['reused_from'] = None
+    return ocr_result
 
 
 class SimpleOCRProcessor:
@@ -91,7 +186,8 @@ class SimpleOCRProcessor:
                     'total_screenshots': total_screenshots,
                     'processed': ocr_results,
                     'unprocessed': unprocessed,
-                    'check_interval': config.get('ocr.check_interval', 0.5)
+                    'check_interval': config.get('ocr.check_interval', 0.5),
+                    'engine': get_engine_stats()
                 }
         except Exception as e:
             logging.error(f"获取OCR统计信息失败: {e}")
@@ -103,126 +199,20 @@ class SimpleOCRProcessor:
     def process_image(self, image_path):
         """处理单个图像文件"""
         try:
-            # 初始化OCR引擎（如果还没有初始化）
+            # 获取进程内共享的OCR引擎（服务器启动时已在后台预热）
             if self.ocr is None:
-                # 获取exe同目录下的config文件路径
-                app_path = _get_application_path()
-                config_path = os.path.join(app_path, 'config', 'rapidocr_config.yaml')
-                
-                # 检查配置文件是否存在
-                if os.path.exists(config_path):
-                    print(f"使用RapidOCR配置文件: {config_path}")
-                    
-                    # 读取配置文件以获取外部模型路径
-                    import yaml
-                    try:
-                        with open(config_path, 'r', encoding='utf-8') as f:
-                            config_data = yaml.safe_load(f)
-                        
-                        # 检查是否有外部模型路径配置
-                        if 'Models' in config_data:
-                            models_config = config_data['Models']
-                            det_model_path = os.path.join(app_path, models_config.get('det_model_path', ''))
-                            rec_model_path = os.path.join(app_path, models_config.get('rec_model_path', ''))
-                            cls_model_path = os.path.join(app_path, models_config.get('cls_model_path', ''))
-                            
-                            # 验证外部模型文件是否存在
-                            if (os.path.exists(det_model_path) and 
-                                os.path.exists(rec_model_path) and 
-                                os.path.exists(cls_model_path)):
-                                print(f"使用外部模型文件:")
-                                print(f"  检测模型: {det_model_path}")
-                                print(f"  识别模型: {rec_model_path}")
-                                print(f"  分类模型: {cls_model_path}")
-                                
-                                # 使用外部模型路径初始化RapidOCR
-                                self.ocr = RapidOCR(
-                                    det_model_path=det_model_path,
-                                    rec_model_path=rec_model_path,
-                                    cls_model_path=cls_model_path,
-                                    det_use_cuda=False,
-                                    cls_use_cuda=False,
-                                    rec_use_cuda=False,
-                                    print_verbose=False
-                                )
-                            else:
-                                print("外部模型文件不存在，使用默认配置")
-                                self.ocr = RapidOCR(
-                                    config_path=None,
-                                    det_use_cuda=False,
-                                    cls_use_cuda=False,
-                                    rec_use_cuda=False,
-                                    print_verbose=False
-                                )
-                        else:
-                            # 没有外部模型配置，使用默认方式
-                            self.ocr = RapidOCR(
-                                config_path=None,
-                                det_use_cuda=False,
-                                cls_use_cuda=False,
-                                rec_use_cuda=False,
-                                print_verbose=False
-                            )
-                            
-                    except Exception as e:
-                        print(f"读取配置文件失败: {e}，使用默认配置")
-                        self.ocr = RapidOCR(
-                            config_path=None,
-                            det_use_cuda=False,
-                            cls_use_cuda=False,
-                            rec_use_cuda=False,
-                            print_verbose=False
-                        )
-                else:
-                    print(f"配置文件不存在: {config_path}，使用默认配置")
-                    # 使用config_path=None来避免配置文件路径问题
-                    self.ocr = RapidOCR(
-                        config_path=None,
-                        det_use_cuda=False,
-                        cls_use_cuda=False, 
-                        rec_use_cuda=False,
-                        print_verbose=False
-                    )
-                
-            # 记录开始时间
-            start_time = time.time()
-            
-            # 图像预处理
-            with Image.open(image_path) as img:
-                img = img.convert("RGB")
-                img.thumbnail((1920, 1080), Image.Resampling.LANCZOS)
-                img_array = np.array(img)
+                self.ocr = get_ocr_engine()
             
-            # 执行OCR
-            result, _ = self.ocr(img_array)
-            
-            # 计算处理时间
-            processing_time = time.time() - start_time
-            
-            # 提取文本内容
-            ocr_text = ""
-            if result:
-                for item in result:
-                    if len(item) >= 3:
-                        text = item[1]
-                        confidence = float(item[2])
-                        if text and text.strip() and confidence > 0.5:
-                            ocr_text += text.strip() + "\n"
+            ocr_result = recognize_image(self.ocr, image_path)
             
             # 保存到数据库
-            ocr_result = {
-                'text_content': ocr_text,
-                'confidence': 0.8,
-                'language': 'ch',
-                'processing_time': processing_time
-            }
-            
             save_to_database(image_path, ocr_result, self.vector_service)
             
             return {
                 'success': True,
-                'text_content': ocr_text,
-                'processing_time': processing_time
+                'text_content': ocr_result['text_content'],
+                'confidence': ocr_result['confidence'],
+                'processing_time': ocr_result['processing_time']
             }
             
         except Exception as e:
@@ -234,7 +224,11 @@ class SimpleOCRProcessor:
 
 
 def save_to_database(image_path: str, ocr_result: dict, vector_service=None):
-    """保存OCR结果到数据库"""
+    """保存OCR结果到数据库
+
+    Returns:
+        OCR结果ID，保存失败时返回None
+    """
     try:
         # 查找对应的截图记录
         screenshot = db_manager.get_screenshot_by_path(image_path)
@@ -244,7 +238,7 @@ def save_to_database(image_path: str, ocr_result: dict, vector_service=None):
             screenshot_id = create_screenshot_record(image_path)
             if not screenshot_id:
                 logging.warning(f"无法为外部文件创建截图记录: {image_path}")
-                return
+                return None
         else:
             screenshot_id = screenshot['id']
         
@@ -254,38 +248,50 @@ def save_to_database(image_path: str, ocr_result: dict, vector_service=None):
             text_content=ocr_result['text_content'],
             confidence=ocr_result['confidence'],
             language=ocr_result.get('language', 'ch'),
-            processing_time=ocr_result['processing_time']
+            processing_time=ocr_result['processing_time'],
+            layout=ocr_result.get('layout'),
+            reused_from=ocr_result.get('reused_from')
         )
         
         # 更新截图状态
         db_manager.update_screenshot_processed(screenshot_id)
         
         # 添加到向量数据库
-        if vector_service and vector_service.is_enabled() and ocr_result_id:
-            try:
-                # 获取完整的OCR结果对象
-                with db_manager.get_session() as session:
-                    from lifetrace_backend.models import OCRResult, Screenshot
-                    ocr_obj = session.query(OCRResult).filter(OCRResult.id == ocr_result_id).first()
-                    screenshot_obj = session.query(Screenshot).filter(Screenshot.id == screenshot_id).first()
-                    
-                    if ocr_obj:
-                        success = vector_service.add_ocr_result(ocr_obj, screenshot_obj)
-                        if success:
-                            logging.debug(f"OCR结果已添加到向量数据库: {ocr_result_id}")
-                        else:
-                            logging.warning(f"向量数据库添加失败: {ocr_result_id}")
-                    # 同步事件文档（事件级）
-                    if screenshot_obj and getattr(screenshot_obj, 'event_id', None):
-                        try:
-                            vector_service.upsert_event_document(screenshot_obj.event_id)
-                        except Exception as _:
-                            pass
-            except Exception as ve:
-                logging.error(f"向量数据库操作失败: {ve}")
+        if ocr_result_id:
+            add_to_vector_database(vector_service, ocr_result_id, screenshot_id)
+        
+        return ocr_result_id
         
     except Exception as e:
         logging.error(f"保存OCR结果到数据库失败: {e}")
+        return None
+
+
+def add_to_vector_database(vector_service, ocr_result_id: int, screenshot_id: int):
+    """把已保存的OCR结果加入向量数据库，并同步所属事件的文档"""
+    if not vector_service or not vector_service.is_enabled():
+        return
+    try:
+        # 获取完整的OCR结果对象
+        with db_manager.get_session() as session:
+            from lifetrace_backend.models import OCRResult, Screenshot
+            ocr_obj = session.query(OCRResult).filter(OCRResult.id == ocr_result_id).first()
+            screenshot_obj = session.query(Screenshot).filter(Screenshot.id == screenshot_id).first()
+            
+            if ocr_obj:
+                success = vector_service.add_ocr_result(ocr_obj, screenshot_obj)
+                if success:
+                    logging.debug(f"OCR结果已添加到向量数据库: {ocr_result_id}")
+                else:
+                    logging.warning(f"向量数据库添加失败: {ocr_result_id}")
+            # 同步事件文档（事件级）
+            if screenshot_obj and getattr(screenshot_obj, 'event_id', None):
+                try:
+                    vector_service.upsert_event_document(screenshot_obj.event_id)
+                except Exception as _:
+                    pass
+    except Exception as ve:
+        logging.error(f"向量数据库操作失败: {ve}")
 
 
 def create_screenshot_record(image_path: str):
@@ -339,42 +345,6 @@ def create_screenshot_record(image_path: str):
 # 日志配置已移至统一的logging_config.py中
 
 
-def get_unprocessed_screenshots(logger=None, limit=50):
-    """从数据库获取未处理OCR的截图记录
-    
-    Args:
-        logger: 日志记录器
-        limit: 限制返回的记录数量，避免内存溢出
-    """
-    # 如果没有传入logger，使用默认的logging
-    if logger is None:
-        import logging as default_logging
-        logger = default_logging
-        
-    try:
-        from lifetrace_backend.models import Screenshot, OCRResult
-        with db_manager.get_session() as session:
-            # 优化查询：使用NOT EXISTS子查询替代LEFT JOIN
-            # 这种方式在大数据量时性能更好
-            # 按创建时间降序排列，优先处理最新的截图
-            unprocessed = session.query(Screenshot).filter(
-                ~session.query(OCRResult).filter(
-                    OCRResult.screenshot_id == Screenshot.id
-                ).exists()
-            ).order_by(Screenshot.created_at.desc()).limit(limit).all()
-            
-            logger.info(f"查询到 {len(unprocessed)} 条未处理的截图记录")
-            
-            return [{
-                'id': screenshot.id,
-                'file_path': screenshot.file_path,
-                'created_at': screenshot.created_at
-            } for screenshot in unprocessed]
-    except Exception as e:
-        logger.error(f"查询未处理截图失败: {e}")
-        return []
-
-
 def process_screenshot_ocr(screenshot_info, ocr_engine, vector_service, logger=None):
     """处理单个截图的OCR"""
     screenshot_id = screenshot_info['id']
@@ -393,42 +363,15 @@ def process_screenshot_ocr(screenshot_info, ocr_engine, vector_service, logger=N
         
         logger.info(f"开始处理截图 ID {screenshot_id}: {os.path.basename(file_path)}")
         
-        # 记录开始时间
-        start_time = time.time()
-        
-        # 图像预处理优化
-        with Image.open(file_path) as img:
-            img = img.convert("RGB")
-            # 缩放图像以提高处理速度
-            img.thumbnail((1920, 1080), Image.Resampling.LANCZOS)
-            img_array = np.array(img)
-        
-        # 使用RapidOCR进行识别
-        result, _ = ocr_engine(img_array)
-        
-        # 计算推理时间
-        elapsed_time = time.time() - start_time
-        
-        # 提取RapidOCR识别结果
-        ocr_text = ""
-        if result:
-            for item in result:
-                if len(item) >= 3:
-                    text = item[1]  # 文本内容
-                    confidence = float(item[2])  # 置信度
-                    if text and text.strip() and confidence > 0.5:  # 过滤低置信度结果
-                        ocr_text += text.strip() + "\n"
+        ocr_result = recognize_screenshot(ocr_engine, screenshot_id, file_path, screenshot_info.get('screen_id'))
         
         # 保存到数据库
-        ocr_result = {
-            'text_content': ocr_text,
-            'confidence': 0.8,  # 简化版使用固定置信度
-            'language': 'ch',
-            'processing_time': elapsed_time
-        }
         save_to_database(file_path, ocr_result, vector_service)
         
-        logger.info(f'OCR处理完成 ID {screenshot_id}, 用时: {elapsed_time:.2f}秒')
+        if ocr_result['reused_from']:
+            logger.info(f"OCR处理完成 ID {screenshot_id}, 画面几乎相同，复用OCR结果 {ocr_result['reused_from']}")
+        else:
+            logger.info(f"OCR处理完成 ID {screenshot_id}, 用时: {ocr_result['processing_time']:.2f}秒")
         return True
         
     except Exception as e:
@@ -436,6 +379,239 @@ def process_screenshot_ocr(screenshot_info, ocr_engine, vector_service, logger=N
         return False
 
 
+def _get_worker_name() -> str:
+    """当前进程的任务认领者标识"""
+    import socket
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _ocr_worker_process(worker_id: int, stop_event, work_available, result_queue, idle_wait: float):
+    """OCR工作进程：持有独立的RapidOCR引擎，从处理队列认领任务并保存识别结果
+
+    队列为空时阻塞在 work_available 信号量上，主进程入队新任务后释放信号量唤醒工作进程。
+    向量数据库由主进程统一写入，工作进程只把结果通过 result_queue 回报给主进程。
+    回报格式: (结果类型 done/reused/failed, 工作进程编号, 截图ID, OCR结果ID, 识别用时)
+    """
+    from lifetrace_backend.logging_config import setup_logging
+    logger = setup_logging(config).get_ocr_logger()
+    
+    # 未配置线程数时按工作进程数平分CPU核心，避免多个ONNX运行时互相争抢
+    intra_op_num_threads = config.get('ocr.engine.intra_op_num_threads', 0)
+    if not intra_op_num_threads:
+        num_workers = max(1, int(config.get('ocr.workers', 1)))
+        intra_op_num_threads = max(1, (os.cpu_count() or 1) // num_workers)
+    
+    try:
+        ocr_engine = get_ocr_engine(intra_op_num_threads=intra_op_num_threads)
+    except Exception as e:
+        logger.error(f"OCR工作进程 {worker_id} 初始化引擎失败: {e}")
+        return
+    engine_stats = get_engine_stats()
+    logger.info(f"OCR工作进程 {worker_id} 已启动 (pid={os.getpid()}, 线程数={intra_op_num_threads}, "
+                f"加载 {engine_stats['load_seconds']}秒, 预热 {engine_stats['warmup_seconds']}秒)")
+    worker_name = _get_worker_name()
+    lease_seconds = config.get('ocr.lease_seconds', 120)
+    max_retries = config.get('ocr.max_retries', 3)
+    retry_backoff = config.get('ocr.retry_backoff_seconds', 30)
+    
+    try:
+        while not stop_event.is_set():
+            tasks = db_manager.claim_tasks('ocr', limit=1, worker_id=worker_name,
+                                           lease_seconds=lease_seconds, max_retries=max_retries)
+            if not tasks:
+                work_available.acquire(timeout=idle_wait)
+                continue
+            
+            for task in tasks:
+                screenshot_id = task['screenshot_id']
+                file_path = task['file_path']
+                
+                if not os.path.exists(file_path):
+                    logger.warning(f"截图文件不存在，跳过处理: {file_path}")
+                    # 文件不会再出现，直接标记失败
+                    db_manager.fail_task(task['task_id'], '截图文件不存在', worker_name, max_retries=0)
+                    result_queue.put(('failed', worker_id, screenshot_id, None, 0.0))
+                    continue
+                
+                try:
+                    ocr_result = recognize_screenshot(ocr_engine, screenshot_id, file_path, task.get('screen_id'))
+                    elapsed_time = ocr_result['processing_time']
+                    ocr_result_id = save_to_database(file_path, ocr_result)
+                except Exception as e:
+                    logger.error(f"OCR工作进程 {worker_id} 处理截图 {screenshot_id} 失败: {e}")
+                    db_manager.fail_task(task['task_id'], str(e), worker_name, max_retries, retry_backoff)
+                    result_queue.put(('failed', worker_id, screenshot_id, None, 0.0))
+                    continue
+                
+                if ocr_result_id:
+                    db_manager.complete_task(task['task_id'], worker_name)
+                    kind = 'reused' if ocr_result['reused_from'] else 'done'
+                    result_queue.put((kind, worker_id, screenshot_id, ocr_result_id, elapsed_time))
+                else:
+                    db_manager.fail_task(task['task_id'], '保存OCR结果失败', worker_name, max_retries, retry_backoff)
+                    result_queue.put(('failed', worker_id, screenshot_id, None, elapsed_time))
+    except KeyboardInterrupt:
+        pass
+    if _dirty_region_ocr is not None:
+        logger.info(f"OCR工作进程 {worker_id} 脏区域识别统计: {_dirty_region_ocr.get_stats()}")
+    logger.info(f"OCR工作进程 {worker_id} 已退出")
+
+
+def run_ocr_worker_pool(num_workers: int, vector_service, heartbeat_sender, check_interval_ref, logger,
+                        listener=None):
+    """多进程OCR处理
+
+    主进程把未处理的截图加入处理队列，并负责写入向量数据库、发送心跳和统计吞吐量；
+    num_workers 个工作进程各自持有一个RapidOCR引擎，通过任务租约认领任务。
+    新截图通知可用时，主进程收到通知才入队，否则按 check_interval 轮询。
+    """
+    import multiprocessing
+    import queue as queue_module
+    
+    # 使用spawn启动，避免子进程继承父进程的数据库连接和ONNX运行时线程
+    ctx = multiprocessing.get_context('spawn')
+    stop_event = ctx.Event()
+    work_available = ctx.Semaphore(0)
+    result_queue = ctx.Queue()
+    
+    notify_active = listener is not None and listener.active
+    fallback_interval = config.get('ocr.notify.fallback_interval', 60)
+    idle_wait = fallback_interval if notify_active else check_interval_ref[0]
+    
+    def start_worker(worker_id: int):
+        process = ctx.Process(
+            target=_ocr_worker_process,
+            args=(worker_id, stop_event, work_available, result_queue, idle_wait),
+            name=f'ocr-worker-{worker_id}',
+            daemon=True
+        )
+        process.start()
+        return process
+    
+    workers = {worker_id: start_worker(worker_id) for worker_id in range(num_workers)}
+    logger.info(f"已启动 {num_workers} 个OCR工作进程")
+    
+    stats = {
+        'processed': 0,
+        'recognized': 0,
+        'reused': 0,
+        'failed': 0,
+        'ocr_seconds': 0.0,
+        'worker_restarts': 0,
+        'per_worker': {worker_id: 0 for worker_id in workers}
+    }
+    started_at = time.time()
+    report_interval = 60
+    window_started_at = started_at
+    window_processed = 0
+    next_enqueue_at = 0.0
+    
+    def enqueue_and_signal() -> int:
+        queued = db_manager.enqueue_ocr_tasks(limit=max(50, num_workers * 20))
+        if queued:
+            logger.info(f"新增 {queued} 个OCR任务")
+            for _ in range(min(queued, num_workers)):
+                work_available.release()
+        return queued
+    
+    def notification_loop():
+        # 收到新截图通知（或兜底超时）时入队
+        while not stop_event.is_set():
+            listener.wait(fallback_interval if listener.active else check_interval_ref[0])
+            if not stop_event.is_set():
+                enqueue_and_signal()
+    
+    if notify_active:
+        import threading
+        threading.Thread(target=notification_loop, name='ocr-notify', daemon=True).start()
+    
+    def handle_result(message):
+        nonlocal window_processed
+        kind, worker_id, screenshot_id, ocr_result_id, elapsed_time = message
+        if kind in ('done', 'reused'):
+            stats['processed'] += 1
+            if kind == 'reused':
+                stats['reused'] += 1
+            else:
+                stats['recognized'] += 1
+                stats['ocr_seconds'] += elapsed_time
+            stats['per_worker'][worker_id] = stats['per_worker'].get(worker_id, 0) + 1
+            window_processed += 1
+            add_to_vector_database(vector_service, ocr_result_id, screenshot_id)
+        else:
+            stats['failed'] += 1
+    
+    try:
+        while True:
+            now = time.time()
+            
+            # 没有通知通道时定期把新截图加入处理队列
+            if now >= next_enqueue_at:
+                queued = 0 if notify_active else enqueue_and_signal()
+                if not queued and config.get('storage.keyword_index', True) and not db_manager.is_keyword_index_complete():
+                    # 空闲时为升级前的OCR结果逐步补建关键词索引
+                    db_manager.index_missing_keywords(limit=200)
+                next_enqueue_at = now + check_interval_ref[0]
+            
+            # 收集工作进程的处理结果
+            try:
+                handle_result(result_queue.get(timeout=1.0))
+                while True:
+                    handle_result(result_queue.get_nowait())
+            except queue_module.Empty:
+                pass
+            
+            # 重启异常退出的工作进程
+            for worker_id, process in list(workers.items()):
+                if not process.is_alive():
+                    logger.warning(f"OCR工作进程 {worker_id} 已退出 (exitcode={process.exitcode})，正在重启")
+                    workers[worker_id] = start_worker(worker_id)
+                    stats['worker_restarts'] += 1
+            
+            elapsed = max(time.time() - started_at, 1e-6)
+            throughput = {
+                'processed_count': stats['processed'],
+                'failed_count': stats['failed'],
+                'frames_per_second': round(stats['processed'] / elapsed, 3),
+                'avg_ocr_seconds': round(stats['ocr_seconds'] / max(stats['recognized'], 1), 3),
+                'ocr_calls_saved': stats['reused'],
+                'workers': num_workers,
+                'worker_restarts': stats['worker_restarts']
+            }
+            
+            # 发送心跳（包含处理状态和吞吐量）
+            heartbeat_data = {
+                'status': 'running',
+                'check_interval': check_interval_ref[0],
+                **throughput
+            }
+            if listener is not None:
+                heartbeat_data['notify'] = listener.get_stats()
+            heartbeat_sender.send_heartbeat(heartbeat_data)
+            
+            if time.time() - window_started_at >= report_interval:
+                window_seconds = time.time() - window_started_at
+                logger.info(
+                    f"OCR吞吐: 最近{window_seconds:.0f}秒处理 {window_processed} 张 "
+                    f"({window_processed / window_seconds:.2f} 张/秒)，累计 {stats['processed']} 张，"
+                    f"复用 {stats['reused']} 张，失败 {stats['failed']} 张，"
+                    f"平均识别用时 {throughput['avg_ocr_seconds']:.2f}秒，"
+                    f"各进程: {stats['per_worker']}"
+                )
+                window_started_at = time.time()
+                window_processed = 0
+    finally:
+        stop_event.set()
+        # 唤醒阻塞在信号量上的工作进程
+        for _ in range(num_workers):
+            work_available.release()
+        for process in workers.values():
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+        logger.info(f"OCR工作进程已全部停止，累计处理 {stats['processed']} 张")
+
+
 def main():
     """主函数 - 基于数据库驱动的OCR处理"""
     print("LifeTrace 简化OCR处理器启动...")
@@ -489,95 +665,23 @@ def main():
     config.start_watching()
     logger.info("已启动配置文件监听")
     
+    # OCR工作进程数，大于1时每个工作进程各自初始化RapidOCR引擎
+    num_workers = max(1, int(config.get('ocr.workers', 1)))
+    
     # 初始化RapidOCR
-    print("正在初始化RapidOCR引擎...")
-    logger.info("正在初始化RapidOCR引擎...")
-    try:
-        # 获取exe同目录下的config文件路径
-        app_path = _get_application_path()
-        config_path = os.path.join(app_path, 'config', 'rapidocr_config.yaml')
-        
-        # 检查配置文件是否存在
-        if os.path.exists(config_path):
-            print(f"使用RapidOCR配置文件: {config_path}")
-            
-            # 读取配置文件以获取外部模型路径
-            import yaml
-            try:
-                with open(config_path, 'r', encoding='utf-8') as f:
-                    config_data = yaml.safe_load(f)
-                
-                # 检查是否有外部模型路径配置
-                if 'Models' in config_data:
-                    models_config = config_data['Models']
-                    det_model_path = os.path.join(app_path, models_config.get('det_model_path', ''))
-                    rec_model_path = os.path.join(app_path, models_config.get('rec_model_path', ''))
-                    cls_model_path = os.path.join(app_path, models_config.get('cls_model_path', ''))
-                    
-                    # 验证外部模型文件是否存在
-                    if (os.path.exists(det_model_path) and 
-                        os.path.exists(rec_model_path) and 
-                        os.path.exists(cls_model_path)):
-                        print(f"使用外部模型文件:")
-                        print(f"  检测模型: {det_model_path}")
-                        print(f"  识别模型: {rec_model_path}")
-                        print(f"  分类模型: {cls_model_path}")
-                        
-                        # 使用外部模型路径初始化RapidOCR
-                        ocr = RapidOCR(
-                            det_model_path=det_model_path,
-                            rec_model_path=rec_model_path,
-                            cls_model_path=cls_model_path,
-                            det_use_cuda=False,
-                            cls_use_cuda=False,
-                            rec_use_cuda=False,
-                            print_verbose=False
-                        )
-                    else:
-                        print("外部模型文件不存在，使用默认配置")
-                        ocr = RapidOCR(
-                            config_path=None,
-                            det_use_cuda=False,
-                            cls_use_cuda=False,
-                            rec_use_cuda=False,
-                            print_verbose=False
-                        )
-                else:
-                    # 没有外部模型配置，使用默认方式
-                    ocr = RapidOCR(
-                        config_path=None,
-                        det_use_cuda=False,
-                        cls_use_cuda=False,
-                        rec_use_cuda=False,
-                        print_verbose=False
-                    )
-                    
-            except Exception as e:
-                print(f"读取配置文件失败: {e}，使用默认配置")
-                ocr = RapidOCR(
-                    config_path=None,
-                    det_use_cuda=False,
-                    cls_use_cuda=False,
-                    rec_use_cuda=False,
-                    print_verbose=False
-                )
-        else:
-            print(f"配置文件不存在: {config_path}，使用默认配置")
-            # 使用config_path=None来避免配置文件路径问题
-            ocr = RapidOCR(
-                config_path=None,
-                det_use_cuda=False,
-                cls_use_cuda=False, 
-                rec_use_cuda=False,
-                print_verbose=False
-            )
-        
-        print("RapidOCR引擎初始化成功")
-        logger.info("RapidOCR引擎初始化成功")
-    except Exception as e:
-        print(f"RapidOCR初始化失败: {e}")
-        logger.error(f"RapidOCR初始化失败: {e}")
-        return
+    if num_workers == 1:
+        print("正在初始化RapidOCR引擎...")
+        logger.info("正在初始化RapidOCR引擎...")
+        try:
+            ocr = get_ocr_engine()
+            engine_stats = get_engine_stats()
+            print(f"RapidOCR引擎初始化成功 (加载 {engine_stats['load_seconds']}秒, "
+                  f"预热 {engine_stats['warmup_seconds']}秒)")
+            logger.info(f"RapidOCR引擎初始化成功: {engine_stats}")
+        except Exception as e:
+            print(f"RapidOCR初始化失败: {e}")
+            logger.error(f"RapidOCR初始化失败: {e}")
+            return
     
     # 初始化向量数据库服务
     print("正在初始化向量数据库服务...")
@@ -601,36 +705,78 @@ def main():
     heartbeat_sender.start(interval=1.0)
     processed_count = 0
     
+    # 监听录制进程的新截图通知，监听失败时回退为按 check_interval 轮询
+    listener = None
+    if config.get('ocr.notify.enabled', True):
+        listener = ScreenshotNotificationListener(
+            host=config.get('ocr.notify.host', '127.0.0.1'),
+            port=config.get('ocr.notify.port', 9998)
+        )
+        listener.start()
+    worker_name = _get_worker_name()
+    lease_seconds = config.get('ocr.lease_seconds', 120)
+    max_retries = config.get('ocr.max_retries', 3)
+    retry_backoff = config.get('ocr.retry_backoff_seconds', 30)
+    
     try:
+        if num_workers > 1:
+            print(f"多进程OCR模式: {num_workers} 个工作进程")
+            run_ocr_worker_pool(num_workers, vector_service, heartbeat_sender, check_interval_ref, logger,
+                                listener=listener)
+            return
+        
         while True:
             start_time = time.time()
             
             # 发送心跳（包含处理状态信息）
-            heartbeat_sender.send_heartbeat({
+            heartbeat_data = {
                 'status': 'running',
                 'processed_count': processed_count,
-                'check_interval': check_interval_ref[0]
-            })
+                'ocr_calls_saved': ocr_call_stats['reused'],
+                'check_interval': check_interval_ref[0],
+                'engine': get_engine_stats()
+            }
+            if _dirty_region_ocr is not None:
+                heartbeat_data['dirty_region'] = _dirty_region_ocr.get_stats()
+            if listener is not None:
+                heartbeat_data['notify'] = listener.get_stats()
+            heartbeat_sender.send_heartbeat(heartbeat_data)
             
-            # 从数据库获取未处理的截图
-            unprocessed_screenshots = get_unprocessed_screenshots(logger)
+            # 为未处理的截图创建任务，并认领一批（按创建时间降序，优先处理最新的截图）
+            db_manager.enqueue_ocr_tasks(limit=50)
+            tasks = db_manager.claim_tasks('ocr', limit=10, worker_id=worker_name,
+                                           lease_seconds=lease_seconds, max_retries=max_retries)
             
-            if unprocessed_screenshots:
-                logger.info(f"发现 {len(unprocessed_screenshots)} 个未处理的截图")
+            if tasks:
+                logger.info(f"认领到 {len(tasks)} 个OCR任务")
                 
-                # 数据库查询已经按创建时间降序排列，无需再次排序
-                # 直接处理，优先处理最新的截图
-                
-                # 处理每个未处理的截图
-                for screenshot_info in unprocessed_screenshots:
+                for task in tasks:
+                    screenshot_info = {
+                        'id': task['screenshot_id'],
+                        'file_path': task['file_path'],
+                        'screen_id': task['screen_id']
+                    }
                     success = process_screenshot_ocr(screenshot_info, ocr, vector_service, logger)
                     if success:
+                        db_manager.complete_task(task['task_id'], worker_name)
                         processed_count += 1
                         # 处理成功后稍作停顿，避免过度占用资源
                         time.sleep(0.1)
+                    elif not os.path.exists(task['file_path'] or ''):
+                        db_manager.fail_task(task['task_id'], '截图文件不存在', worker_name, max_retries=0)
+                    else:
+                        db_manager.fail_task(task['task_id'], 'OCR处理失败', worker_name, max_retries, retry_backoff)
             else:
-                # 没有未处理的截图，等待一段时间再检查
-                time.sleep(check_interval_ref[0])
+                # 空闲时为升级前的OCR结果逐步补建关键词索引
+                backfilling = config.get('storage.keyword_index', True) and not db_manager.is_keyword_index_complete()
+                if backfilling:
+                    db_manager.index_missing_keywords(limit=200)
+                
+                # 没有未处理的截图：等待新截图通知，通道不可用（或仍在补建索引）时按检查间隔轮询
+                if listener is not None and listener.active and not backfilling:
+                    listener.wait(config.get('ocr.notify.fallback_interval', 60))
+                else:
+                    time.sleep(check_interval_ref[0])
                 
     except KeyboardInterrupt:
         print("\n收到停止信号，正在退出...")
@@ -642,6 +788,8 @@ def main():
         heartbeat_sender.send_heartbeat({'status': 'error', 'error': str(e)})
         raise
     finally:
+        if listener is not None:
+            listener.close()
         # 停止配置文件监听
         config.stop_watching()
         logger.info("已停止配置文件监听")
@@ -650,4 +798,6 @@ def main():
 
 
 if __name__ == '__main__':
+    import multiprocessing
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -1,6 +1,9 @@
 import os
 import sys
+import json
 import logging
+import threading
+import time
 from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any
 from contextlib import contextmanager
@@ -11,13 +14,19 @@ if __name__ == '__main__':
     project_root = Path(__file__).parent.parent
     sys.path.insert(0, str(project_root))
 
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy import (create_engine, event, text, or_, and_, func, select, update, case, union, exists,
+                        bindparam, Integer, Float, Date, DateTime, cast, extract)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import sessionmaker, Session, aliased
 from sqlalchemy.exc import SQLAlchemyError
 
 from lifetrace_backend.config import config
-from lifetrace_backend.models import Base, Screenshot, OCRResult, SearchIndex, ProcessingQueue, Event, AppUsageLog
+from lifetrace_backend.models import (Base, Screenshot, OCRResult, SearchIndex, SearchPosting, ProcessingQueue,
+                                      Event, AppUsageLog, AppUsageHourly)
+from lifetrace_backend.text_tokenizer import extract_terms, extract_keywords, query_terms
+from lifetrace_backend.ocr_layout import unpack_ocr_items
 from lifetrace_backend.utils import ensure_dir, get_file_hash
+from lifetrace_backend.write_behind import WriteBehindBuffer, PendingScreenshot, PendingAppUsage
 
 
 class DatabaseManager:
@@ -27,6 +36,22 @@ class DatabaseManager:
         self.database_url = database_url or f"sqlite:///{config.database_path}"
         self.engine = None
         self.SessionLocal = None
+        # 只读连接（供Web服务器的查询使用，按需启用）
+        self.read_engine = None
+        self.ReadSessionLocal = None
+        # 批量写入缓冲（仅录制进程启用）
+        self.write_behind = None
+        # 当前未结束事件的内存缓存 {'id', 'app_name', 'window_title', 'validated_at'}
+        # 应用和标题不变时直接复用，只按间隔确认事件未被其他进程结束
+        self._open_event = None
+        self._open_event_lock = threading.Lock()
+        # 合并模式下当前应用使用记录（连续使用区间）的内存状态
+        self._usage_run = None
+        # OCR文本的FTS5全文索引是否可用（需要SQLite 3.34+的trigram分词器）
+        self.fts_enabled = False
+        # 关键词倒排索引（search_index + search_postings）是否已覆盖全部OCR结果
+        self._keyword_index_complete = False
+        self._keyword_index_checked_at = 0.0
         self._init_database()
     
     def _init_database(self):
@@ -38,11 +63,14 @@ class DatabaseManager:
                 ensure_dir(os.path.dirname(db_path))
             
             # 创建引擎
-            self.engine = create_engine(
-                self.database_url,
-                echo=False,
-                pool_pre_ping=True
-            )
+            if self._is_sqlite():
+                self.engine = self._create_sqlite_engine(self.database_url)
+            else:
+                self.engine = create_engine(
+                    self.database_url,
+                    echo=False,
+                    pool_pre_ping=True
+                )
             
             # 创建会话工厂
             self.SessionLocal = sessionmaker(bind=self.engine)
@@ -63,13 +91,203 @@ class DatabaseManager:
             except Exception as me:
                 logging.warning(f"检查/添加 screenshots.event_id 列失败: {me}")
 
+            # 兼容旧库：为 processing_queue 添加任务租约相关列
+            try:
+                if self.database_url.startswith('sqlite:///'):
+                    with self.engine.connect() as conn:
+                        cols = [row[1] for row in conn.execute(text("PRAGMA table_info('processing_queue')")).fetchall()]
+                        for column, column_type in (('claimed_by', 'VARCHAR(100)'), ('lease_until', 'DATETIME'),
+                                                    ('retry_after', 'DATETIME')):
+                            if column not in cols:
+                                conn.execute(text(f"ALTER TABLE processing_queue ADD COLUMN {column} {column_type}"))
+                                logging.info(f"已为 processing_queue 表添加 {column} 列")
+                        conn.commit()
+            except Exception as me:
+                logging.warning(f"检查/添加 processing_queue 租约列失败: {me}")
+            
+            # 兼容旧库：添加OCR结果复用相关列
+            try:
+                if self.database_url.startswith('sqlite:///'):
+                    with self.engine.connect() as conn:
+                        for table, column, column_type in (('screenshots', 'phash', 'VARCHAR(16)'),
+                                                           ('ocr_results', 'reused_from', 'INTEGER'),
+                                                           ('ocr_results', 'layout', 'BLOB')):
+                            cols = [row[1] for row in conn.execute(text(f"PRAGMA table_info('{table}')")).fetchall()]
+                            if column not in cols:
+                                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}"))
+                                logging.info(f"已为 {table} 表添加 {column} 列")
+                        conn.commit()
+            except Exception as me:
+                logging.warning(f"检查/添加OCR复用列失败: {me}")
+
             # 性能优化：添加关键索引
             self._create_performance_indexes()
             
+            # 应用使用小时汇总表首次创建时，从已有记录回填
+            self._backfill_app_usage_rollup()
+            
+            # OCR文本全文索引
+            self._init_fulltext_index()
+            
         except Exception as e:
             logging.error(f"数据库初始化失败: {e}")
             raise
     
+    def _is_sqlite(self) -> bool:
+        return self.database_url.startswith('sqlite:///')
+
+    def _create_sqlite_engine(self, url: str, read_only: bool = False):
+        """按 database.sqlite 配置创建SQLite引擎
+        
+        多个进程（录制、OCR、Web服务器、一致性检查）同时访问同一个数据库，
+        默认的回滚日志模式下读写互斥，容易出现 "database is locked"。
+        这里开启WAL并在每个新连接上设置PRAGMA。
+        """
+        sqlite_config = config.get('database.sqlite', {}) or {}
+        busy_timeout_ms = int(sqlite_config.get('busy_timeout_ms', 5000))
+        
+        engine = create_engine(
+            url,
+            echo=False,
+            pool_pre_ping=True,
+            pool_size=int(sqlite_config.get('pool_size', 5)),
+            max_overflow=int(sqlite_config.get('max_overflow', 10)),
+            connect_args={
+                'timeout': busy_timeout_ms / 1000.0,
+                'check_same_thread': False
+            }
+        )
+        
+        pragmas = {
+            'busy_timeout': busy_timeout_ms,
+            'synchronous': sqlite_config.get('synchronous', 'NORMAL'),
+            # 负数表示以KB为单位
+            'cache_size': -int(sqlite_config.get('cache_size_mb', 64)) * 1024,
+            'mmap_size': int(sqlite_config.get('mmap_size_mb', 256)) * 1024 * 1024,
+            'temp_store': 'MEMORY'
+        }
+        journal_mode = sqlite_config.get('journal_mode', 'WAL')
+        
+        @event.listens_for(engine, 'connect')
+        def _set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                # journal_mode 是数据库级别的持久设置，只读连接无法修改
+                if journal_mode and not read_only:
+                    cursor.execute(f"PRAGMA journal_mode={journal_mode}")
+                for name, value in pragmas.items():
+                    cursor.execute(f"PRAGMA {name}={value}")
+                if read_only:
+                    cursor.execute("PRAGMA query_only=ON")
+            finally:
+                cursor.close()
+        
+        return engine
+
+    def enable_read_only_engine(self) -> bool:
+        """为只读查询创建单独的只读连接池
+        
+        只读连接不会持有写锁，Web服务器的查询不会阻塞录制进程的写入。
+        只对SQLite生效，且需配置 database.sqlite.read_only_server。
+        """
+        if self.read_engine is not None:
+            return True
+        if not self._is_sqlite() or not config.get('database.sqlite.read_only_server', True):
+            return False
+        try:
+            db_path = os.path.abspath(self.database_url.replace('sqlite:///', ''))
+            ro_url = f"sqlite:///file:{Path(db_path).as_posix()}?mode=ro&uri=true"
+            self.read_engine = self._create_sqlite_engine(ro_url, read_only=True)
+            self.ReadSessionLocal = sessionmaker(bind=self.read_engine)
+            logging.info(f"已启用只读数据库连接: {db_path}")
+            return True
+        except Exception as e:
+            logging.warning(f"启用只读数据库连接失败，继续使用读写连接: {e}")
+            self.read_engine = None
+            self.ReadSessionLocal = None
+            return False
+
+    def _init_fulltext_index(self):
+        """创建OCR文本的FTS5全文索引（外部内容表，由触发器与 ocr_results 保持同步）
+        
+        使用trigram分词器，中文无需分词即可做子串匹配，与原来的 LIKE '%词%' 语义一致。
+        首次创建时从已有OCR结果重建索引。SQLite不支持时退回到 LIKE 查询。
+        """
+        if not self._is_sqlite() or not config.get('database.sqlite.fulltext_search', True):
+            return
+        try:
+            with self.engine.connect() as conn:
+                exists = conn.execute(text(
+                    "SELECT name FROM sqlite_master WHERE type='table' AND name='ocr_fts'"
+                )).fetchone() is not None
+                
+                if not exists:
+                    conn.execute(text(
+                        "CREATE VIRTUAL TABLE ocr_fts USING fts5("
+                        "text_content, content='ocr_results', content_rowid='id', tokenize='trigram')"
+                    ))
+                
+                conn.execute(text("""
+                    CREATE TRIGGER IF NOT EXISTS ocr_fts_ai AFTER INSERT ON ocr_results BEGIN
+                        INSERT INTO ocr_fts(rowid, text_content) VALUES (new.id, new.text_content);
+                    END
+                """))
+                conn.execute(text("""
+                    CREATE TRIGGER IF NOT EXISTS ocr_fts_ad AFTER DELETE ON ocr_results BEGIN
+                        INSERT INTO ocr_fts(ocr_fts, rowid, text_content) VALUES ('delete', old.id, old.text_content);
+                    END
+                """))
+                conn.execute(text("""
+                    CREATE TRIGGER IF NOT EXISTS ocr_fts_au AFTER UPDATE OF text_content ON ocr_results BEGIN
+                        INSERT INTO ocr_fts(ocr_fts, rowid, text_content) VALUES ('delete', old.id, old.text_content);
+                        INSERT INTO ocr_fts(rowid, text_content) VALUES (new.id, new.text_content);
+                    END
+                """))
+                
+                if not exists:
+                    conn.execute(text("INSERT INTO ocr_fts(ocr_fts) VALUES ('rebuild')"))
+                    logging.info("已创建OCR全文索引并从已有数据重建")
+                conn.commit()
+            
+            self.fts_enabled = True
+        except Exception as e:
+            logging.warning(f"OCR全文索引不可用，关键词搜索将使用LIKE: {e}")
+            self.fts_enabled = False
+
+    def rebuild_fulltext_index(self) -> bool:
+        """从 ocr_results 重建全文索引"""
+        if not self.fts_enabled:
+            return False
+        try:
+            with self.engine.connect() as conn:
+                conn.execute(text("INSERT INTO ocr_fts(ocr_fts) VALUES ('rebuild')"))
+                conn.commit()
+            logging.info("OCR全文索引已重建")
+            return True
+        except Exception as e:
+            logging.error(f"重建OCR全文索引失败: {e}")
+            return False
+
+    def build_fts_match(self, terms: List[str]) -> Optional[str]:
+        """把关键词（OR关系）转换为FTS5 MATCH表达式
+        
+        trigram分词器只能匹配3个字符及以上的子串，
+        有更短的关键词或全文索引不可用时返回None，调用方应退回到 LIKE 查询。
+        """
+        if not self.fts_enabled:
+            return None
+        terms = [t.strip() for t in terms if t and t.strip()]
+        if not terms or any(len(t) < 3 for t in terms):
+            return None
+        return " OR ".join('"' + t.replace('"', '""') + '"' for t in terms)
+
+    def fts_ranked_ocr_ids(self, match: str):
+        """返回命中全文索引的OCR结果ID及bm25分数的子查询（分数越小越相关）"""
+        # 使用FTS5内置的rank列（默认即bm25），辅助函数bm25()在子查询被展开后无法调用
+        return text(
+            "SELECT rowid AS ocr_id, rank AS fts_rank FROM ocr_fts WHERE ocr_fts MATCH :fts_match"
+        ).bindparams(fts_match=match).columns(ocr_id=Integer, fts_rank=Float).subquery('fts')
+
     def _create_performance_indexes(self):
         """创建性能优化索引"""
         try:
@@ -84,8 +302,14 @@ class DatabaseManager:
                         ("idx_screenshots_created_at", "CREATE INDEX IF NOT EXISTS idx_screenshots_created_at ON screenshots(created_at)"),
                         ("idx_screenshots_app_name", "CREATE INDEX IF NOT EXISTS idx_screenshots_app_name ON screenshots(app_name)"),
                         ("idx_screenshots_event_id", "CREATE INDEX IF NOT EXISTS idx_screenshots_event_id ON screenshots(event_id)"),
+                        # 部分索引：只包含未结束的事件，用于启动/缓存失效时查找当前事件
+                        ("idx_events_open", "CREATE INDEX IF NOT EXISTS idx_events_open ON events(start_time) WHERE end_time IS NULL"),
+                        ("idx_app_usage_logs_timestamp", "CREATE INDEX IF NOT EXISTS idx_app_usage_logs_timestamp ON app_usage_logs(timestamp)"),
+                        ("idx_app_usage_hourly_hour_start", "CREATE INDEX IF NOT EXISTS idx_app_usage_hourly_hour_start ON app_usage_hourly(hour_start)"),
+                        ("idx_search_index_screenshot_id", "CREATE INDEX IF NOT EXISTS idx_search_index_screenshot_id ON search_index(screenshot_id)"),
                         ("idx_processing_queue_status", "CREATE INDEX IF NOT EXISTS idx_processing_queue_status ON processing_queue(status)"),
-                        ("idx_processing_queue_task_type", "CREATE INDEX IF NOT EXISTS idx_processing_queue_task_type ON processing_queue(task_type)")
+                        ("idx_processing_queue_task_type", "CREATE INDEX IF NOT EXISTS idx_processing_queue_task_type ON processing_queue(task_type)"),
+                        ("idx_processing_queue_screenshot_id", "CREATE INDEX IF NOT EXISTS idx_processing_queue_screenshot_id ON processing_queue(screenshot_id)")
                     ]
                     
                     # 创建索引
@@ -118,9 +342,32 @@ class DatabaseManager:
         finally:
             session.close()
     
+    @contextmanager
+    def get_read_session(self):
+        """获取只读查询会话，未启用只读连接时退回到普通会话"""
+        if self.ReadSessionLocal is None:
+            with self.get_session() as session:
+                yield session
+            return
+        
+        session = self.ReadSessionLocal()
+        try:
+            yield session
+        except Exception as e:
+            logging.error(f"数据库查询失败: {e}")
+            raise
+        finally:
+            session.close()
+    
     def add_screenshot(self, file_path: str, file_hash: str, width: int, height: int, 
-                     screen_id: int = 0, app_name: str = None, window_title: str = None, event_id: Optional[int] = None) -> Optional[int]:
-        """添加截图记录"""
+                     screen_id: int = 0, app_name: str = None, window_title: str = None, event_id: Optional[int] = None,
+                     file_size: Optional[int] = None, phash: Optional[str] = None) -> Optional[int]:
+        """添加截图记录
+        
+        Args:
+            file_size: 文件大小（字节），已知时传入可避免再次访问文件
+            phash: 感知哈希的十六进制表示
+        """
         try:
             with self.get_session() as session:
                 # 首先检查是否已存在相同路径的截图
@@ -135,7 +382,8 @@ class DatabaseManager:
                     logging.debug(f"跳过重复哈希截图: {file_path}")
                     return existing_hash.id
                 
-                file_size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+                if file_size is None:
+                    file_size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
                 
                 screenshot = Screenshot(
                     file_path=file_path,
@@ -146,7 +394,8 @@ class DatabaseManager:
                     screen_id=screen_id,
                     app_name=app_name,
                     window_title=window_title,
-                    event_id=event_id
+                    event_id=event_id,
+                    phash=phash
                 )
                 
                 session.add(screenshot)
@@ -159,6 +408,153 @@ class DatabaseManager:
             logging.error(f"添加截图记录失败: {e}")
             return None
     
+    # 批量写入
+    def start_write_behind(self, batch_size: int = 50, flush_interval_ms: int = 1000,
+                           on_flush=None) -> WriteBehindBuffer:
+        """启用批量写入：截图、事件和应用使用记录先缓存，再按批在单个事务中提交
+        
+        Args:
+            on_flush: 每批提交后的回调，参数为本批记录
+        """
+        if self.write_behind is None:
+            self.write_behind = WriteBehindBuffer(self, batch_size=batch_size, flush_interval_ms=flush_interval_ms,
+                                                  on_flush=on_flush)
+            self.write_behind.start()
+        return self.write_behind
+
+    def stop_write_behind(self):
+        """停止批量写入并写完剩余记录"""
+        if self.write_behind is not None:
+            buffer = self.write_behind
+            self.write_behind = None
+            buffer.stop()
+
+    def enqueue_screenshot(self, file_path: str, file_hash: str, width: int, height: int,
+                           screen_id: int = 0, app_name: str = None, window_title: str = None,
+                           timestamp: Optional[datetime] = None, file_size: int = 0,
+                           phash: Optional[str] = None) -> bool:
+        """加入一条截图记录，所属事件在写入时解析
+        
+        未启用批量写入时直接同步写入。
+        """
+        record = PendingScreenshot(
+            file_path=file_path,
+            file_hash=file_hash,
+            width=width,
+            height=height,
+            screen_id=screen_id,
+            app_name=app_name,
+            window_title=window_title,
+            timestamp=timestamp or datetime.now(),
+            file_size=file_size,
+            phash=phash
+        )
+        if self.write_behind is None:
+            return self.write_batch([record]) == 1
+        self.write_behind.add(record)
+        return True
+
+    def enqueue_app_usage_log(self, app_name: str, window_title: str = None,
+                              duration_seconds: int = 0, screen_id: int = 0,
+                              timestamp: datetime = None, coalesce: bool = False) -> bool:
+        """加入一条应用使用记录，未启用批量写入时直接同步写入
+        
+        Args:
+            coalesce: 应用和窗口未变化时延长当前记录的时长，只在切换时插入新行
+        """
+        record = PendingAppUsage(
+            app_name=app_name,
+            window_title=window_title,
+            duration_seconds=duration_seconds,
+            screen_id=screen_id,
+            timestamp=timestamp or datetime.now(),
+            coalesce=coalesce
+        )
+        if self.write_behind is None:
+            return self.write_batch([record]) == 1
+        self.write_behind.add(record)
+        return True
+
+    def write_batch(self, records: List[Any]) -> int:
+        """在一个事务中按顺序写入一批记录
+        
+        整批失败时逐条重试，避免一条坏记录拖累整批。任何异常都按失败处理
+        （不只是数据库错误），调用方不会因为异常而丢掉整批记录。
+        
+        Returns:
+            成功处理的记录数
+        """
+        try:
+            closed_event_ids = []
+            with self.get_session() as session:
+                self._write_records(session, records, closed_event_ids)
+            for closed_event_id in closed_event_ids:
+                self._trigger_event_summary(closed_event_id)
+            return len(records)
+        except Exception as e:
+            # 事务已回滚，缓存中的事件和使用区间可能并未写入
+            self._cache_open_event(None)
+            self._usage_run = None
+            if len(records) == 1:
+                logging.error(f"写入记录失败: {e}")
+                return 0
+            logging.error(f"批量写入 {len(records)} 条记录失败，改为逐条写入: {e}")
+        
+        return sum(self.write_batch([record]) for record in records)
+
+    def _write_records(self, session: Session, records: List[Any], closed_event_ids: List[int]):
+        """把记录写入给定会话（不提交）"""
+        shots = [r for r in records if isinstance(r, PendingScreenshot)]
+        deduplicate = config.get('storage.deduplicate', True)
+        
+        # 一次性查出已存在的路径和哈希，替代每条截图两次查询
+        existing_paths = set()
+        existing_hashes = set()
+        chunk = 500
+        for i in range(0, len(shots), chunk):
+            part = shots[i:i + chunk]
+            existing_paths.update(row[0] for row in session.query(Screenshot.file_path).filter(
+                Screenshot.file_path.in_([r.file_path for r in part])))
+            if deduplicate:
+                existing_hashes.update(row[0] for row in session.query(Screenshot.file_hash).filter(
+                    Screenshot.file_hash.in_([r.file_hash for r in part])))
+        
+        for record in records:
+            if isinstance(record, PendingAppUsage):
+                self._apply_app_usage(session, record)
+                continue
+            
+            if record.file_path in existing_paths:
+                logging.debug(f"跳过重复路径截图: {record.file_path}")
+                continue
+            if deduplicate and record.file_hash in existing_hashes:
+                logging.debug(f"跳过重复哈希截图: {record.file_path}")
+                continue
+            
+            event_id, closed_event_id = self._resolve_event(
+                session, record.app_name, record.window_title, record.timestamp
+            )
+            if closed_event_id:
+                closed_event_ids.append(closed_event_id)
+            
+            session.add(Screenshot(
+                file_path=record.file_path,
+                file_hash=record.file_hash,
+                file_size=record.file_size,
+                width=record.width,
+                height=record.height,
+                screen_id=record.screen_id,
+                app_name=record.app_name,
+                window_title=record.window_title,
+                phash=record.phash,
+                event_id=event_id,
+                created_at=record.timestamp
+            ))
+            existing_paths.add(record.file_path)
+            existing_hashes.add(record.file_hash)
+        
+        session.flush()
+
     # 事件管理
     def _get_last_open_event(self, session: Session) -> Optional[Event]:
         """获取最后一个未结束的事件"""
@@ -205,6 +601,93 @@ class DatabaseManager:
         # 应用名和标题都相同 → 复用
         return True
 
+    def _resolve_event(self, session: Session, app_name: Optional[str], window_title: Optional[str],
+                       now_ts: datetime) -> tuple:
+        """在给定会话中按应用和窗口标题复用或创建事件
+        
+        Returns:
+            (事件ID, 被关闭的事件ID或None)
+        """
+        # 快速路径：与缓存的当前事件相同则直接复用
+        with self._open_event_lock:
+            cached = self._open_event
+        if cached and (not window_title or window_title == cached['window_title']) and self._should_reuse_event(
+                cached['app_name'], cached['window_title'], app_name, window_title):
+            # 本进程结束事件时会清空缓存；其他进程结束事件只能查库发现，按间隔确认一次仍未结束
+            revalidate_seconds = config.get('storage.open_event_revalidate_seconds', 30)
+            if time.monotonic() - cached['validated_at'] < revalidate_seconds:
+                return cached['id'], None
+            still_open = session.query(Event.id).filter(
+                Event.id == cached['id'], Event.end_time.is_(None)
+            ).first()
+            if still_open:
+                with self._open_event_lock:
+                    if self._open_event is cached:
+                        cached['validated_at'] = time.monotonic()
+                return cached['id'], None
+            self._cache_open_event(None)
+        
+        closed_event_id = None
+        last_event = self._get_last_open_event(session)
+
+        # 判断是否应该复用事件
+        if last_event:
+            should_reuse = self._should_reuse_event(
+                old_app=last_event.app_name,
+                old_title=last_event.window_title,
+                new_app=app_name,
+                new_title=window_title
+            )
+            
+            if should_reuse:
+                # 复用事件，更新窗口标题
+                if window_title and window_title != last_event.window_title:
+                    last_event.window_title = window_title
+                session.flush()
+                self._cache_open_event(last_event)
+                return last_event.id, None
+            else:
+                # 不复用，关闭旧事件
+                last_event.end_time = now_ts
+                closed_event_id = last_event.id
+                session.flush()
+                logging.info(f"关闭事件 {closed_event_id}: {last_event.app_name} - {last_event.window_title}")
+
+        # 创建新事件
+        new_event = Event(
+            app_name=app_name,
+            window_title=window_title,
+            start_time=now_ts
+        )
+        session.add(new_event)
+        session.flush()
+        self._cache_open_event(new_event)
+        logging.info(f"创建新事件 {new_event.id}: {app_name} - {window_title}")
+        return new_event.id, closed_event_id
+
+    def _cache_open_event(self, event_obj: Optional[Event]):
+        """更新当前事件缓存，传入None表示失效"""
+        with self._open_event_lock:
+            if event_obj is None:
+                self._open_event = None
+            else:
+                self._open_event = {
+                    'id': event_obj.id,
+                    'app_name': event_obj.app_name,
+                    'window_title': event_obj.window_title,
+                    'validated_at': time.monotonic()
+                }
+
+    def _trigger_event_summary(self, closed_event_id: Optional[int]):
+        """在session关闭后，异步生成已关闭事件的摘要"""
+        if not closed_event_id:
+            return
+        try:
+            from lifetrace_backend.event_summary_service import generate_event_summary_async
+            generate_event_summary_async(closed_event_id)
+        except Exception as e:
+            logging.error(f"触发事件摘要生成失败: {e}")
+
     def get_or_create_event(self, app_name: Optional[str], window_title: Optional[str], timestamp: Optional[datetime] = None) -> Optional[int]:
         """按当前前台应用和窗口标题维护事件。
         
@@ -221,60 +704,26 @@ class DatabaseManager:
             事件ID
         """
         try:
-            closed_event_id = None  # 记录被关闭的事件ID
-            
             with self.get_session() as session:
-                now_ts = timestamp or datetime.now()
-                last_event = self._get_last_open_event(session)
-
-                # 判断是否应该复用事件
-                if last_event:
-                    should_reuse = self._should_reuse_event(
-                        old_app=last_event.app_name,
-                        old_title=last_event.window_title,
-                        new_app=app_name,
-                        new_title=window_title
-                    )
-                    
-                    if should_reuse:
-                        # 复用事件，更新窗口标题
-                        if window_title and window_title != last_event.window_title:
-                            last_event.window_title = window_title
-                        session.flush()
-                        return last_event.id
-                    else:
-                        # 不复用，关闭旧事件
-                        last_event.end_time = now_ts
-                        closed_event_id = last_event.id
-                        session.flush()
-                        logging.info(f"关闭事件 {closed_event_id}: {last_event.app_name} - {last_event.window_title}")
-
-                # 创建新事件
-                new_event = Event(
-                    app_name=app_name,
-                    window_title=window_title,
-                    start_time=now_ts
+                event_id, closed_event_id = self._resolve_event(
+                    session, app_name, window_title, timestamp or datetime.now()
                 )
-                session.add(new_event)
-                session.flush()
-                new_event_id = new_event.id
-                logging.info(f"创建新事件 {new_event_id}: {app_name} - {window_title}")
             
-            # 在session关闭后，异步生成已关闭事件的摘要
-            if closed_event_id:
-                try:
-                    from lifetrace_backend.event_summary_service import generate_event_summary_async
-                    generate_event_summary_async(closed_event_id)
-                except Exception as e:
-                    logging.error(f"触发事件摘要生成失败: {e}")
-            
-            return new_event_id
+            self._trigger_event_summary(closed_event_id)
+            return event_id
         except SQLAlchemyError as e:
+            # 事务已回滚，缓存中的事件可能并未写入
+            self._cache_open_event(None)
             logging.error(f"获取或创建事件失败: {e}")
             return None
 
     def close_active_event(self, end_time: Optional[datetime] = None) -> bool:
         """主动结束当前事件（可在程序退出时调用）"""
+        # 先写入批量队列中的截图，避免它们在事件结束后重新打开事件
+        if self.write_behind is not None:
+            self.write_behind.flush()
+        
+        self._cache_open_event(None)
         try:
             closed_event_id = None
             with self.get_session() as session:
@@ -284,14 +733,7 @@ class DatabaseManager:
                     closed_event_id = last_event.id
                     session.flush()
             
-            # 在session关闭后，异步生成已关闭事件的摘要
-            if closed_event_id:
-                try:
-                    from lifetrace_backend.event_summary_service import generate_event_summary_async
-                    generate_event_summary_async(closed_event_id)
-                except Exception as e:
-                    logging.error(f"触发事件摘要生成失败: {e}")
-            
+            self._trigger_event_summary(closed_event_id)
             return closed_event_id is not None
         except SQLAlchemyError as e:
             logging.error(f"结束事件失败: {e}")
@@ -330,8 +772,8 @@ class DatabaseManager:
                     app_name: Optional[str] = None) -> List[Dict[str, Any]]:
         """列出事件摘要（包含首张截图ID与截图数量）"""
         try:
-            with self.get_session() as session:
-                q = session.query(Event)
+            with self.get_read_session() as session:
+                q = self._query_events_with_stats(session)
                 if start_date:
                     q = q.filter(Event.start_time >= start_date)
                 if end_date:
@@ -340,25 +782,7 @@ class DatabaseManager:
                     q = q.filter(Event.app_name.like(f"%{app_name}%"))
 
                 q = q.order_by(Event.start_time.desc()).offset(offset).limit(limit)
-                events = q.all()
-
-                results: List[Dict[str, Any]] = []
-                for ev in events:
-                    # 统计截图与首图
-                    first_shot = session.query(Screenshot).filter(Screenshot.event_id == ev.id).order_by(Screenshot.created_at.asc()).first()
-                    shot_count = session.query(Screenshot).filter(Screenshot.event_id == ev.id).count()
-                    results.append({
-                        'id': ev.id,
-                        'app_name': ev.app_name,
-                        'window_title': ev.window_title,
-                        'start_time': ev.start_time,
-                        'end_time': ev.end_time,
-                        'screenshot_count': shot_count,
-                        'first_screenshot_id': first_shot.id if first_shot else None,
-                        'ai_title': ev.ai_title,
-                        'ai_summary': ev.ai_summary
-                    })
-                return results
+                return [self._event_row_to_dict(*row) for row in q.all()]
         except SQLAlchemyError as e:
             logging.error(f"列出事件失败: {e}")
             return []
@@ -366,7 +790,7 @@ class DatabaseManager:
     def get_event_screenshots(self, event_id: int) -> List[Dict[str, Any]]:
         """获取事件内截图列表"""
         try:
-            with self.get_session() as session:
+            with self.get_read_session() as session:
                 shots = session.query(Screenshot).filter(Screenshot.event_id == event_id).order_by(Screenshot.created_at.asc()).all()
                 return [{
                     'id': s.id,
@@ -384,7 +808,7 @@ class DatabaseManager:
     def search_events_simple(self, query: Optional[str], limit: int = 50) -> List[Dict[str, Any]]:
         """基于SQLite的简单事件搜索（按OCR文本聚合）"""
         try:
-            with self.get_session() as session:
+            with self.get_read_session() as session:
                 base_sql = """
                     SELECT e.id AS event_id,
                            e.app_name AS app_name,
@@ -399,14 +823,24 @@ class DatabaseManager:
                 """
                 where_clause = []
                 params: Dict[str, Any] = {}
-                if query:
+                order_by = "e.start_time DESC"
+                fts_match = self.build_fts_match([query]) if query else None
+                if fts_match:
+                    # 全文索引命中，按事件内最相关的OCR结果的bm25分数排序
+                    base_sql += """
+                    JOIN (SELECT rowid AS ocr_id, rank AS fts_rank
+                          FROM ocr_fts WHERE ocr_fts MATCH :fts_match) f ON f.ocr_id = o.id
+                    """
+                    params['fts_match'] = fts_match
+                    order_by = "MIN(f.fts_rank), e.start_time DESC"
+                elif query:
                     where_clause.append("(o.text_content LIKE :q)")
                     params['q'] = f"%{query}%"
 
                 sql = base_sql
                 if where_clause:
                     sql += " WHERE " + " AND ".join(where_clause)
-                sql += " GROUP BY e.id ORDER BY e.start_time DESC LIMIT :limit"
+                sql += f" GROUP BY e.id ORDER BY {order_by} LIMIT :limit"
                 params['limit'] = limit
 
                 rows = session.execute(text(sql), params).fetchall()
@@ -429,31 +863,55 @@ class DatabaseManager:
     def get_event_summary(self, event_id: int) -> Optional[Dict[str, Any]]:
         """获取单个事件的摘要信息"""
         try:
-            with self.get_session() as session:
-                ev = session.query(Event).filter(Event.id == event_id).first()
-                if not ev:
-                    return None
-                first_shot = session.query(Screenshot).filter(Screenshot.event_id == ev.id).order_by(Screenshot.created_at.asc()).first()
-                shot_count = session.query(Screenshot).filter(Screenshot.event_id == ev.id).count()
-                return {
-                    'id': ev.id,
-                    'app_name': ev.app_name,
-                    'window_title': ev.window_title,
-                    'start_time': ev.start_time,
-                    'end_time': ev.end_time,
-                    'screenshot_count': shot_count,
-                    'first_screenshot_id': first_shot.id if first_shot else None,
-                    'ai_title': ev.ai_title,
-                    'ai_summary': ev.ai_summary
-                }
+            with self.get_read_session() as session:
+                row = self._query_events_with_stats(session).filter(Event.id == event_id).first()
+                return self._event_row_to_dict(*row) if row else None
         except SQLAlchemyError as e:
             logging.error(f"获取事件摘要失败: {e}")
             return None
 
+    def get_event_summaries(self, event_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """批量获取事件摘要（一次查询），返回 {事件ID: 摘要}"""
+        if not event_ids:
+            return {}
+        try:
+            with self.get_read_session() as session:
+                rows = self._query_events_with_stats(session).filter(Event.id.in_(list(event_ids))).all()
+                return {row[0].id: self._event_row_to_dict(*row) for row in rows}
+        except SQLAlchemyError as e:
+            logging.error(f"批量获取事件摘要失败: {e}")
+            return {}
+
+    def _query_events_with_stats(self, session: Session):
+        """查询事件及其截图数量、首张截图ID
+        
+        截图统计用关联子查询在同一条SQL中完成（走 idx_screenshots_event_id），
+        避免每个事件再单独查询两次。首张截图取该事件中ID最小的截图。
+        """
+        shot_count = select(func.count(Screenshot.id)).where(
+            Screenshot.event_id == Event.id).correlate(Event).scalar_subquery()
+        first_shot_id = select(func.min(Screenshot.id)).where(
+            Screenshot.event_id == Event.id).correlate(Event).scalar_subquery()
+        return session.query(Event, shot_count.label('screenshot_count'), first_shot_id.label('first_screenshot_id'))
+
+    @staticmethod
+    def _event_row_to_dict(ev: Event, shot_count: int, first_shot_id: Optional[int]) -> Dict[str, Any]:
+        return {
+            'id': ev.id,
+            'app_name': ev.app_name,
+            'window_title': ev.window_title,
+            'start_time': ev.start_time,
+            'end_time': ev.end_time,
+            'screenshot_count': shot_count or 0,
+            'first_screenshot_id': first_shot_id,
+            'ai_title': ev.ai_title,
+            'ai_summary': ev.ai_summary
+        }
+
     def get_event_id_by_screenshot(self, screenshot_id: int) -> Optional[int]:
         """根据截图ID获取所属事件ID"""
         try:
-            with self.get_session() as session:
+            with self.get_read_session() as session:
                 s = session.query(Screenshot).filter(Screenshot.id == screenshot_id).first()
                 return int(s.event_id) if s and s.event_id is not None else None
         except SQLAlchemyError as e:
@@ -463,7 +921,7 @@ class DatabaseManager:
     def get_event_text(self, event_id: int) -> str:
         """聚合事件下所有截图的OCR文本内容，按时间排序拼接"""
         try:
-            with self.get_session() as session:
+            with self.get_read_session() as session:
                 from lifetrace_backend.models import OCRResult
                 ocr_list = session.query(OCRResult).join(Screenshot, OCRResult.screenshot_id == Screenshot.id).\
                     filter(Screenshot.event_id == event_id).\
@@ -475,8 +933,14 @@ class DatabaseManager:
             return ""
     
     def add_ocr_result(self, screenshot_id: int, text_content: str, confidence: float = 0.0,
-                      language: str = 'ch', processing_time: float = 0.0) -> Optional[int]:
-        """添加OCR结果"""
+                      language: str = 'ch', processing_time: float = 0.0,
+                      reused_from: Optional[int] = None, layout: Optional[bytes] = None) -> Optional[int]:
+        """添加OCR结果
+        
+        Args:
+            reused_from: 复用的OCR结果ID（画面几乎相同、未重新识别时）
+            layout: 识别条目的打包数据（见 ocr_layout.pack_ocr_items）
+        """
         try:
             with self.get_session() as session:
                 ocr_result = OCRResult(
@@ -484,7 +948,9 @@ class DatabaseManager:
                     text_content=text_content,
                     confidence=confidence,
                     language=language,
-                    processing_time=processing_time
+                    processing_time=processing_time,
+                    reused_from=reused_from,
+                    layout=layout
                 )
                 
                 session.add(ocr_result)
@@ -496,6 +962,10 @@ class DatabaseManager:
                     screenshot.is_processed = True
                     screenshot.processed_at = datetime.now()
                 
+                # 更新关键词倒排索引
+                if config.get('storage.keyword_index', True):
+                    self._index_screenshot_text(session, screenshot_id)
+                
                 logging.debug(f"添加OCR结果: {ocr_result.id}")
                 return ocr_result.id
                 
@@ -503,6 +973,145 @@ class DatabaseManager:
             logging.error(f"添加OCR结果失败: {e}")
             return None
     
+    def find_reusable_ocr_result(self, screenshot_id: int, max_distance: int,
+                                 candidates: int = 5) -> Optional[Dict[str, Any]]:
+        """查找可直接复用的OCR结果
+
+        在同一事件、同一屏幕中最近完成识别的截图里，找感知哈希汉明距离不超过 max_distance 的一张，
+        返回其OCR结果。只与真正识别过的结果比较（不与复用得到的结果比较），
+        避免连续复用时画面差异逐步累积。
+
+        Returns:
+            包含 ocr_result_id、text_content、confidence、language、layout、distance 的字典，没有可复用结果时返回None
+        """
+        try:
+            with self.get_read_session() as session:
+                screenshot = session.query(
+                    Screenshot.event_id, Screenshot.screen_id, Screenshot.phash
+                ).filter(Screenshot.id == screenshot_id).first()
+                if not screenshot or not screenshot.event_id or not screenshot.phash:
+                    return None
+                
+                rows = session.query(
+                    Screenshot.phash, OCRResult.id, OCRResult.text_content,
+                    OCRResult.confidence, OCRResult.language, OCRResult.layout
+                ).join(
+                    OCRResult, OCRResult.screenshot_id == Screenshot.id
+                ).filter(
+                    Screenshot.event_id == screenshot.event_id,
+                    Screenshot.screen_id == screenshot.screen_id,
+                    Screenshot.id != screenshot_id,
+                    Screenshot.phash.isnot(None),
+                    OCRResult.reused_from.is_(None)
+                ).order_by(OCRResult.id.desc()).limit(candidates).all()
+                
+                value = int(screenshot.phash, 16)
+                best = None
+                for phash, ocr_result_id, text_content, confidence, language, layout in rows:
+                    distance = bin(value ^ int(phash, 16)).count('1')
+                    if distance <= max_distance and (best is None or distance < best['distance']):
+                        best = {
+                            'ocr_result_id': ocr_result_id,
+                            'text_content': text_content,
+                            'confidence': confidence,
+                            'language': language,
+                            'layout': layout,
+                            'distance': distance
+                        }
+                return best
+        except (SQLAlchemyError, ValueError) as e:
+            logging.error(f"查找可复用OCR结果失败: {e}")
+            return None
+    
+    # 关键词倒排索引
+    def _index_screenshot_text(self, session: Session, screenshot_id: int):
+        """按截图的全部OCR文本重建其 SearchIndex 记录和倒排索引"""
+        texts = [row[0] for row in session.query(OCRResult.text_content).filter(
+            OCRResult.screenshot_id == screenshot_id).order_by(OCRResult.id) if row[0]]
+        content = "\n".join(texts)
+        
+        entry = session.query(SearchIndex).filter_by(screenshot_id=screenshot_id).first()
+        keywords = json.dumps(extract_keywords(content), ensure_ascii=False)
+        if entry:
+            entry.content = content
+            entry.keywords = keywords
+        else:
+            session.add(SearchIndex(screenshot_id=screenshot_id, content=content, keywords=keywords))
+        
+        session.query(SearchPosting).filter(SearchPosting.screenshot_id == screenshot_id).delete(synchronize_session=False)
+        terms = extract_terms(content)
+        if terms:
+            session.execute(SearchPosting.__table__.insert(),
+                            [{'term': term, 'screenshot_id': screenshot_id} for term in terms])
+
+    def index_missing_keywords(self, limit: int = 500) -> int:
+        """为尚未建立关键词索引的截图补建索引（用于升级后逐步回填）
+        
+        Returns:
+            本次补建的截图数
+        """
+        try:
+            with self.get_session() as session:
+                missing = [row[0] for row in session.query(OCRResult.screenshot_id).filter(
+                    ~exists().where(SearchIndex.screenshot_id == OCRResult.screenshot_id)
+                ).distinct().limit(limit)]
+                for screenshot_id in missing:
+                    self._index_screenshot_text(session, screenshot_id)
+            
+            if missing:
+                logging.info(f"已为 {len(missing)} 张截图补建关键词索引")
+            else:
+                self._keyword_index_complete = True
+            return len(missing)
+        except SQLAlchemyError as e:
+            logging.error(f"补建关键词索引失败: {e}")
+            return 0
+
+    def is_keyword_index_complete(self) -> bool:
+        """关键词索引是否已覆盖全部OCR结果
+        
+        新的OCR结果写入时会同步建索引，因此一旦覆盖完整就不再重复检查；
+        未完整时最多每5分钟检查一次。
+        """
+        if self._keyword_index_complete:
+            return True
+        if time.time() - self._keyword_index_checked_at < 300:
+            return False
+        self._keyword_index_checked_at = time.time()
+        try:
+            with self.get_read_session() as session:
+                has_missing = session.query(OCRResult.id).filter(
+                    ~exists().where(SearchIndex.screenshot_id == OCRResult.screenshot_id)
+                ).first() is not None
+            self._keyword_index_complete = not has_missing
+        except SQLAlchemyError as e:
+            logging.warning(f"检查关键词索引状态失败: {e}")
+        return self._keyword_index_complete
+
+    def keyword_posting_query(self, keywords: List[str]):
+        """把关键词（OR关系）转换为倒排索引查询，返回命中的截图ID子查询
+        
+        单个关键词：对其所有检索词的倒排列表求交集（GROUP BY + HAVING COUNT）；
+        多个关键词：各自结果取并集。
+        索引未启用、未覆盖完整，或任一关键词没有可安全使用的检索词（例如 "log" 可能是 "logging"
+        的一部分、单个汉字可能在多字片段中）时返回None，调用方应退回到不经过倒排索引的子串匹配。
+        """
+        if not keywords or not config.get('storage.keyword_index', True) or not self.is_keyword_index_complete():
+            return None
+        
+        selects = []
+        for keyword in keywords:
+            terms = query_terms(keyword)
+            if not terms:
+                return None
+            selects.append(
+                select(SearchPosting.screenshot_id)
+                .where(SearchPosting.term.in_(terms))
+                .group_by(SearchPosting.screenshot_id)
+                .having(func.count() == len(terms))
+            )
+        return selects[0] if len(selects) == 1 else union(*selects)
+
     def add_processing_task(self, screenshot_id: int, task_type: str = 'ocr') -> Optional[int]:
         """添加处理任务到队列"""
         try:
@@ -557,6 +1166,9 @@ class DatabaseManager:
         detached.status = task.status
         detached.retry_count = task.retry_count
         detached.error_message = task.error_message
+        detached.claimed_by = task.claimed_by
+        detached.lease_until = task.lease_until
+        detached.retry_after = task.retry_after
         detached.created_at = task.created_at
         detached.updated_at = task.updated_at
         return detached
@@ -569,6 +1181,8 @@ class DatabaseManager:
                 if task:
                     task.status = status
                     task.updated_at = datetime.now()
+                    if status != 'processing':
+                        task.lease_until = None
                     
                     if status == 'failed':
                         task.retry_count += 1
@@ -579,10 +1193,239 @@ class DatabaseManager:
         except SQLAlchemyError as e:
             logging.error(f"更新任务状态失败: {e}")
     
+    def enqueue_ocr_tasks(self, limit: int = 200) -> int:
+        """为尚无OCR结果、也没有OCR任务的截图创建待处理任务
+
+        单条 INSERT ... SELECT 在SQLite写锁内执行，多个进程同时调用也不会重复入队。
+        按创建时间降序入队，优先处理最新的截图。
+
+        Returns:
+            新入队的任务数
+        """
+        try:
+            with self.get_session() as session:
+                now = datetime.now()
+                result = session.execute(text("""
+                    INSERT INTO processing_queue
+                        (screenshot_id, task_type, status, retry_count, created_at, updated_at)
+                    SELECT s.id, 'ocr', 'pending', 0, :now, :now
+                    FROM screenshots s
+                    WHERE NOT EXISTS (SELECT 1 FROM ocr_results o WHERE o.screenshot_id = s.id)
+                      AND NOT EXISTS (
+                          SELECT 1 FROM processing_queue q
+                          WHERE q.screenshot_id = s.id AND q.task_type = 'ocr'
+                            AND q.status IN ('pending', 'processing', 'failed')
+                      )
+                    ORDER BY s.created_at DESC
+                    LIMIT :limit
+                """).bindparams(bindparam('now', type_=DateTime)), {'now': now, 'limit': limit})
+                count = result.rowcount or 0
+                if count:
+                    logging.debug(f"新增OCR任务: {count}")
+                return count
+        except SQLAlchemyError as e:
+            logging.error(f"创建OCR任务失败: {e}")
+            return 0
+    
+    def claim_tasks(self, task_type: str = 'ocr', limit: int = 1, worker_id: Optional[str] = None,
+                    lease_seconds: int = 120, max_retries: int = 3) -> List[Dict[str, Any]]:
+        """认领待处理任务并设置租约
+
+        可认领的任务包括已到重试时间的待处理任务，以及租约已过期的处理中任务（认领它的进程可能已退出）。
+        认领通过单条 UPDATE ... RETURNING 完成，多个进程同时认领也不会拿到同一个任务；
+        SQLite 3.35 以下不支持 RETURNING 时，改为逐条条件更新。
+        租约过期被重新认领计为一次重试，重试次数用尽的任务标记为失败。
+
+        Args:
+            task_type: 任务类型
+            limit: 最多认领的任务数
+            worker_id: 认领者标识，用于完成/失败时校验任务仍归自己所有
+            lease_seconds: 租约时长（秒），应大于处理一批任务所需的时间
+            max_retries: 最大重试次数
+
+        Returns:
+            认领到的任务列表，包含 task_id、screenshot_id、file_path、screen_id 和 retry_count
+        """
+        now = datetime.now()
+        lease_until = now + timedelta(seconds=lease_seconds)
+        
+        def expired(task):
+            return and_(
+                task.status == 'processing',
+                or_(task.lease_until.is_(None), task.lease_until < now)
+            )
+        
+        def claimable(task):
+            ready = and_(task.status == 'pending', or_(task.retry_after.is_(None), task.retry_after <= now))
+            return and_(task.task_type == task_type, or_(ready, expired(task)))
+        
+        try:
+            with self.get_session() as session:
+                # 租约过期且重试次数用尽的任务不再认领
+                session.query(ProcessingQueue).filter(
+                    ProcessingQueue.task_type == task_type,
+                    expired(ProcessingQueue),
+                    ProcessingQueue.retry_count + 1 >= max_retries
+                ).update({
+                    'status': 'failed',
+                    'retry_count': ProcessingQueue.retry_count + 1,
+                    'error_message': '任务租约多次过期',
+                    'lease_until': None,
+                    'updated_at': now
+                }, synchronize_session=False)
+                
+                values = {
+                    'status': 'processing',
+                    'claimed_by': worker_id,
+                    'lease_until': lease_until,
+                    'retry_after': None,
+                    'updated_at': now,
+                    # 抢占过期租约计为一次重试
+                    'retry_count': ProcessingQueue.retry_count + case(
+                        (ProcessingQueue.status == 'processing', 1), else_=0
+                    )
+                }
+                # 候选任务使用别名，避免子查询与外层 UPDATE 的同名表关联
+                queued = aliased(ProcessingQueue)
+                candidates = select(queued.id).join(
+                    Screenshot, Screenshot.id == queued.screenshot_id
+                ).where(claimable(queued)).order_by(Screenshot.created_at.desc())
+                
+                if self.engine.dialect.update_returning:
+                    rows = session.execute(
+                        update(ProcessingQueue)
+                        .where(ProcessingQueue.id.in_(candidates.limit(limit).scalar_subquery()))
+                        .where(claimable(ProcessingQueue))
+                        .values(**values)
+                        .returning(ProcessingQueue.id, ProcessingQueue.screenshot_id, ProcessingQueue.retry_count)
+                        .execution_options(synchronize_session=False)
+                    ).fetchall()
+                else:
+                    rows = []
+                    for (task_id,) in session.execute(candidates.limit(limit * 2)).fetchall():
+                        updated = session.execute(
+                            update(ProcessingQueue)
+                            .where(ProcessingQueue.id == task_id)
+                            .where(claimable(ProcessingQueue))
+                            .values(**values)
+                            .execution_options(synchronize_session=False)
+                        ).rowcount
+                        if updated == 1:
+                            retry_count = session.query(ProcessingQueue.retry_count).filter(
+                                ProcessingQueue.id == task_id
+                            ).scalar()
+                            screenshot_id = session.query(ProcessingQueue.screenshot_id).filter(
+                                ProcessingQueue.id == task_id
+                            ).scalar()
+                            rows.append((task_id, screenshot_id, retry_count))
+                            if len(rows) >= limit:
+                                break
+                
+                if not rows:
+                    return []
+                
+                screenshots = {row.id: row for row in session.query(
+                    Screenshot.id, Screenshot.file_path, Screenshot.screen_id
+                ).filter(Screenshot.id.in_([row[1] for row in rows])).all()}
+                claimed = [{
+                    'task_id': task_id,
+                    'screenshot_id': screenshot_id,
+                    'file_path': screenshots[screenshot_id].file_path if screenshot_id in screenshots else None,
+                    'screen_id': screenshots[screenshot_id].screen_id if screenshot_id in screenshots else None,
+                    'retry_count': retry_count
+                } for task_id, screenshot_id, retry_count in rows]
+                logging.debug(f"认领{task_type}任务: {[task['task_id'] for task in claimed]}")
+                return claimed
+        except SQLAlchemyError as e:
+            logging.error(f"认领{task_type}任务失败: {e}")
+            return []
+    
+    def complete_task(self, task_id: int, worker_id: Optional[str] = None) -> bool:
+        """标记任务完成
+
+        指定 worker_id 时只有当前仍持有该任务的进程才能完成它（租约过期后可能已被其他进程认领）。
+        """
+        try:
+            with self.get_session() as session:
+                query = session.query(ProcessingQueue).filter(ProcessingQueue.id == task_id)
+                if worker_id is not None:
+                    query = query.filter(ProcessingQueue.claimed_by == worker_id)
+                updated = query.update({
+                    'status': 'completed',
+                    'lease_until': None,
+                    'error_message': None,
+                    'updated_at': datetime.now()
+                }, synchronize_session=False)
+                if not updated:
+                    logging.warning(f"任务 {task_id} 已不属于 {worker_id}，未标记完成")
+                return updated == 1
+        except SQLAlchemyError as e:
+            logging.error(f"标记任务完成失败: {e}")
+            return False
+    
+    def fail_task(self, task_id: int, error_message: str, worker_id: Optional[str] = None,
+                  max_retries: int = 3, retry_backoff_seconds: float = 30) -> Optional[str]:
+        """记录任务失败
+
+        重试次数未用尽时任务回到待处理状态，在 retry_backoff_seconds * 2^(重试次数-1) 秒后才能再次认领；
+        否则标记为失败，不再自动重试（可通过 requeue_failed_tasks 重新入队）。
+
+        Returns:
+            任务的新状态（pending/failed），任务已不属于该进程时返回None
+        """
+        try:
+            with self.get_session() as session:
+                query = session.query(ProcessingQueue).filter(ProcessingQueue.id == task_id)
+                if worker_id is not None:
+                    query = query.filter(ProcessingQueue.claimed_by == worker_id)
+                task = query.first()
+                if not task:
+                    return None
+                
+                task.retry_count = (task.retry_count or 0) + 1
+                task.error_message = error_message
+                task.lease_until = None
+                task.updated_at = datetime.now()
+                task.status = 'pending' if task.retry_count < max_retries else 'failed'
+                if task.status == 'pending':
+                    backoff = retry_backoff_seconds * 2 ** (task.retry_count - 1)
+                    task.retry_after = task.updated_at + timedelta(seconds=backoff)
+                logging.debug(f"任务 {task_id} 失败（第 {task.retry_count} 次）: {error_message}")
+                return task.status
+        except SQLAlchemyError as e:
+            logging.error(f"记录任务失败状态失败: {e}")
+            return None
+    
+    def requeue_failed_tasks(self, task_type: str = 'ocr') -> int:
+        """把重试次数用尽而失败的任务重新放回待处理状态（重试次数清零）
+
+        Returns:
+            重新入队的任务数
+        """
+        try:
+            with self.get_session() as session:
+                count = session.query(ProcessingQueue).filter(
+                    ProcessingQueue.task_type == task_type,
+                    ProcessingQueue.status == 'failed'
+                ).update({
+                    'status': 'pending',
+                    'retry_count': 0,
+                    'claimed_by': None,
+                    'lease_until': None,
+                    'retry_after': None,
+                    'updated_at': datetime.now()
+                }, synchronize_session=False)
+                if count:
+                    logging.info(f"重新入队 {count} 个失败的{task_type}任务")
+                return count
+        except SQLAlchemyError as e:
+            logging.error(f"重新入队失败任务失败: {e}")
+            return 0
+    
     def get_screenshot_by_id(self, screenshot_id: int) -> Optional[dict]:
         """根据ID获取截图"""
         try:
-            with self.get_session() as session:
+            with self.get_read_session() as session:
                 screenshot = session.query(Screenshot).filter_by(id=screenshot_id).first()
                 if screenshot:
                     # 转换为字典避免会话分离问题
@@ -608,7 +1451,7 @@ class DatabaseManager:
     def get_screenshot_by_path(self, file_path: str) -> Optional[dict]:
         """根据文件路径获取截图"""
         try:
-            with self.get_session() as session:
+            with self.get_read_session() as session:
                 screenshot = session.query(Screenshot).filter_by(file_path=file_path).first()
                 if screenshot:
                     # 转换为字典避免会话分离问题
@@ -648,7 +1491,7 @@ class DatabaseManager:
     def get_ocr_results_by_screenshot(self, screenshot_id: int) -> List[Dict[str, Any]]:
         """根据截图ID获取OCR结果"""
         try:
-            with self.get_session() as session:
+            with self.get_read_session() as session:
                 ocr_results = session.query(OCRResult).filter_by(screenshot_id=screenshot_id).all()
                 
                 # 转换为字典列表
@@ -670,12 +1513,40 @@ class DatabaseManager:
             logging.error(f"获取OCR结果失败: {e}")
             return []
     
+    def get_ocr_lines(self, screenshot_id: int, min_confidence: float = 0.0) -> List[Dict[str, Any]]:
+        """获取截图的逐行识别结果（文本、置信度和原图坐标下的四点坐标框）
+        
+        数据来自OCR时保存的打包数据，不需要重新识别；旧数据没有打包数据时返回空列表。
+        """
+        try:
+            with self.get_read_session() as session:
+                row = session.query(OCRResult.layout, Screenshot.width, Screenshot.height).join(
+                    Screenshot, Screenshot.id == OCRResult.screenshot_id
+                ).filter(
+                    OCRResult.screenshot_id == screenshot_id,
+                    OCRResult.layout.isnot(None)
+                ).order_by(OCRResult.id.desc()).first()
+                if not row:
+                    return []
+                
+                items, layout_width, layout_height = unpack_ocr_items(row.layout)
+                scale_x = row.width / layout_width if layout_width and row.width else 1.0
+                scale_y = row.height / layout_height if layout_height and row.height else 1.0
+                return [{
+                    'text': text,
+                    'confidence': round(score, 4),
+                    'box': [[x * scale_x, y * scale_y] for x, y in box]
+                } for box, text, score in items if score >= min_confidence]
+        except (SQLAlchemyError, ValueError) as e:
+            logging.error(f"获取逐行OCR结果失败: {e}")
+            return []
+    
     def search_screenshots(self, query: str = None, start_date: datetime = None, 
                           end_date: datetime = None, app_name: str = None, 
                           limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
         """搜索截图"""
         try:
-            with self.get_session() as session:
+            with self.get_read_session() as session:
                 # 基础查询
                 query_obj = session.query(
                     Screenshot,
@@ -692,11 +1563,19 @@ class DatabaseManager:
                 if app_name:
                     query_obj = query_obj.filter(Screenshot.app_name.like(f"%{app_name}%"))
                 
-                if query:
-                    query_obj = query_obj.filter(OCRResult.text_content.like(f"%{query}%"))
+                fts_match = self.build_fts_match([query]) if query else None
+                if fts_match:
+                    # 全文索引命中，按bm25相关性排序
+                    fts = self.fts_ranked_ocr_ids(fts_match)
+                    query_obj = query_obj.join(fts, fts.c.ocr_id == OCRResult.id)
+                    query_obj = query_obj.order_by(fts.c.fts_rank.asc(), Screenshot.created_at.desc())
+                else:
+                    if query:
+                        query_obj = query_obj.filter(OCRResult.text_content.like(f"%{query}%"))
+                    query_obj = query_obj.order_by(Screenshot.created_at.desc())
                 
                 # 应用分页：先排序，再应用offset和limit
-                results = query_obj.order_by(Screenshot.created_at.desc()).offset(offset).limit(limit).all()
+                results = query_obj.offset(offset).limit(limit).all()
                 
                 # 格式化结果
                 formatted_results = []
@@ -721,10 +1600,12 @@ class DatabaseManager:
     def get_statistics(self) -> Dict[str, Any]:
         """获取统计信息"""
         try:
-            with self.get_session() as session:
+            with self.get_read_session() as session:
                 total_screenshots = session.query(Screenshot).count()
                 processed_screenshots = session.query(Screenshot).filter_by(is_processed=True).count()
                 pending_tasks = session.query(ProcessingQueue).filter_by(status='pending').count()
+                # 复用已有结果、省去的OCR识别次数
+                reused_ocr_results = session.query(OCRResult).filter(OCRResult.reused_from.isnot(None)).count()
                 
                 # 今日统计
                 today = datetime.now().date()
@@ -737,6 +1618,7 @@ class DatabaseManager:
                     'total_screenshots': total_screenshots,
                     'processed_screenshots': processed_screenshots,
                     'pending_tasks': pending_tasks,
+                    'reused_ocr_results': reused_ocr_results,
                     'today_screenshots': today_screenshots,
                     'processing_rate': processed_screenshots / max(total_screenshots, 1) * 100
                 }
@@ -770,6 +1652,9 @@ class DatabaseManager:
                     session.query(SearchIndex).filter_by(
                         screenshot_id=screenshot.id
                     ).delete()
+                    session.query(SearchPosting).filter_by(
+                        screenshot_id=screenshot.id
+                    ).delete()
                     
                     # 删除相关的处理队列
                     session.query(ProcessingQueue).filter_by(
@@ -787,7 +1672,15 @@ class DatabaseManager:
                     session.delete(screenshot)
                     deleted_count += 1
                 
-                logging.info(f"清理了 {deleted_count} 条旧数据")
+                # 应用使用记录和小时汇总按同样的保留期清理（录制器当前区间的行被删除时会新建一行）
+                usage_deleted = session.query(AppUsageLog).filter(
+                    AppUsageLog.timestamp < cutoff_date
+                ).delete(synchronize_session=False)
+                session.query(AppUsageHourly).filter(
+                    AppUsageHourly.hour_start < cutoff_date.replace(minute=0, second=0, microsecond=0)
+                ).delete(synchronize_session=False)
+                
+                logging.info(f"清理了 {deleted_count} 条旧数据，{usage_deleted} 条应用使用记录")
                 
         except SQLAlchemyError as e:
             logging.error(f"清理旧数据失败: {e}")
@@ -806,63 +1699,313 @@ class DatabaseManager:
                     timestamp=timestamp or datetime.now()
                 )
                 session.add(app_usage_log)
+                self._bump_usage_rollup(session, app_name, app_usage_log.timestamp,
+                                        duration_seconds, new_session=True)
                 session.commit()
                 return app_usage_log.id
         except SQLAlchemyError as e:
             logging.error(f"添加应用使用记录失败: {e}")
             return None
 
-    def get_app_usage_stats(self, days: int = 7) -> Dict[str, Any]:
-        """获取应用使用统计数据"""
+    @staticmethod
+    def _continues_usage_run(run: Optional[Dict[str, Any]], app_name: str, window_title: Optional[str],
+                             screen_id: int, timestamp: datetime, duration_seconds: int) -> bool:
+        """判断一条使用记录能否并入当前连续使用区间
+        
+        要求应用、窗口、屏幕相同，处于同一小时（保证按小时统计准确），
+        且与区间最后一次记录之间没有明显的间断。
+        """
+        if run is None:
+            return False
+        if (run['app_name'], run['window_title'], run['screen_id']) != (app_name, window_title, screen_id):
+            return False
+        if timestamp.replace(minute=0, second=0, microsecond=0) != run['hour_start']:
+            return False
+        gap = (timestamp - run['last_timestamp']).total_seconds()
+        return 0 <= gap <= max((duration_seconds or 0) * 3, 10)
+
+    def _apply_app_usage(self, session: Session, record: PendingAppUsage):
+        """在给定会话中写入一条应用使用记录（合并模式下可能只是延长时长）"""
+        if record.coalesce and self._continues_usage_run(
+                self._usage_run, record.app_name, record.window_title,
+                record.screen_id, record.timestamp, record.duration_seconds):
+            updated = session.query(AppUsageLog).filter(AppUsageLog.id == self._usage_run['id']).update(
+                {AppUsageLog.duration_seconds: AppUsageLog.duration_seconds + (record.duration_seconds or 0)},
+                synchronize_session=False
+            )
+            if updated:
+                # 汇总按记录起始时间归入小时，延长的时长计入同一小时，最后使用时间取本条记录的时间
+                self._bump_usage_rollup(session, record.app_name, self._usage_run['hour_start'],
+                                        record.duration_seconds, new_session=False,
+                                        used_at=record.timestamp)
+                self._usage_run['last_timestamp'] = record.timestamp
+                return
+            # 区间所在的行已被删除（例如其他进程压缩或清理了记录），改为新建一行
+            self._usage_run = None
+        
+        log = AppUsageLog(
+            app_name=record.app_name,
+            window_title=record.window_title,
+            duration_seconds=record.duration_seconds,
+            screen_id=record.screen_id,
+            timestamp=record.timestamp
+        )
+        session.add(log)
+        self._bump_usage_rollup(session, record.app_name, record.timestamp,
+                                record.duration_seconds, new_session=True)
+        if record.coalesce:
+            session.flush()
+            self._usage_run = {
+                'id': log.id,
+                'app_name': record.app_name,
+                'window_title': record.window_title,
+                'screen_id': record.screen_id,
+                'hour_start': record.timestamp.replace(minute=0, second=0, microsecond=0),
+                'last_timestamp': record.timestamp
+            }
+
+    def compact_app_usage_logs(self, page_size: int = 10000) -> Dict[str, int]:
+        """把逐秒写入的历史应用使用记录压缩为连续使用区间
+        
+        按时间顺序分页扫描，同一屏幕上连续的相同应用/窗口记录（同一小时内、
+        无明显间断）合并到区间的第一行，时长累加，其余行删除。
+        每页在一个事务中完成，区间首行的时长在每页结束时都会写回，
+        中途中断也不会丢失时长。
+        
+        只应在录制进程停止时运行（compact-app-usage 命令会提示）：本进程仍在合并写入使用记录时拒绝执行；
+        其他进程的录制器若发现其当前区间的行已被删除，会新建一行继续记录，不会丢失时长。
+        """
+        stats = {'rows_scanned': 0, 'runs': 0, 'rows_deleted': 0}
+        if self._usage_run is not None:
+            logging.warning("录制器正在本进程中合并写入应用使用记录，拒绝压缩；请停止录制后再运行")
+            stats['error'] = "录制器正在运行，请停止录制后再压缩"
+            return stats
+        runs: Dict[int, Dict[str, Any]] = {}
+        last_key = None
+        
+        try:
+            while True:
+                with self.get_session() as session:
+                    q = session.query(
+                        AppUsageLog.id, AppUsageLog.app_name, AppUsageLog.window_title,
+                        AppUsageLog.screen_id, AppUsageLog.timestamp, AppUsageLog.duration_seconds
+                    )
+                    if last_key is not None:
+                        q = q.filter(or_(
+                            AppUsageLog.timestamp > last_key[0],
+                            and_(AppUsageLog.timestamp == last_key[0], AppUsageLog.id > last_key[1])
+                        ))
+                    rows = q.order_by(AppUsageLog.timestamp.asc(), AppUsageLog.id.asc()).limit(page_size).all()
+                    if not rows:
+                        break
+                    
+                    to_delete = []
+                    dirty = set()
+                    for row_id, app_name, window_title, screen_id, ts, duration in rows:
+                        screen_id = screen_id or 0
+                        run = runs.get(screen_id)
+                        if self._continues_usage_run(run, app_name, window_title, screen_id, ts, duration):
+                            run['duration'] += duration or 0
+                            run['last_timestamp'] = ts
+                            to_delete.append(row_id)
+                            dirty.add(screen_id)
+                        else:
+                            if run is not None and screen_id in dirty:
+                                self._write_run_duration(session, run)
+                                dirty.discard(screen_id)
+                            runs[screen_id] = {
+                                'id': row_id,
+                                'app_name': app_name,
+                                'window_title': window_title,
+                                'screen_id': screen_id,
+                                'hour_start': ts.replace(minute=0, second=0, microsecond=0),
+                                'last_timestamp': ts,
+                                'duration': duration or 0
+                            }
+                            stats['runs'] += 1
+                    
+                    # 本页内仍在延续的区间也先写回时长
+                    for screen_id in dirty:
+                        self._write_run_duration(session, runs[screen_id])
+                    
+                    for i in range(0, len(to_delete), 500):
+                        session.query(AppUsageLog).filter(
+                            AppUsageLog.id.in_(to_delete[i:i + 500])
+                        ).delete(synchronize_session=False)
+                    
+                    stats['rows_scanned'] += len(rows)
+                    stats['rows_deleted'] += len(to_delete)
+                    last_key = (rows[-1][4], rows[-1][0])
+                
+                logging.info(f"应用使用记录压缩进度: 已扫描 {stats['rows_scanned']} 行，删除 {stats['rows_deleted']} 行")
+            
+            # 压缩后的行号与内存中的区间状态不再对应，汇总中的记录数也需要重算
+            self._usage_run = None
+            self.rebuild_app_usage_rollup()
+            logging.info(f"应用使用记录压缩完成: {stats}")
+            return stats
+        except SQLAlchemyError as e:
+            logging.error(f"压缩应用使用记录失败: {e}")
+            stats['error'] = str(e)
+            return stats
+
+    @staticmethod
+    def _write_run_duration(session: Session, run: Dict[str, Any]):
+        session.query(AppUsageLog).filter(AppUsageLog.id == run['id']).update(
+            {AppUsageLog.duration_seconds: run['duration']}, synchronize_session=False
+        )
+
+    def _bump_usage_rollup(self, session: Session, app_name: str, timestamp: datetime,
+                           seconds: int, new_session: bool, used_at: Optional[datetime] = None):
+        """增量更新应用使用小时汇总
+        
+        Args:
+            timestamp: 用于确定所属小时的时间
+            new_session: 是否为新插入的使用记录（计入记录数）
+            used_at: 本次使用的时间（更新最后使用时间），默认为 timestamp
+        """
+        hour_start = timestamp.replace(minute=0, second=0, microsecond=0)
+        used_at = used_at or timestamp
+        seconds = seconds or 0
+        values = {
+            'app_name': app_name,
+            'hour_start': hour_start,
+            'total_seconds': seconds,
+            'session_count': 1 if new_session else 0,
+            'last_used': used_at
+        }
+        
+        if self._is_sqlite():
+            stmt = sqlite_insert(AppUsageHourly).values(**values)
+            update_set = {
+                'total_seconds': AppUsageHourly.total_seconds + stmt.excluded.total_seconds,
+                'last_used': func.max(func.coalesce(AppUsageHourly.last_used, stmt.excluded.last_used),
+                                      stmt.excluded.last_used)
+            }
+            if new_session:
+                update_set['session_count'] = AppUsageHourly.session_count + 1
+            session.execute(stmt.on_conflict_do_update(
+                index_elements=['app_name', 'hour_start'], set_=update_set
+            ))
+            return
+        
+        row = session.query(AppUsageHourly).filter_by(app_name=app_name, hour_start=hour_start).first()
+        if row is None:
+            session.add(AppUsageHourly(**values))
+            return
+        row.total_seconds = (row.total_seconds or 0) + seconds
+        if new_session:
+            row.session_count = (row.session_count or 0) + 1
+        if row.last_used is None or used_at > row.last_used:
+            row.last_used = used_at
+
+    def rebuild_app_usage_rollup(self) -> int:
+        """从应用使用记录重建小时汇总表，返回汇总行数"""
+        try:
+            with self.get_session() as session:
+                session.query(AppUsageHourly).delete(synchronize_session=False)
+                if self._is_sqlite():
+                    # 在SQL中按小时分组，格式与SQLAlchemy在SQLite中的DateTime存储格式一致
+                    hour_expr = func.strftime('%Y-%m-%d %H:00:00.000000', AppUsageLog.timestamp)
+                    grouped = session.query(
+                        AppUsageLog.app_name,
+                        hour_expr,
+                        func.coalesce(func.sum(AppUsageLog.duration_seconds), 0),
+                        func.count(AppUsageLog.id),
+                        func.max(AppUsageLog.timestamp)
+                    ).group_by(AppUsageLog.app_name, hour_expr)
+                    result = session.execute(
+                        AppUsageHourly.__table__.insert().from_select(
+                            ['app_name', 'hour_start', 'total_seconds', 'session_count', 'last_used'], grouped
+                        )
+                    )
+                    count = result.rowcount
+                else:
+                    count = self._rebuild_app_usage_rollup_in_python(session)
+            logging.info(f"应用使用小时汇总已重建: {count} 行")
+            return count
+        except SQLAlchemyError as e:
+            logging.error(f"重建应用使用小时汇总失败: {e}")
+            return 0
+
+    def _rebuild_app_usage_rollup_in_python(self, session: Session) -> int:
+        """非SQLite数据库没有统一的按小时截断函数，逐条读取记录在Python中分组"""
+        buckets = {}
+        rows = session.query(AppUsageLog.app_name, AppUsageLog.timestamp, AppUsageLog.duration_seconds)
+        for app_name, timestamp, duration in rows.yield_per(10000):
+            key = (app_name, timestamp.replace(minute=0, second=0, microsecond=0))
+            bucket = buckets.setdefault(key, {'total_seconds': 0, 'session_count': 0, 'last_used': timestamp})
+            bucket['total_seconds'] += duration or 0
+            bucket['session_count'] += 1
+            bucket['last_used'] = max(bucket['last_used'], timestamp)
+        session.bulk_insert_mappings(AppUsageHourly, [
+            dict(app_name=app_name, hour_start=hour_start, **bucket)
+            for (app_name, hour_start), bucket in buckets.items()
+        ])
+        return len(buckets)
+
+    def _backfill_app_usage_rollup(self):
+        """汇总表为空而已有应用使用记录时（升级后首次启动）回填汇总"""
         try:
             with self.get_session() as session:
+                has_rollup = session.query(AppUsageHourly.id).first() is not None
+                has_logs = session.query(AppUsageLog.id).first() is not None
+            if not has_rollup and has_logs:
+                logging.info("正在从已有应用使用记录回填小时汇总...")
+                self.rebuild_app_usage_rollup()
+        except Exception as e:
+            logging.warning(f"回填应用使用小时汇总失败: {e}")
+
+    def get_app_usage_stats(self, days: int = 7) -> Dict[str, Any]:
+        """获取应用使用统计数据
+        
+        基于按应用×小时预聚合的汇总表在SQL中分组统计，耗时与原始记录数量无关。
+        时间范围按小时对齐。
+        
+        session_count 是时间范围内应用使用记录的行数：开启 storage.app_usage.coalesce 时
+        每行是一段连续使用（应用/窗口不变的区间），关闭时与以前一样每次采样一行。
+        """
+        try:
+            with self.get_read_session() as session:
                 # 计算时间范围
                 end_date = datetime.now()
-                start_date = end_date - timedelta(days=days)
-                
-                # 查询指定时间范围内的应用使用记录
-                logs = session.query(AppUsageLog).filter(
-                    AppUsageLog.timestamp >= start_date,
-                    AppUsageLog.timestamp <= end_date
-                ).all()
+                start_date = (end_date - timedelta(days=days)).replace(minute=0, second=0, microsecond=0)
+                in_range = (AppUsageHourly.hour_start >= start_date, AppUsageHourly.hour_start <= end_date)
                 
-                # 按应用名称聚合数据
+                # 应用使用汇总
                 app_usage_summary = {}
+                summary_rows = session.query(
+                    AppUsageHourly.app_name,
+                    func.sum(AppUsageHourly.total_seconds),
+                    func.sum(AppUsageHourly.session_count),
+                    func.max(AppUsageHourly.last_used)
+                ).filter(*in_range).group_by(AppUsageHourly.app_name).all()
+                for app_name, total_time, session_count, last_used in summary_rows:
+                    app_usage_summary[app_name] = {
+                        'app_name': app_name,
+                        'total_time': int(total_time or 0),
+                        'session_count': int(session_count or 0),
+                        'last_used': last_used
+                    }
+                
+                # 每日使用统计
                 daily_usage = {}
-                hourly_usage = {}
+                if self._is_sqlite():
+                    day_expr = func.date(AppUsageHourly.hour_start)
+                else:
+                    day_expr = cast(AppUsageHourly.hour_start, Date)
+                for day, app_name, seconds in session.query(
+                    day_expr, AppUsageHourly.app_name, func.sum(AppUsageHourly.total_seconds)
+                ).filter(*in_range).group_by(day_expr, AppUsageHourly.app_name):
+                    daily_usage.setdefault(str(day), {})[app_name] = int(seconds or 0)
                 
-                for log in logs:
-                    app_name = log.app_name
-                    date_str = log.timestamp.strftime('%Y-%m-%d')
-                    hour = log.timestamp.hour
-                    
-                    # 应用使用汇总
-                    if app_name not in app_usage_summary:
-                        app_usage_summary[app_name] = {
-                            'app_name': app_name,
-                            'total_time': 0,
-                            'session_count': 0,
-                            'last_used': log.timestamp
-                        }
-                    
-                    app_usage_summary[app_name]['total_time'] += log.duration_seconds
-                    app_usage_summary[app_name]['session_count'] += 1
-                    if log.timestamp > app_usage_summary[app_name]['last_used']:
-                        app_usage_summary[app_name]['last_used'] = log.timestamp
-                    
-                    # 每日使用统计
-                    if date_str not in daily_usage:
-                        daily_usage[date_str] = {}
-                    if app_name not in daily_usage[date_str]:
-                        daily_usage[date_str][app_name] = 0
-                    daily_usage[date_str][app_name] += log.duration_seconds
-                    
-                    # 小时使用统计
-                    if hour not in hourly_usage:
-                        hourly_usage[hour] = {}
-                    if app_name not in hourly_usage[hour]:
-                        hourly_usage[hour][app_name] = 0
-                    hourly_usage[hour][app_name] += log.duration_seconds
+                # 小时使用统计
+                hourly_usage = {}
+                hour_expr = cast(extract('hour', AppUsageHourly.hour_start), Integer)
+                for hour, app_name, seconds in session.query(
+                    hour_expr, AppUsageHourly.app_name, func.sum(AppUsageHourly.total_seconds)
+                ).filter(*in_range).group_by(hour_expr, AppUsageHourly.app_name):
+                    hourly_usage.setdefault(hour, {})[app_name] = int(seconds or 0)
                 
                 return {
                     'app_usage_summary': app_usage_summary,
@@ -0,0 +1,99 @@
+"""OCR文本分词模块
+
+为关键词倒排索引（search_postings）生成检索词：
+- 拉丁字母/数字按连续片段切分并转为小写
+- 中文按相邻两字切分为二元词（单独出现的一个汉字保留单字）
+
+查询时只使用“关键词是原文的子串”时必然出现在原文检索词中的那部分检索词（见 query_terms），
+对它们的倒排列表求交集即可得到候选截图，不会漏掉子串匹配能找到的结果。
+安装了 jieba 时，额外用它提取每段文本的主题关键词，写入 SearchIndex.keywords。
+"""
+
+import logging
+import re
+from typing import List, Set
+
+try:
+    import jieba
+    import jieba.analyse
+    JIEBA_AVAILABLE = True
+except ImportError:
+    JIEBA_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# 连续的拉丁字母/数字，或连续的中日韩统一表意文字
+_TOKEN_PATTERN = re.compile(r'[a-zA-Z0-9]+|[\u4e00-\u9fff]+')
+# 检索词最大长度（与 search_postings.term 列宽一致）
+MAX_TERM_LENGTH = 64
+
+
+def _is_cjk(segment: str) -> bool:
+    return '\u4e00' <= segment[0] <= '\u9fff'
+
+
+def extract_terms(text: str) -> Set[str]:
+    """提取文本的检索词集合"""
+    terms: Set[str] = set()
+    if not text:
+        return terms
+
+    for segment in _TOKEN_PATTERN.findall(text):
+        if _is_cjk(segment):
+            if len(segment) == 1:
+                terms.add(segment)
+            else:
+                terms.update(segment[i:i + 2] for i in range(len(segment) - 1))
+        else:
+            terms.add(segment.lower()[:MAX_TERM_LENGTH])
+    return terms
+
+
+def query_terms(keyword: str) -> List[str]:
+    """提取一个查询关键词中可用于倒排索引的检索词（命中截图需包含全部检索词）
+
+    关键词按子串匹配，位于关键词开头或结尾的片段在原文中可能只是更长片段的一部分：
+    - 拉丁字母/数字片段：原文只索引完整的词，"log" 可能是 "logging" 的一部分，不能使用；
+    - 单个汉字：原文的多字片段只索引二元词，"中" 可能出现在 "中文" 中，不能使用；
+    - 两字及以上的中文片段：其二元词都是原文片段的二元词，总能使用。
+    两侧都被其他字符（空格、标点、另一类文字）隔开的片段在原文中也是完整片段，可以使用。
+    返回空列表时调用方应退回到不经过倒排索引的子串匹配。
+    """
+    terms: Set[str] = set()
+    if not keyword:
+        return []
+
+    for match in _TOKEN_PATTERN.finditer(keyword):
+        segment = match.group()
+        bounded = match.start() > 0 and match.end() < len(keyword)
+        if _is_cjk(segment):
+            if len(segment) > 1:
+                terms.update(segment[i:i + 2] for i in range(len(segment) - 1))
+            elif bounded:
+                terms.add(segment)
+        elif bounded:
+            terms.add(segment.lower()[:MAX_TERM_LENGTH])
+    return sorted(terms)
+
+
+def extract_keywords(text: str, top_k: int = 20) -> List[str]:
+    """提取文本的主题关键词，用于展示和调试
+
+    安装了 jieba 时使用TF-IDF关键词提取，否则返回出现次数最多的检索词。
+    """
+    if not text:
+        return []
+    if JIEBA_AVAILABLE:
+        try:
+            return jieba.analyse.extract_tags(text, topK=top_k)
+        except Exception as e:
+            logger.debug(f"jieba关键词提取失败: {e}")
+
+    counts = {}
+    for segment in _TOKEN_PATTERN.findall(text):
+        if not _is_cjk(segment) and len(segment) > 1:
+            key = segment.lower()
+            counts[key] = counts.get(key, 0) + 1
+        elif _is_cjk(segment) and len(segment) > 1:
+            counts[segment] = counts.get(segment, 0) + 1
+    return [term for term, _ in sorted(counts.items(), key=lambda item: -item[1])[:top_k]]
@@ -7,6 +7,8 @@
 import os
 import sys
 import logging
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 import json
@@ -32,6 +34,9 @@ except ImportError as e:
     np = None
 
 from lifetrace_backend.config import config
+from lifetrace_backend.model_registry import model_registry
+from lifetrace_backend.embedding_cache import EmbeddingCache, get_embedding_cache
+from lifetrace_backend.embedding_batcher import EmbeddingBatcher, LRUCache
 
 
 class VectorDatabase:
@@ -56,6 +61,10 @@ class VectorDatabase:
         
         # 初始化模型和数据库
         self.embedding_model = None
+        self.embedding_cache = None
+        self.query_cache = LRUCache(config.get('vector_db.query_embedding.cache_size', 256))
+        self._query_batcher = None
+        self._query_batcher_lock = threading.Lock()
         self.cross_encoder = None
         self.chroma_client = None
         self.collection = None
@@ -86,8 +95,12 @@ class VectorDatabase:
             
             # 初始化嵌入模型
             if self.embedding_model_name:
-                self.logger.info(f"Loading embedding model: {self.embedding_model_name}")
-                self.embedding_model = SentenceTransformer(self.embedding_model_name)
+                # 同一进程内的多个实例共享已加载的模型
+                self.embedding_model = model_registry.get_or_load(
+                    'sentence_transformer', self.embedding_model_name,
+                    lambda: SentenceTransformer(self.embedding_model_name)
+                )
+                self.embedding_cache = self._create_embedding_cache()
             else:
                 self.logger.info("Skipping embedding model initialization (multimodal mode)")
                 self.embedding_model = None
@@ -114,16 +127,84 @@ class VectorDatabase:
             self.logger.error(f"Failed to initialize vector database: {e}")
             raise
     
+    def _create_embedding_cache(self) -> Optional[EmbeddingCache]:
+        """获取嵌入向量磁盘缓存（放在持久化目录下，重置集合时保留；同一路径在进程内共享）"""
+        if not self.config.get('vector_db.embedding_cache.enabled', True):
+            return None
+        try:
+            return get_embedding_cache(
+                directory=str(self.vector_db_path / 'embedding_cache'),
+                model_name=self.embedding_model_name,
+                dim=self.embedding_model.get_sentence_embedding_dimension(),
+                max_size_mb=self.config.get('vector_db.embedding_cache.max_size_mb', 1024)
+            )
+        except Exception as e:
+            self.logger.warning(f"Embedding cache unavailable: {e}")
+            return None
+    
     def _get_cross_encoder(self) -> CrossEncoder:
         """延迟加载交叉编码器"""
         if self.cross_encoder is None:
-            self.logger.info(f"Loading cross-encoder model: {self.cross_encoder_model_name}")
-            self.cross_encoder = CrossEncoder(self.cross_encoder_model_name)
+            self.cross_encoder = model_registry.get_or_load(
+                'cross_encoder', self.cross_encoder_model_name,
+                lambda: CrossEncoder(self.cross_encoder_model_name)
+            )
         return self.cross_encoder
     
+    def _encode_queries(self, texts: List[str]) -> List[List[float]]:
+        """查询批处理线程调用的编码函数"""
+        return self.embedding_model.encode(
+            texts,
+            batch_size=len(texts),
+            normalize_embeddings=True,
+            show_progress_bar=False
+        ).tolist()
+    
+    def _get_query_batcher(self) -> EmbeddingBatcher:
+        """延迟创建查询批处理器"""
+        if self._query_batcher is None:
+            with self._query_batcher_lock:
+                if self._query_batcher is None:
+                    self._query_batcher = EmbeddingBatcher(
+                        self._encode_queries,
+                        max_batch_size=self.config.get('vector_db.query_embedding.max_batch_size', 32),
+                        max_wait_ms=self.config.get('vector_db.query_embedding.batch_wait_ms', 5)
+                    )
+        return self._query_batcher
+    
+    def embed_text_async(self, text: str) -> Future:
+        """异步将文本转换为向量嵌入
+        
+        命中查询缓存时返回已完成的 Future；否则交给批处理器，
+        与几毫秒内的其他并发请求合并为一次模型调用。
+        
+        Args:
+            text: 输入文本（非空）
+            
+        Returns:
+            结果为向量嵌入的 Future
+        """
+        if not self.embedding_model:
+            raise RuntimeError("Embedding model not available (multimodal mode)")
+        
+        text = text.strip()
+        cached = self.query_cache.get(text)
+        if cached is not None:
+            future = Future()
+            future.set_result(cached)
+            return future
+        
+        future = self._get_query_batcher().submit(text)
+        future.add_done_callback(
+            lambda done: self.query_cache.put(text, done.result()) if done.exception() is None else None
+        )
+        return future
+    
     def embed_text(self, text: str) -> List[float]:
         """将文本转换为向量嵌入
         
+        用于查询文本：最近的查询结果缓存在LRU中，并发请求会合并批量编码。
+        
         Args:
             text: 输入文本
             
@@ -136,16 +217,108 @@ class VectorDatabase:
         if not self.embedding_model:
             raise RuntimeError("Embedding model not available (multimodal mode)")
         
+        timeout = self.config.get('vector_db.query_embedding.timeout_seconds', 30)
         try:
-            embedding = self.embedding_model.encode(
-                text.strip(), 
-                normalize_embeddings=True
-            )
-            return embedding.tolist()
+            return list(self.embed_text_async(text).result(timeout=timeout))
+        except FutureTimeoutError:
+            self.logger.error(f"Embedding query timed out after {timeout}s")
+            return []
         except Exception as e:
             self.logger.error(f"Failed to embed text: {e}")
             return []
     
+    def embed_texts(self, texts: List[str], batch_size: Optional[int] = None) -> List[List[float]]:
+        """批量将文本转换为向量嵌入
+        
+        Args:
+            texts: 输入文本列表（调用方需先过滤空文本）
+            batch_size: 模型每次前向计算的文本数，None 表示使用 vector_db.batch_size
+            
+        Returns:
+            与输入顺序一致的向量嵌入列表，失败时返回空列表
+        """
+        if not texts:
+            return []
+        
+        if not self.embedding_model:
+            raise RuntimeError("Embedding model not available (multimodal mode)")
+        
+        try:
+            texts = [text.strip() for text in texts]
+            # 先查磁盘缓存，只对未命中的文本运行模型
+            if self.embedding_cache is not None:
+                embeddings = self.embedding_cache.get_many(texts)
+            else:
+                embeddings = [None] * len(texts)
+            # 同一批次中重复的文本只编码一次
+            missing: Dict[str, List[int]] = {}
+            for i, embedding in enumerate(embeddings):
+                if embedding is None:
+                    missing.setdefault(texts[i], []).append(i)
+            
+            if missing:
+                missing_texts = list(missing)
+                encoded = self.embedding_model.encode(
+                    missing_texts,
+                    batch_size=batch_size or self.config.vector_db_batch_size,
+                    normalize_embeddings=True,
+                    show_progress_bar=False
+                ).tolist()
+                for text, embedding in zip(missing_texts, encoded):
+                    for i in missing[text]:
+                        embeddings[i] = embedding
+                if self.embedding_cache is not None:
+                    self.embedding_cache.put_many(missing_texts, encoded)
+            return embeddings
+        except Exception as e:
+            self.logger.error(f"Failed to embed {len(texts)} texts: {e}")
+            return []
+    
+    def upsert_documents(self,
+                        doc_ids: List[str],
+                        texts: List[str],
+                        embeddings: List[List[float]],
+                        metadatas: Optional[List[Dict[str, Any]]] = None) -> int:
+        """使用预计算的嵌入向量批量写入文档（已存在的文档会被覆盖）
+        
+        Args:
+            doc_ids: 文档唯一标识符列表
+            texts: 文档文本内容列表
+            embeddings: 预计算的嵌入向量列表
+            metadatas: 文档元数据列表
+            
+        Returns:
+            写入的文档数，失败时返回 0
+        """
+        if not doc_ids:
+            return 0
+        
+        timestamp = datetime.now().isoformat()
+        doc_metadatas = []
+        for i, text in enumerate(texts):
+            doc_metadata = {
+                "timestamp": timestamp,
+                "text_length": len(text),
+                "text_hash": hashlib.md5(text.encode()).hexdigest()
+            }
+            if metadatas and metadatas[i]:
+                doc_metadata.update(metadatas[i])
+            # ChromaDB 元数据不接受 None，整批写入时一个 None 会导致整批失败
+            doc_metadatas.append({key: value for key, value in doc_metadata.items() if value is not None})
+        
+        try:
+            self.collection.upsert(
+                documents=texts,
+                embeddings=embeddings,
+                metadatas=doc_metadatas,
+                ids=doc_ids
+            )
+            self.logger.debug(f"Upserted {len(doc_ids)} documents to vector database")
+            return len(doc_ids)
+        except Exception as e:
+            self.logger.error(f"Failed to upsert {len(doc_ids)} documents: {e}")
+            return 0
+    
     def add_document(self, 
                     doc_id: str, 
                     text: str, 
@@ -165,10 +338,11 @@ class VectorDatabase:
             return False
         
         try:
-            # 生成嵌入
-            embedding = self.embed_text(text)
-            if not embedding:
+            # 生成嵌入（相同文本直接使用缓存的向量）
+            embeddings = self.embed_texts([text])
+            if not embeddings:
                 return False
+            embedding = embeddings[0]
             
             # 准备元数据
             doc_metadata = {
@@ -283,6 +457,56 @@ class VectorDatabase:
             self.logger.error(f"Failed to delete document {doc_id}: {e}")
             return False
     
+    def delete_documents(self, doc_ids: List[str], chunk_size: int = 5000) -> int:
+        """批量删除文档
+        
+        Args:
+            doc_ids: 文档唯一标识符列表
+            chunk_size: 每次删除的文档数
+            
+        Returns:
+            删除的文档数
+        """
+        deleted = 0
+        for start in range(0, len(doc_ids), chunk_size):
+            chunk = doc_ids[start:start + chunk_size]
+            try:
+                self.collection.delete(ids=chunk)
+                deleted += len(chunk)
+            except Exception as e:
+                self.logger.error(f"Failed to delete {len(chunk)} documents: {e}")
+        return deleted
+    
+    def get_document_ids(self, prefix: Optional[str] = None, page_size: int = 5000) -> List[str]:
+        """分页列出集合中的文档ID（不读取向量和文本）
+        
+        Args:
+            prefix: 只返回以该前缀开头的ID，例如 "ocr_"
+            page_size: 每次读取的文档数
+            
+        Returns:
+            文档ID列表
+        """
+        doc_ids = []
+        offset = 0
+        while True:
+            page = self.collection.get(include=[], limit=page_size, offset=offset)['ids']
+            doc_ids.extend(doc_id for doc_id in page if prefix is None or doc_id.startswith(prefix))
+            if len(page) < page_size:
+                break
+            offset += page_size
+        return doc_ids
+    
+    def get_existing_ids(self, doc_ids: List[str]) -> set:
+        """返回给定ID中已存在于集合的部分"""
+        if not doc_ids:
+            return set()
+        try:
+            return set(self.collection.get(ids=doc_ids, include=[])['ids'])
+        except Exception as e:
+            self.logger.error(f"Failed to look up {len(doc_ids)} document ids: {e}")
+            return set()
+    
     def search(self, 
               query: str, 
               top_k: int = 10, 
@@ -454,7 +678,10 @@ class VectorDatabase:
                 "document_count": count,
                 "embedding_model": self.embedding_model_name,
                 "cross_encoder_model": self.cross_encoder_model_name,
-                "vector_db_path": str(self.vector_db_path)
+                "vector_db_path": str(self.vector_db_path),
+                "embedding_cache": self.embedding_cache.get_stats() if self.embedding_cache else None,
+                "query_cache": self.query_cache.get_stats(),
+                "query_batcher": self._query_batcher.get_stats() if self._query_batcher else None
             }
         except Exception as e:
             self.logger.error(f"Failed to get collection stats: {e}")
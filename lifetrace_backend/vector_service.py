@@ -4,9 +4,12 @@
 与现有的 SQLite 数据库并行工作。
 """
 
+import json
 import logging
+import os
 import sys
-from typing import List, Dict, Any, Optional
+import time
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 import hashlib
 from pathlib import Path
@@ -16,7 +19,10 @@ if __name__ == '__main__':
     project_root = Path(__file__).parent.parent
     sys.path.insert(0, str(project_root))
 
+from sqlalchemy import and_, func
+
 from lifetrace_backend.vector_db import VectorDatabase, create_vector_db
+from lifetrace_backend.model_registry import model_registry
 from lifetrace_backend.storage import DatabaseManager
 from lifetrace_backend.models import OCRResult, Screenshot
 from lifetrace_backend.config import config
@@ -47,11 +53,39 @@ class VectorService:
         else:
             self.enabled = True
             self.logger.info("Vector service initialized successfully")
+        
+        # 最近一次 sync_from_database 的结果
+        self.last_sync_stats: Dict[str, Any] = {}
     
     def is_enabled(self) -> bool:
         """检查向量服务是否可用"""
         return self.enabled and self.vector_db is not None
     
+    def _build_ocr_metadata(self, ocr_result: OCRResult, screenshot: Optional[Screenshot] = None) -> Dict[str, Any]:
+        """构建 OCR 结果文档的元数据"""
+        metadata = {
+            "ocr_result_id": ocr_result.id,
+            "screenshot_id": ocr_result.screenshot_id,
+            "confidence": ocr_result.confidence,
+            "language": ocr_result.language or "unknown",
+            "processing_time": ocr_result.processing_time,
+            "created_at": ocr_result.created_at.isoformat() if ocr_result.created_at else None,
+            "text_length": len(ocr_result.text_content or "")
+        }
+        
+        # 添加截图与事件相关信息
+        if screenshot:
+            metadata.update({
+                "screenshot_path": screenshot.file_path,
+                "screenshot_timestamp": screenshot.created_at.isoformat() if screenshot.created_at else None,
+                "application": screenshot.app_name,
+                "window_title": screenshot.window_title,
+                "width": screenshot.width,
+                "height": screenshot.height,
+                "event_id": getattr(screenshot, 'event_id', None)
+            })
+        return metadata
+    
     def add_ocr_result(self, ocr_result: OCRResult, screenshot: Optional[Screenshot] = None) -> bool:
         """添加 OCR 结果到向量数据库
         
@@ -72,29 +106,7 @@ class VectorService:
         try:
             # 构建文档 ID
             doc_id = f"ocr_{ocr_result.id}"
-            
-            # 构建元数据
-            metadata = {
-                "ocr_result_id": ocr_result.id,
-                "screenshot_id": ocr_result.screenshot_id,
-                "confidence": ocr_result.confidence,
-                "language": ocr_result.language or "unknown",
-                "processing_time": ocr_result.processing_time,
-                "created_at": ocr_result.created_at.isoformat() if ocr_result.created_at else None,
-                "text_length": len(ocr_result.text_content)
-            }
-            
-            # 添加截图与事件相关信息
-            if screenshot:
-                metadata.update({
-                    "screenshot_path": screenshot.file_path,
-                    "screenshot_timestamp": screenshot.created_at.isoformat() if screenshot.created_at else None,
-                    "application": screenshot.app_name,
-                    "window_title": screenshot.window_title,
-                    "width": screenshot.width,
-                    "height": screenshot.height,
-                    "event_id": getattr(screenshot, 'event_id', None)
-                })
+            metadata = self._build_ocr_metadata(ocr_result, screenshot)
             
             # 添加到向量数据库
             success = self.vector_db.add_document(
@@ -114,6 +126,42 @@ class VectorService:
             self.logger.error(f"Error adding OCR result {ocr_result.id} to vector database: {e}")
             return False
     
+    def add_ocr_results_batch(self, rows: List[Tuple[OCRResult, Screenshot]]) -> int:
+        """批量添加 OCR 结果到向量数据库
+        
+        一次批量编码全部文本，再一次写入 ChromaDB（已存在的文档会被覆盖）。
+        
+        Args:
+            rows: (OCR 结果对象, 关联的截图对象) 列表
+            
+        Returns:
+            写入的文档数
+        """
+        if not self.is_enabled():
+            return 0
+        
+        rows = [(ocr_result, screenshot) for ocr_result, screenshot in rows
+                if ocr_result.text_content and ocr_result.text_content.strip()]
+        if not rows:
+            return 0
+        
+        try:
+            texts = [ocr_result.text_content for ocr_result, _ in rows]
+            embeddings = self.vector_db.embed_texts(texts)
+            if len(embeddings) != len(texts):
+                self.logger.warning(f"Failed to embed batch of {len(texts)} OCR results")
+                return 0
+            
+            return self.vector_db.upsert_documents(
+                doc_ids=[f"ocr_{ocr_result.id}" for ocr_result, _ in rows],
+                texts=texts,
+                embeddings=embeddings,
+                metadatas=[self._build_ocr_metadata(ocr_result, screenshot) for ocr_result, screenshot in rows]
+            )
+        except Exception as e:
+            self.logger.error(f"Error adding batch of {len(rows)} OCR results to vector database: {e}")
+            return 0
+    
     def update_ocr_result(self, ocr_result: OCRResult, screenshot: Optional[Screenshot] = None) -> bool:
         """更新向量数据库中的 OCR 结果
         
@@ -350,35 +398,24 @@ class VectorService:
                             'distance': result.get('distance', 1.0)
                         }
             
-            # 获取事件详细信息
+            # 获取事件详细信息（一次查询取回全部事件及截图统计）
+            summaries = self.db_manager.get_event_summaries([int(event_id) for event_id in event_scores])
             event_results = []
             for event_id, score_info in event_scores.items():
-                try:
-                    with self.db_manager.get_session() as session:
-                        from lifetrace_backend.models import Event, Screenshot
-                        event = session.query(Event).filter(Event.id == event_id).first()
-                        
-                        if event:
-                            # 获取该事件的截图数量
-                            screenshot_count = session.query(Screenshot).filter(Screenshot.event_id == event_id).count()
-                            first_screenshot = session.query(Screenshot).filter(Screenshot.event_id == event_id).order_by(Screenshot.created_at.asc()).first()
-                            
-                            event_data = {
-                                "id": event.id,
-                                "app_name": event.app_name,
-                                "window_title": event.window_title,
-                                "start_time": event.start_time.isoformat() if event.start_time else None,
-                                "end_time": event.end_time.isoformat() if event.end_time else None,
-                                "screenshot_count": screenshot_count,
-                                "first_screenshot_id": first_screenshot.id if first_screenshot else None,
-                                "semantic_score": score_info['score'],
-                                "distance": score_info['distance']
-                            }
-                            event_results.append(event_data)
-                            
-                except Exception as db_error:
-                    self.logger.warning(f"获取事件{event_id}详细信息失败: {db_error}")
+                summary = summaries.get(int(event_id))
+                if not summary:
                     continue
+                event_results.append({
+                    "id": summary['id'],
+                    "app_name": summary['app_name'],
+                    "window_title": summary['window_title'],
+                    "start_time": summary['start_time'].isoformat() if summary['start_time'] else None,
+                    "end_time": summary['end_time'].isoformat() if summary['end_time'] else None,
+                    "screenshot_count": summary['screenshot_count'],
+                    "first_screenshot_id": summary['first_screenshot_id'],
+                    "semantic_score": score_info['score'],
+                    "distance": score_info['distance']
+                })
             
             # 按语义相似度排序
             event_results.sort(key=lambda x: x.get('semantic_score', 0.0), reverse=True)
@@ -390,75 +427,275 @@ class VectorService:
             return []
     
     def sync_from_database(self, limit: Optional[int] = None, force_reset: bool = False) -> int:
-        """从 SQLite 数据库同步 OCR 结果到向量数据库
+        """从 SQLite 数据库增量同步 OCR 结果到向量数据库
+        
+        记录已索引的最大 ocr_results.id（高水位），每次只索引高水位之后的新结果。
+        高水位只推进到实际写入成功的位置：某一批编码或写入失败时本次同步停在该批之前，下次同步重试。
+        只有在没有同步状态、或高水位以内的 OCR 结果数量与向量数据库中的文档数不一致（例如记录被清理）时，
+        才比较两边的 ID 集合，删除多余的文档并补齐缺失的文档。
+        事件文档（event_{id}）不参与比较，不会再因为文档数量不一致而重建整个集合。
         
         Args:
-            limit: 同步的最大记录数，None 表示同步全部
-            force_reset: 是否先重置向量数据库
+            limit: 本次索引的最大记录数，None 表示同步全部
+            force_reset: 是否先重置向量数据库并全部重新索引
             
         Returns:
-            同步的记录数
+            本次写入的文档数
         """
         if not self.is_enabled():
             return 0
         
         try:
-            with self.db_manager.get_session() as session:
-                # 检查SQLite数据库中的OCR结果数量
-                total_ocr_count = session.query(OCRResult).count()
-                self.logger.info(f"SQLite database has {total_ocr_count} OCR results")
-                
-                # 获取向量数据库中的文档数量
-                vector_stats = self.vector_db.get_collection_stats()
-                vector_doc_count = vector_stats.get('document_count', 0)
-                self.logger.info(f"Vector database has {vector_doc_count} documents")
-                
-                # 如果SQLite为空但向量数据库不为空，或者强制重置，则清空向量数据库
-                if (total_ocr_count == 0 and vector_doc_count > 0) or force_reset:
-                    self.logger.info("Resetting vector database to match empty SQLite database")
-                    self.reset()
-                    if total_ocr_count == 0:
-                        return 0  # SQLite为空，同步完成
-                
-                # 如果两个数据库都为空，无需同步
-                if total_ocr_count == 0 and vector_doc_count == 0:
-                    self.logger.info("Both databases are empty, no sync needed")
-                    return 0
-                
-                synced_count = 0
-                
-                # 查询所有 OCR 结果
-                query = session.query(OCRResult).join(Screenshot, OCRResult.screenshot_id == Screenshot.id)
-                if limit:
-                    query = query.limit(limit)
-                
-                ocr_results = query.all()
-                
-                # 如果需要完全同步，先重置向量数据库
-                if not limit and len(ocr_results) != vector_doc_count:
-                    self.logger.info(f"Document count mismatch (SQLite: {len(ocr_results)}, Vector: {vector_doc_count}), resetting vector database")
-                    self.reset()
-                
-                for ocr_result in ocr_results:
-                    # 通过 screenshot_id 获取对应的 Screenshot 对象
-                    screenshot = session.query(Screenshot).filter(Screenshot.id == ocr_result.screenshot_id).first()
-                    if screenshot is None:
-                        self.logger.warning(f"Screenshot not found for OCR result {ocr_result.id}")
-                        continue
-                    
-                    if self.add_ocr_result(ocr_result, screenshot):
-                        synced_count += 1
-                    
-                    if synced_count % 100 == 0:
-                        self.logger.info(f"Synced {synced_count} OCR results to vector database")
+            started_at = time.time()
+            state = None if force_reset else self._load_sync_state()
+            if force_reset:
+                self.logger.info("Force reset requested, rebuilding vector database")
+                self.reset()
             
-            self.logger.info(f"Completed sync: {synced_count} OCR results added to vector database")
+            deleted_count = 0
+            if force_reset:
+                synced_count, watermark, indexed_count = self._bulk_index(
+                    after_id=0, limit=limit, skip_existing=False)
+                mode = 'full'
+            elif state is None:
+                # 没有同步状态（首次运行或状态文件丢失）：按 ID 集合对齐，已存在的文档不重复编码
+                synced_count, deleted_count, watermark, indexed_count = self._reconcile(limit)
+                mode = 'reconcile'
+            else:
+                watermark = state['last_ocr_id']
+                if self._count_indexable(watermark) != state['indexed_count']:
+                    self.logger.info("OCR results changed below the sync watermark, reconciling document ids")
+                    synced_count, deleted_count, watermark, indexed_count = self._reconcile(limit)
+                    mode = 'reconcile'
+                else:
+                    synced_count, watermark, new_count = self._bulk_index(after_id=watermark, limit=limit)
+                    indexed_count = state['indexed_count'] + new_count
+                    mode = 'incremental'
+            
+            self._save_sync_state(watermark, indexed_count)
+            self.last_sync_stats = {
+                'mode': mode,
+                'synced_count': synced_count,
+                'deleted_count': deleted_count,
+                'watermark': watermark,
+                'duration': round(time.time() - started_at, 3)
+            }
+            self.logger.info(f"Completed {mode} sync: {synced_count} added, {deleted_count} deleted, "
+                             f"watermark {watermark}")
             return synced_count
             
         except Exception as e:
             self.logger.error(f"Error syncing from database: {e}")
             return 0
     
+    def _sync_state_path(self) -> Path:
+        """同步状态文件路径（与向量数据库放在同一目录，随集合一起删除时状态也失效）"""
+        return Path(self.config.vector_db_persist_directory) / 'sync_state.json'
+    
+    def _load_sync_state(self) -> Optional[Dict[str, Any]]:
+        """读取同步状态，不存在、属于其他集合或已损坏时返回 None"""
+        path = self._sync_state_path()
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('collection_name') != self.config.vector_db_collection_name:
+                return None
+            return {
+                'last_ocr_id': int(state['last_ocr_id']),
+                'indexed_count': int(state['indexed_count'])
+            }
+        except Exception as e:
+            self.logger.warning(f"Invalid vector sync state {path}: {e}")
+            return None
+    
+    def _save_sync_state(self, watermark: int, indexed_count: int):
+        """保存同步状态：高水位，以及高水位以内已在向量数据库中的 OCR 文档数量"""
+        path = self._sync_state_path()
+        state = {
+            'collection_name': self.config.vector_db_collection_name,
+            'last_ocr_id': watermark,
+            'indexed_count': indexed_count,
+            'updated_at': datetime.now().isoformat()
+        }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+    
+    def _clear_sync_state(self):
+        """删除同步状态，下次同步时重新对齐"""
+        try:
+            self._sync_state_path().unlink()
+        except FileNotFoundError:
+            pass
+    
+    @staticmethod
+    def _indexable_filter():
+        """会写入向量数据库的 OCR 结果：文本非空"""
+        return and_(OCRResult.text_content.isnot(None), func.trim(OCRResult.text_content) != '')
+    
+    def _count_indexable(self, max_id: int) -> int:
+        """统计 ID 不超过 max_id 且会写入向量数据库的 OCR 结果数量"""
+        with self.db_manager.get_read_session() as session:
+            return session.query(func.count(OCRResult.id))\
+                .join(Screenshot, OCRResult.screenshot_id == Screenshot.id)\
+                .filter(OCRResult.id <= max_id, self._indexable_filter())\
+                .scalar() or 0
+    
+    def _reconcile(self, limit: Optional[int] = None) -> Tuple[int, int, int]:
+        """比较 SQLite 与向量数据库中的 OCR 文档 ID，只删除多余的、补齐缺失的
+        
+        Returns:
+            (写入的文档数, 删除的文档数, 新的高水位, 高水位以内已在向量数据库中的文档数)
+        """
+        with self.db_manager.get_read_session() as session:
+            sqlite_ids = {row[0] for row in session.query(OCRResult.id)
+                          .join(Screenshot, OCRResult.screenshot_id == Screenshot.id)
+                          .filter(self._indexable_filter())}
+        vector_ids = set()
+        for doc_id in self.vector_db.get_document_ids(prefix='ocr_'):
+            try:
+                vector_ids.add(int(doc_id[len('ocr_'):]))
+            except ValueError:
+                continue
+        
+        stale_ids = sorted(vector_ids - sqlite_ids)
+        missing_ids = sorted(sqlite_ids - vector_ids)
+        self.logger.info(f"Reconciling vector database: {len(missing_ids)} missing, {len(stale_ids)} stale "
+                         f"(SQLite: {len(sqlite_ids)}, Vector: {len(vector_ids)})")
+        
+        deleted_count = self.vector_db.delete_documents([f"ocr_{ocr_id}" for ocr_id in stale_ids])
+        if limit is not None:
+            missing_ids = missing_ids[:limit]
+        synced_count, added_count, failed_id = self._index_ocr_ids(missing_ids)
+        
+        # 受 limit 限制未补齐或写入失败时，高水位停在第一个未补齐的 ID 之前，下次同步会再次对齐
+        remaining = sorted(sqlite_ids - vector_ids)[len(missing_ids):]
+        watermark = remaining[0] - 1 if remaining else max(sqlite_ids, default=0)
+        if failed_id is not None:
+            watermark = min(watermark, failed_id - 1)
+        indexed_count = sum(1 for ocr_id in sqlite_ids & vector_ids if ocr_id <= watermark) + added_count
+        return synced_count, deleted_count, watermark, indexed_count
+    
+    def _index_rows(self, rows: List[Tuple[OCRResult, Screenshot]],
+                    skip_existing: bool = False) -> Tuple[int, int, Optional[int]]:
+        """按 vector_db.batch_size 分批编码并写入一页 OCR 结果（按 ID 升序）
+        
+        遇到第一个失败的批次即停止，该批及之后的结果留给下次同步。
+        
+        Returns:
+            (写入的文档数, 已在向量数据库中的文档数（含本次写入和已存在的）, 第一个未写入的 OCR 结果 ID，全部成功时为 None)
+        """
+        rows = [row for row in rows if row[0].text_content and row[0].text_content.strip()]
+        existing = set()
+        if skip_existing and rows:
+            # OCR 进程可能已实时写入了部分结果，跳过已存在的文档，避免重复编码
+            existing = self.vector_db.get_existing_ids([f"ocr_{ocr_result.id}" for ocr_result, _ in rows])
+        pending = [row for row in rows if f"ocr_{row[0].id}" not in existing]
+        
+        batch_size = max(1, int(self.config.vector_db_batch_size))
+        synced_count = 0
+        failed_id = None
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            written = self.add_ocr_results_batch(batch)
+            if written < len(batch):
+                failed_id = batch[0][0].id
+                self.logger.warning(f"Vector indexing stopped at OCR result {failed_id}, "
+                                    f"it will be retried on the next sync")
+                break
+            synced_count += written
+        
+        present_count = synced_count + sum(
+            1 for ocr_result, _ in rows
+            if f"ocr_{ocr_result.id}" in existing and (failed_id is None or ocr_result.id < failed_id)
+        )
+        return synced_count, present_count, failed_id
+    
+    def _page_size(self) -> int:
+        # 每页读取若干个编码批次，减少查询次数，同时限制单页占用的内存
+        return max(1, int(self.config.vector_db_batch_size)) * 8
+    
+    def _index_ocr_ids(self, ocr_ids: List[int]) -> Tuple[int, int, Optional[int]]:
+        """按 ID 升序索引指定的 OCR 结果，遇到失败的批次即停止
+        
+        Returns:
+            (写入的文档数, 已在向量数据库中的文档数, 第一个未写入的 OCR 结果 ID，全部成功时为 None)
+        """
+        page_size = self._page_size()
+        synced_count = 0
+        present_count = 0
+        failed_id = None
+        started_at = time.time()
+        for start in range(0, len(ocr_ids), page_size):
+            with self.db_manager.get_read_session() as session:
+                rows = session.query(OCRResult, Screenshot)\
+                    .join(Screenshot, OCRResult.screenshot_id == Screenshot.id)\
+                    .filter(OCRResult.id.in_(ocr_ids[start:start + page_size]))\
+                    .order_by(OCRResult.id)\
+                    .all()
+                page_synced, page_present, failed_id = self._index_rows(rows)
+                synced_count += page_synced
+                present_count += page_present
+            
+            scanned_count = min(start + page_size, len(ocr_ids))
+            elapsed = time.time() - started_at
+            self.logger.info(f"Synced {synced_count} OCR results to vector database "
+                             f"({scanned_count / max(elapsed, 1e-6):.1f} rows/sec)")
+            if failed_id is not None:
+                break
+        return synced_count, present_count, failed_id
+    
+    def _bulk_index(self, after_id: int = 0, limit: Optional[int] = None,
+                    skip_existing: bool = True) -> Tuple[int, int]:
+        """按 ID 顺序分页读取 OCR 结果（连同截图），批量编码并写入向量数据库
+        
+        Args:
+            after_id: 只索引 ID 大于该值的 OCR 结果
+            limit: 索引的最大记录数，None 表示全部
+            skip_existing: 是否跳过向量数据库中已存在的文档
+            
+        Returns:
+            (写入的文档数, 已写入的最大 OCR 结果 ID（失败时停在失败批次之前）, 其中已在向量数据库中的文档数)
+        """
+        page_size = self._page_size()
+        last_id = after_id
+        scanned_count = 0
+        synced_count = 0
+        present_count = 0
+        failed_id = None
+        started_at = time.time()
+        
+        while limit is None or scanned_count < limit:
+            page_limit = page_size if limit is None else min(page_size, limit - scanned_count)
+            with self.db_manager.get_read_session() as session:
+                rows = session.query(OCRResult, Screenshot)\
+                    .join(Screenshot, OCRResult.screenshot_id == Screenshot.id)\
+                    .filter(OCRResult.id > last_id)\
+                    .order_by(OCRResult.id)\
+                    .limit(page_limit)\
+                    .all()
+                if not rows:
+                    break
+                
+                page_synced, page_present, failed_id = self._index_rows(rows, skip_existing=skip_existing)
+                synced_count += page_synced
+                present_count += page_present
+                last_id = failed_id - 1 if failed_id is not None else rows[-1][0].id
+                scanned_count += len(rows)
+            
+            elapsed = time.time() - started_at
+            self.logger.info(f"Synced {synced_count} OCR results to vector database "
+                             f"({scanned_count / max(elapsed, 1e-6):.1f} rows/sec)")
+            
+            if failed_id is not None or len(rows) < page_limit:
+                break
+        
+        return synced_count, last_id, present_count
+    
     def get_stats(self) -> Dict[str, Any]:
         """获取向量数据库统计信息
         
@@ -471,6 +708,7 @@ class VectorService:
         try:
             stats = self.vector_db.get_collection_stats()
             stats["enabled"] = True
+            stats["models"] = model_registry.get_stats()
             return stats
         except Exception as e:
             self.logger.error(f"Error getting vector database stats: {e}")
@@ -488,6 +726,7 @@ class VectorService:
         try:
             success = self.vector_db.reset_collection()
             if success:
+                self._clear_sync_state()
                 self.logger.info("Vector database reset successfully")
             return success
         except Exception as e:
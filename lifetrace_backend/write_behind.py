@@ -0,0 +1,172 @@
+"""批量写入缓冲模块
+
+录制进程每帧都会写入事件、截图和应用使用记录。逐条写入时每条记录都是
+一次独立的SQLite事务（一次fsync）。这里把这些记录先缓存在内存中，
+每累积N条或每隔T毫秒在一个事务中统一写入，并在退出时强制写完。
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PendingScreenshot:
+    """待写入的截图记录（事件在写入时按顺序解析）"""
+    file_path: str
+    file_hash: str
+    width: int
+    height: int
+    screen_id: int
+    app_name: Optional[str]
+    window_title: Optional[str]
+    timestamp: datetime
+    file_size: int
+    phash: Optional[str] = None
+
+
+@dataclass
+class PendingAppUsage:
+    """待写入的应用使用记录"""
+    app_name: str
+    window_title: Optional[str]
+    duration_seconds: int
+    screen_id: int
+    timestamp: datetime
+    # 合并模式：应用/窗口不变时延长当前记录的时长，而不是插入新行
+    coalesce: bool = False
+
+
+class WriteBehindBuffer:
+    """写入缓冲：按条数或时间间隔批量提交记录
+
+    记录按加入顺序写入，写入逻辑由 DatabaseManager.write_batch 在单个事务中完成。
+    """
+
+    def __init__(self, db_manager, batch_size: int = 50, flush_interval_ms: int = 1000,
+                 max_pending: int = 10000, on_flush: Optional[Callable[[List[object]], None]] = None):
+        self.db_manager = db_manager
+        # 每批提交后调用（参数为本批记录），例如通知OCR进程有新截图
+        self.on_flush = on_flush
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(10, int(flush_interval_ms)) / 1000.0
+        self.max_pending = max(self.batch_size, int(max_pending))
+
+        # 数据库长时间不可用时限制内存占用，超出上限时丢弃最旧的记录
+        self._pending: deque = deque(maxlen=self.max_pending)
+        self._cond = threading.Condition()
+        # 保证同一时间只有一个线程在写入，且批次之间保持顺序
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+        self.stats = {
+            'records_enqueued': 0,
+            'records_written': 0,
+            'records_dropped': 0,
+            'batches': 0,
+            'failed_batches': 0,
+            'max_batch': 0
+        }
+
+    def start(self):
+        """启动后台写入线程"""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='db-write-behind', daemon=True)
+        self._thread.start()
+        logger.info(f"批量写入已启动: 每 {self.batch_size} 条或 {int(self.flush_interval * 1000)}ms 提交一次")
+
+    def stop(self):
+        """停止后台线程，并把剩余记录全部写入"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        logger.info(f"批量写入已停止: {self.get_stats()}")
+
+    def add(self, record):
+        """加入一条待写入记录"""
+        with self._cond:
+            if len(self._pending) >= self.max_pending:
+                self.stats['records_dropped'] += 1
+                logger.warning("批量写入队列已满，丢弃最旧的记录")
+            self._pending.append(record)
+            self.stats['records_enqueued'] += 1
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+
+    def flush(self) -> int:
+        """同步写入当前所有待写入记录，返回写入条数"""
+        with self._flush_lock:
+            with self._cond:
+                batch = list(self._pending)
+                self._pending.clear()
+            if not batch:
+                return 0
+
+            try:
+                written = self.db_manager.write_batch(batch)
+            except Exception:
+                self._requeue(batch)
+                raise
+            self.stats['batches'] += 1
+            self.stats['records_written'] += written
+            self.stats['max_batch'] = max(self.stats['max_batch'], len(batch))
+            if written < len(batch):
+                self.stats['failed_batches'] += 1
+            if written and self.on_flush is not None:
+                try:
+                    self.on_flush(batch)
+                except Exception as e:
+                    logger.warning(f"批量写入回调失败: {e}")
+            return written
+
+    def _requeue(self, batch: List[object]):
+        """写入异常时把批次放回队首，下次提交时重试"""
+        with self._cond:
+            merged = batch + list(self._pending)
+            dropped = max(0, len(merged) - self.max_pending)
+            self._pending = deque(merged, maxlen=self.max_pending)
+        self.stats['failed_batches'] += 1
+        if dropped:
+            self.stats['records_dropped'] += dropped
+            logger.warning(f"批量写入队列已满，丢弃最旧的 {dropped} 条记录")
+
+    def pending_count(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def get_stats(self) -> dict:
+        """获取写入统计"""
+        stats = self.stats.copy()
+        stats['pending'] = self.pending_count()
+        return stats
+
+    def _run(self):
+        """后台线程：凑满一批或到达时间间隔时提交"""
+        while True:
+            deadline = time.time() + self.flush_interval
+            with self._cond:
+                while self._running and len(self._pending) < self.batch_size:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if not self._running:
+                    return
+
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"批量写入失败: {e}")
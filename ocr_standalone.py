@@ -37,4 +37,7 @@ def main():
         sys.exit(1)
 
 if __name__ == '__main__':
+    import multiprocessing
+    # 多进程OCR模式在打包后的可执行文件中需要
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
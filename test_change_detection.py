@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+分块变化检测回归测试脚本
+验证默认配置下的分块校验和能检出细小的画面变化（修改一个字符、光标闪烁），
+这类帧不能被当作"无变化"跳过，否则新内容不会进入OCR。
+
+用法：
+    python test_change_detection.py
+    或 python -m pytest test_change_detection.py
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from lifetrace_backend.frame_hash import TileChangeDetector
+
+WIDTH, HEIGHT = 1280, 720
+
+
+def _render(text: str, cursor: bool = False) -> bytes:
+    """渲染一帧白底黑字的画面，返回mss格式的BGRA字节"""
+    image = Image.new('RGB', (WIDTH, HEIGHT), 'white')
+    draw = ImageDraw.Draw(image)
+    draw.text((100, 100), text, fill='black')
+    if cursor:
+        draw.line([(100, 120), (100, 130)], fill='black', width=1)
+    rgb = np.asarray(image)
+    bgra = np.dstack([rgb[:, :, ::-1], np.full((HEIGHT, WIDTH), 255, dtype=np.uint8)])
+    return bgra.tobytes()
+
+
+def _changed(previous: bytes, current: bytes) -> bool:
+    detector = TileChangeDetector()
+    detector.check(0, previous, WIDTH, HEIGHT)
+    changed, _ = detector.check(0, current, WIDTH, HEIGHT)
+    return changed
+
+
+def test_identical_frame_is_skipped():
+    """完全相同的画面判定为无变化"""
+    frame = _render("hello world")
+    assert not _changed(frame, frame)
+
+
+def test_single_character_change_is_detected():
+    """只修改一个字符也要判定为有变化"""
+    for before, after in (("hello world", "hello worle"), ("count: 1", "count: 7"), ("i", "l")):
+        assert _changed(_render(before), _render(after)), (before, after)
+
+
+def test_cursor_is_detected():
+    """一像素宽的光标出现时判定为有变化"""
+    assert _changed(_render("hello world"), _render("hello world", cursor=True))
+
+
+if __name__ == '__main__':
+    test_identical_frame_is_skipped()
+    test_single_character_change_is_detected()
+    test_cursor_is_detected()
+    print("分块变化检测回归测试通过")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+关键词检索回归测试脚本
+验证倒排索引预过滤不会漏掉子串匹配能找到的结果：
+关键词是原文中某个词的一部分（"log" 之于 "logging"）或单个汉字（"中" 之于 "中文内容"）时，
+search_by_conditions 与 search_screenshots 的结果应一致。
+
+用法：
+    python test_keyword_search.py
+    或 python -m pytest test_keyword_search.py
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from lifetrace_backend.storage import DatabaseManager
+from lifetrace_backend.retrieval_service import RetrievalService
+from lifetrace_backend.query_parser import QueryConditions
+from lifetrace_backend.text_tokenizer import query_terms
+
+OCR_TEXT = "import logging and 中文内容"
+
+
+def _create_database(directory: str):
+    """创建临时数据库，写入一张带OCR文本的截图"""
+    db = DatabaseManager(f"sqlite:///{os.path.join(directory, 'test.db')}")
+    screenshot_id = db.add_screenshot(
+        os.path.join(directory, 'test.png'), 'test-hash', 100, 100,
+        screen_id=0, app_name='test', window_title='test'
+    )
+    db.add_ocr_result(screenshot_id, OCR_TEXT, 0.9, 'ch', 0.1)
+    return db, screenshot_id
+
+
+def _search_both(db, keyword: str):
+    retrieval = RetrievalService(db)
+    by_conditions = retrieval.search_by_conditions(QueryConditions(keywords=[keyword]))
+    by_search = db.search_screenshots(query=keyword)
+    return ([item['screenshot_id'] for item in by_conditions],
+            [item['id'] for item in by_search])
+
+
+def test_partial_terms_are_not_used_for_postings():
+    """关键词开头/结尾可能只是原文片段一部分的检索词不参与倒排索引"""
+    assert query_terms('log') == []
+    assert query_terms('中') == []
+    assert query_terms('import logging and') == ['logging']
+    assert query_terms('中文') == ['中文']
+
+
+def test_latin_substring_keyword():
+    """"log" 是 "logging" 的子串，两种检索都应找到该截图"""
+    with tempfile.TemporaryDirectory() as directory:
+        db, screenshot_id = _create_database(directory)
+        by_conditions, by_search = _search_both(db, 'log')
+        assert by_search == [screenshot_id]
+        assert by_conditions == [screenshot_id]
+        db.engine.dispose()
+
+
+def test_single_cjk_character_keyword():
+    """单个汉字 "中" 出现在 "中文内容" 中，两种检索都应找到该截图"""
+    with tempfile.TemporaryDirectory() as directory:
+        db, screenshot_id = _create_database(directory)
+        by_conditions, by_search = _search_both(db, '中')
+        assert by_search == [screenshot_id]
+        assert by_conditions == [screenshot_id]
+        db.engine.dispose()
+
+
+if __name__ == '__main__':
+    test_partial_terms_are_not_used_for_postings()
+    test_latin_substring_keyword()
+    test_single_cjk_character_keyword()
+    print("关键词检索回归测试通过")